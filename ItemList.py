@@ -1,58 +1,355 @@
+import bisect
 import csv
+import dataclasses
+import datetime
+import heapq
+import math
+import operator
 import os
-from loans import Loan, LoanIdClashException
-from books import Book, BookType, BookIdClashException
-from customers import Customer, CustomerIdClashException
+import sys
+import threading
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from loans import Loan, LoanException, date_to_ordinal
+from books import Book, BookType
+from customers import Customer
+from SearchIndex import SearchIndex
 import warnings
 import util
 
+NGRAM_SIZE = 3
+JOURNAL_ADD = '+'
+JOURNAL_REMOVE = '-'
+QUERY_OPERATORS = ('eq', 'in', 'range', 'prefix', 'contains')
+PARALLEL_LOAD_MIN_BYTES = 1 << 20  # smaller files are loaded in-process, starting workers would cost more
+CHUNKS_PER_WORKER = 4
 
-def create_item(**kwargs):
+
+def item_arguments(**kwargs):
     """
-    Creates item of type specified by 'item_type'
-    :param kwargs: 'item_type' - Type of item to create. Additional arguments as needed by type's init method.
-    :return: Object of type specified
+    Converts a row dictionary (as written to csv) to the init arguments of the type specified by 'item_type'
+    :param kwargs: 'item_type' - Type of item. Additional arguments as needed by type's init method.
+    :return: {'argument': value} dictionary
     """
     if 'item_type' not in kwargs:
         raise ValueError('create_item() must receive "item_type" as argument')
     if kwargs['item_type'] is Book:
-        new_item = Book(
-            name=kwargs['name'],
-            author=kwargs['author'],
-            year=int(kwargs['year']),
-            total_quantity=int(kwargs['total_quantity']),
-            book_type=BookType(int(kwargs['type'])),
-            ID=int(kwargs['id'])
-        )
-        return new_item
+        return {
+            'name': kwargs['name'],
+            'author': kwargs['author'],
+            'year': int(kwargs['year']),
+            'total_quantity': int(kwargs['total_quantity']),
+            'book_type': BookType(int(kwargs['type'])),
+            'ID': int(kwargs['id'])
+        }
     elif kwargs['item_type'] is Customer:
-        new_item = Customer(
-            name=kwargs['name'],
-            city=kwargs['city'],
-            birth_year=int(kwargs['birth_year']),
-            ID=int(kwargs['id'])
-        )
-        return new_item
+        return {
+            'name': kwargs['name'],
+            'city': kwargs['city'],
+            'birth_year': int(kwargs['birth_year']),
+            'ID': int(kwargs['id'])
+        }
     elif kwargs['item_type'] is Loan:
-        new_item = Loan(
-            custID=int(kwargs['custID']),
-            bookID=int(kwargs['bookID']),
-            loandate=kwargs['loan_date'],
-            returndate=kwargs['return_date'],
-            ID=int(kwargs['id'])
-        )
-        return new_item
+        return {
+            'custID': int(kwargs['custID']),
+            'bookID': int(kwargs['bookID']),
+            'loandate': kwargs['loan_date'],
+            'returndate': kwargs['return_date'],
+            'ID': int(kwargs['id'])
+        }
+    else:
+        raise ValueError("Argument item type does not match any supported classes.")
+
+
+def create_item(**kwargs):
+    """
+    Creates item of type specified by 'item_type'
+    :param kwargs: 'item_type' - Type of item to create. Additional arguments as needed by type's init method.
+    :return: Object of type specified
+    """
+    arguments = item_arguments(**kwargs)
+    return kwargs['item_type'](**arguments)
+
+
+def restore_item(**kwargs):
+    """
+    Recreates an item of type specified by 'item_type' from a row that was already validated when it was stored.
+    Unlike create_item() the type's __post_init__ checks (e.g. the loan date order) are skipped.
+    :param kwargs: 'item_type' - Type of item to create. Additional arguments as needed by type's init method.
+    :return: Object of type specified
+    """
+    arguments = item_arguments(**kwargs)
+    new_item = object.__new__(kwargs['item_type'])
+    for name, value in arguments.items():
+        object.__setattr__(new_item, name, value)
+    return new_item
+
+
+def trusted_columns(item_type):
+    """
+    Returns how each csv field of a type is stored on its items, to decode rows that are known to be valid
+    :param item_type: Type of the items
+    :return: {csv field: (attribute name, func(csv value) giving the attribute's value)} dictionary
+    """
+    if item_type is Book:
+        return {'id': ('ID', int), 'name': ('name', str), 'author': ('author', sys.intern), 'year': ('year', int),
+                'type': ('book_type', lambda value: BookType(int(value))), 'total_quantity': ('total_quantity', int)}
+    elif item_type is Customer:
+        return {'id': ('ID', int), 'name': ('name', str), 'city': ('city', sys.intern),
+                'birth_year': ('birth_year', int)}
+    elif item_type is Loan:
+        return {'id': ('ID', int), 'custID': ('custID', int), 'bookID': ('bookID', int),
+                'loan_date': ('loan_ordinal', date_to_ordinal), 'return_date': ('return_ordinal', date_to_ordinal)}
     else:
         raise ValueError("Argument item type does not match any supported classes.")
 
 
+def row_decoder(item_type, fieldnames: list):
+    """
+    Returns a function creating an item from a csv row (a list of values ordered like the header) that skips
+    the checks of create_item(), for rows the list wrote or already validated. Values converted by anything but
+    int() (e.g. dates) are converted once per distinct value.
+    :param item_type: Type of the items
+    :param fieldnames: the csv file's header
+    :return: func(row) returning an object of the type, raises ValueError/IndexError for malformed rows
+    """
+    columns = trusted_columns(item_type)
+    if sorted(fieldnames) != sorted(columns):
+        raise ValueError("The csv header doesn't match the type's fields.")
+    plain = []  # (position, attribute, converter) of the columns converted by int() or kept as strings
+    memoized = []  # (position, attribute, converter, {csv value: converted value}) of the other columns
+    for position, field in enumerate(fieldnames):
+        attribute, converter = columns[field]
+        if converter is int or converter is str:
+            plain.append((position, attribute, converter))
+        else:
+            memoized.append((position, attribute, converter, {}))
+    new = object.__new__
+    width = len(fieldnames)
+
+    def decode(row: list):
+        if len(row) != width:
+            raise ValueError(f"Row has {len(row)} values instead of {width}")
+        item = new(item_type)
+        for position, attribute, converter in plain:
+            setattr(item, attribute, converter(row[position]))
+        for position, attribute, converter, converted in memoized:
+            value = converted.get(row[position])
+            if value is None:
+                value = converted[row[position]] = converter(row[position])
+            setattr(item, attribute, value)
+        return item
+    return decode
+
+
+def close_writers(writers: dict):
+    """
+    Writes the rows waiting in a list's buffered writers and closes their files.
+    :param writers: {file path: util.BufferedCsvWriter} dictionary
+    :return: None
+    """
+    for writer in list(writers.values()):
+        writer.close()
+
+
+def parse_csv_range(item_type, path: str, fieldnames: list, start: int, end: int):
+    """
+    Creates the items of a byte range of a csv file. Runs in the worker processes of a parallel load.
+    :param item_type: Type of the items in the file
+    :param path: Path to a csv file
+    :param fieldnames: the file's header
+    :param start: offset of the range's first line
+    :param end: offset right after the range's last line
+    :return: list of (item, None) for created items and (None, warning message) for rejected rows, in file order
+    """
+    results = []
+    for data in util.read_csv_range(path, fieldnames, start, end):
+        try:
+            results.append((create_item(item_type=item_type, **data), None))
+        except (ValueError, TypeError) as e:
+            results.append((None, "Line parse failed. " + str(e)))
+    return results
+
+
+def field_getter(item_type, field: str):
+    """
+    Returns a function giving an item's value of a csv field, read straight from the attribute of the same name
+    when the type has one, so that indexing doesn't build (and format) the item's whole get_dict().
+    :param item_type: Type of the items
+    :param field: a field in the type's fields()
+    :return: func(item)
+    """
+    if field == 'id':
+        return operator.attrgetter('ID')
+    if field in {attribute.name for attribute in dataclasses.fields(item_type)}:
+        return operator.attrgetter(field)
+    return lambda item: item.get_dict()[field]
+
+
+def range_bound(value):
+    """
+    Converts a range bound to a sort key. Dates are sorted by their day number (see datetime.date.toordinal()).
+    :param value: sort key, datetime.date or None
+    :return: sort key or None
+    """
+    if isinstance(value, datetime.date):
+        return value.toordinal()
+    return value
+
+
+def condition_matcher(getter, operation: str, value):
+    """
+    Builds the test of a query() condition
+    :param getter: func(item) giving the value the condition is about (the field's sort key for ranges on sorted fields)
+    :param operation: one of QUERY_OPERATORS
+    :param value: the condition's value, see ItemList.query()
+    :return: func(item) returning whether the item matches
+    """
+    if operation == 'eq':
+        return lambda item: getter(item) == value
+    if operation == 'in':
+        values = set(value)
+        return lambda item: getter(item) in values
+    if operation == 'range':
+        low, high = value
+        return lambda item: (low is None or getter(item) >= low) and (high is None or getter(item) <= high)
+    if operation in ('prefix', 'contains'):
+        if not isinstance(value, str):
+            raise TypeError(f"A {operation} condition needs a string")
+        text = value.lower()
+        if operation == 'prefix':
+            return lambda item: isinstance(getter(item), str) and getter(item).lower().startswith(text)
+        return lambda item: isinstance(getter(item), str) and text in getter(item).lower()
+    raise ValueError(f"Unknown query operator: {operation}")
+
+
+def ngrams(text: str):
+    """
+    Splits a string into all of its overlapping substrings of length NGRAM_SIZE
+    :param text: string to split
+    :return: set of n-grams
+    """
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+class IdAllocator:
+    """
+    Gives out the IDs of a list's new items in O(1): the lowest ID above every ID ever used (a high-water mark),
+    or, when reuse is on, an ID released by a removed item. Gaps between the IDs of loaded items aren't reused.
+    """
+    def __init__(self, reuse: bool = False):
+        """
+        :param reuse: whether IDs released by removed items are given out again
+        """
+        self.__next = 0  # every ID from here up is free
+        self.__reuse = reuse
+        self.__free = set()  # released IDs below the high-water mark, when reuse is on
+
+    def claim(self, ID: int):
+        """
+        Marks an ID given to an item by its creator as used
+        :param ID: the item's ID
+        :return: None
+        """
+        if ID >= self.__next:
+            self.__next = ID + 1
+        elif self.__free:
+            self.__free.discard(ID)
+
+    def allocate(self):
+        """
+        Gives out a single ID
+        :return: int
+        """
+        if self.__free:
+            return self.__free.pop()
+        self.__next += 1
+        return self.__next - 1
+
+    def reserve(self, count: int):
+        """
+        Gives out a block of consecutive IDs (e.g. for a bulk insert)
+        :param count: amount of IDs
+        :return: range of the IDs
+        """
+        block = range(self.__next, self.__next + count)
+        self.__next += count
+        return block
+
+    def release(self, ID: int):
+        """
+        Returns the ID of a removed item, to be given out again if reuse is on
+        :param ID: the removed item's ID
+        :return: None
+        """
+        if self.__reuse and 0 <= ID < self.__next:
+            self.__free.add(ID)
+
+
 class ItemList:
-    def __init__(self, item_type, db_path):
+    def __init__(self, item_type, db_path, text_index: bool = True, journaled: bool = False,
+                 compact_threshold: int = 1000, load_workers: int = None, concurrent: bool = False,
+                 write_buffer: dict = None, snapshot: bool = False, instrumented: bool = False,
+                 reuse_ids: bool = False, cache_size: int = None, trusted: bool = False):
+        """
+        :param item_type: Type of the items in the list (Book, Customer or Loan)
+        :param db_path: Path to the list's csv file
+        :param text_index: whether to keep an n-gram index for substring searches on the type's text fields
+        :param journaled: whether changes are appended to a journal file ("{db_path}.journal") instead of the csv
+        :param compact_threshold: amount of journal records after which the journal is merged into the csv
+        :param load_workers: amount of processes used to parse the csv file (None to parse it in-process)
+        :param concurrent: whether the list is shared between threads. Guards it with a reader-writer lock,
+        so searches can run in parallel while changes are exclusive, and makes iteration run over a snapshot.
+        :param write_buffer: options of a util.BufferedCsvWriter (max_rows, max_delay, fsync) to batch appended
+        rows with, None to write every change when it happens. Buffered rows are written by flush(), close()/exiting
+        a with block, and when the interpreter exits.
+        :param snapshot: whether to keep a binary copy of the csv ("{db_path}.snapshot") that the list is loaded from
+        instead of the csv while the csv is unchanged. It's written when the csv is loaded or rewritten.
+        :param instrumented: whether to record call counts and latencies, items scanned by searches, bytes written
+        and load times, see stats(). Recording nothing costs close to nothing.
+        :param reuse_ids: whether the IDs of removed items are given to new items (see IdAllocator)
+        :param cache_size: amount of get_by_property() results to keep in an LRU cache (None for no cache).
+        Only searches that scan (text and full scan searches) are cached, ID and hash index lookups are cheaper
+        than a cache lookup. Cached results are dropped when an item that matches them is added or removed.
+        :param trusted: whether the rows of the csv that the list wrote or already validated are loaded without
+        validating them again. They're recognized by a checksum in "{db_path}.certificate" (see util.certify_csv()),
+        rows after them or in a file that doesn't match its certificate are validated as usual.
+        """
         self.__list = {}
+        self.__ids = IdAllocator(reuse_ids)
         self.__item_type = item_type
+        self.__indexes = {field: {} for field in item_type.indexed_fields()}
+        self.__text_indexes = {field: {} for field in item_type.text_indexed_fields()} if text_index else {}
+        self.__getters = {field: field_getter(item_type, field) for field in item_type.fields()}
+        self.__sort_keys = item_type.sorted_fields()
+        self.__sorted_indexes = {field: [] for field in self.__sort_keys}
+        self.__unsorted = False  # set when sorted indexes got entries appended out of order
+        self.__search_index = None  # built on the first search()
+        self.__cache = util.LruCache(cache_size, on_evict=self.__forget_cached) if cache_size else None
+        self.__cached_values = {}  # field -> search values of the field's cached results
+        self.__loading = False
+        self.__concurrent = concurrent
+        self.__lock = util.ReadWriteLock() if concurrent else util.NoLock()
+        self.__stats = util.OperationStats() if instrumented else util.NoStats()
+        self.__write_buffer = write_buffer
+        self.__writers = {}  # file path -> util.BufferedCsvWriter
+        # Buffered rows are written when the list is closed or garbage collected, or at exit at the latest.
+        # The finalizer only refers to the writers, so it doesn't keep the list alive
+        self.__finalizer = weakref.finalize(self, close_writers, self.__writers) if write_buffer is not None else None
         self.__db_path = db_path
+        self.__journaled = journaled
+        self.__journal_path = db_path + ".journal"
+        self.__journal_size = 0
+        self.__compact_threshold = compact_threshold
+        self.__snapshot_path = db_path + ".snapshot" if snapshot else None
+        self.__trusted = trusted
+        self.__file_mark = None  # how far the csv file was read, see util.file_mark()
+        self.__removed_ids = set()  # IDs removed since the mark, so their rows in the file aren't read back
+        self.__watcher = None
+        self.__watch_stop = None
         self.__init_file()
-        self.load_from_csv(db_path)
+        self.load_from_csv(db_path, workers=load_workers)
 
     def __init_file(self):
         """
@@ -67,52 +364,488 @@ class ItemList:
                                         quoting=csv.QUOTE_ALL)
                 writer.writeheader()
 
-    def load_from_csv(self, path):
+    def load_from_csv(self, path, progress=None, workers: int = None):
         """
         Loads items from a csv file.
         :param path: Path to a csv file
+        :param progress: optional func(rows_read) called as the file is read
+        :param workers: amount of processes to parse the file with (None or 1 to parse it in-process).
+        Files smaller than PARALLEL_LOAD_MIN_BYTES are always parsed in-process.
         :return: None
         """
-        file_res = util.csv_to_arr(path)
+        with self.__lock.writing(), self.__stats.timed('load_from_csv'):
+            start = time.perf_counter()
+            items_before = len(self.__list)
+            source = 'csv'
+            own_file = os.path.abspath(path) == os.path.abspath(self.__db_path)
+            use_snapshot = own_file and self.__snapshot_path is not None and not self.__list
+            use_certificate = own_file and self.__trusted and not self.__list
+            # Marked before reading, so rows appended while the file is read are picked up by the next refresh()
+            mark = util.file_mark(self.__db_path) if own_file else None
+            self.__loading = True
+            try:
+                if use_snapshot and self.__load_snapshot():
+                    source = 'snapshot'
+                    print(f"{len(self.__list)} items of type {self.__item_type} loaded from snapshot")
+                else:
+                    certified, failed = self.__parse_csv(path, progress, workers, use_certificate)
+                    if certified:
+                        source = 'trusted csv'
+                    # Once every row passed validation, the next load can trust them
+                    if use_certificate and not failed and mark is not None and certified < mark['offset']:
+                        self.__certify(mark['offset'])
+                    if use_snapshot:  # the list holds exactly the csv's items until the journal is replayed
+                        self.__write_snapshot()
+                if own_file:
+                    self.__file_mark = mark
+                    self.__removed_ids.clear()
+                if self.__journaled and own_file:
+                    self.__replay_journal()
+            finally:
+                self.__loading = False
+                self.__sort_indexes()
+            self.__stats.record_load(path, source, len(self.__list) - items_before, time.perf_counter() - start)
+
+    def __parse_csv(self, path, progress=None, workers: int = None, trusted: bool = False):
+        """
+        Creates items from the rows of a csv file and adds them to the list (without writing them to file).
+        :param path: Path to a csv file
+        :param progress: optional func(rows_read) called as the file is read
+        :param workers: amount of processes to parse the file with
+        :param trusted: whether to load the file's certified rows without validating them (the list must be empty)
+        :return: (length of the certified part of the file that was trusted, amount of rejected rows)
+        """
         fail_count = 0
         success_count = 0
-        for data in file_res:
+        certified = util.certified_length(path) if trusted else 0
+        if certified:
+            fieldnames, rows = util.read_csv_lines(path, certified)
             try:
-                new_item = create_item(item_type=self.__item_type, **data)
-                self.add(new_item, to_file=False)
-            except (ValueError, TypeError) as e:
-                warnings.warn("Line parse failed. " + str(e))
-                fail_count += 1
-            except (LoanIdClashException, BookIdClashException, CustomerIdClashException):
-                warnings.warn("Cannot create 2 items with identical IDs")
-                fail_count += 1
+                success_count = self.__load_certified(fieldnames, rows)
+            except (ValueError, TypeError, IndexError, ItemListException, LoanException) as e:
+                warnings.warn("Certified rows failed to load, validating the whole file instead. " + str(e))
+                self.__clear()
+                certified = success_count = 0
             else:
+                if progress is not None:
+                    progress(success_count)
+        if certified:  # only the rows after the certified part are validated
+            results = (self.__load_row(data)
+                       for data in util.read_csv_range(path, fieldnames, certified, os.path.getsize(path)))
+        elif workers is not None and workers > 1 and os.path.exists(path) \
+                and os.path.getsize(path) >= PARALLEL_LOAD_MIN_BYTES:
+            results = self.__parse_parallel(path, workers, progress)
+        else:
+            results = (self.__load_row(data) for data in util.iter_csv(path, progress=progress))
+        for loaded in results:
+            if loaded:
                 success_count += 1
+            else:
+                fail_count += 1
         print("{0} items of type {2} imported from CSV ({0} succeeded, {1} failed)".format(success_count,
                                                                                            fail_count,
                                                                                            self.__item_type))
+        return certified, fail_count
+
+    def __load_certified(self, fieldnames: list, rows: list):
+        """
+        Adds the items of certified csv rows, decoded without validating them (see row_decoder()).
+        :param fieldnames: the csv file's header
+        :param rows: list of rows (lists of values ordered like the header)
+        :return: amount of items added
+        """
+        decode = row_decoder(self.__item_type, fieldnames)
+        new_items = [decode(row) for row in rows if row]
+        self.__add_many(new_items, to_file=False)
+        return len(new_items)
+
+    def __certify(self, length: int = None):
+        """
+        Certifies the list's csv file, so its rows are trusted the next time it's loaded (see util.certify_csv()).
+        :param length: amount of bytes to certify (None for the whole file)
+        :return: None
+        """
+        try:
+            util.certify_csv(self.__db_path, length)
+        except IOError as e:
+            warnings.warn("Couldn't certify csv file: " + str(e))
+
+    def refresh(self):
+        """
+        Adds the rows appended to the csv file since it was last read, e.g. by another program.
+        Only the new tail of the file is parsed. If the file was truncated, replaced or rewritten instead,
+        the whole list is reloaded from it.
+        :return: amount of items added (all of the list's items after a full reload)
+        """
+        with self.__lock.writing(), self.__stats.timed('refresh'):
+            return self.__read_appended(reload=True)
+
+    def __read_appended(self, reload: bool):
+        """
+        Adds the items of the complete rows appended to the csv file since its mark. Rows of items the list already
+        holds (the list's own appends) and of items removed since the mark are skipped.
+        :param reload: whether to reload the whole list if the file changed in any other way than being appended to
+        :return: amount of items added
+        """
+        if self.__file_mark is None:
+            return 0
+        appended = util.read_appended_csv(self.__db_path, self.__file_mark)
+        if appended is None:
+            if not reload:
+                return 0
+            self.__reload()
+            return len(self.__list)
+        rows, self.__file_mark = appended
+        added = 0
+        self.__loading = True
+        try:
+            for data in rows:
+                try:
+                    new_item = create_item(item_type=self.__item_type, **data)
+                except (ValueError, TypeError) as e:
+                    warnings.warn("Line parse failed. " + str(e))
+                    continue
+                if new_item.ID in self.__removed_ids:
+                    continue
+                existing = self.__list.get(new_item.ID)
+                if existing is not None:
+                    if existing.get_dict() != new_item.get_dict():
+                        warnings.warn("Cannot create 2 items with identical IDs")
+                    continue
+                self.__add_many([new_item], to_file=False)
+                added += 1
+        finally:
+            self.__loading = False
+            self.__sort_indexes()
+        self.__stats.count('items_refreshed', added)
+        return added
+
+    def __reload(self):
+        """
+        Empties the list and loads it again from its csv file (and journal). IDs given out before are still claimed.
+        :return: None
+        """
+        self.flush()
+        self.__clear()
+        self.__stats.count('full_reloads')
+        self.load_from_csv(self.__db_path)
+
+    def __clear(self):
+        """
+        Removes all items from the list and its indexes, without changing its files.
+        :return: None
+        """
+        self.__list = {}
+        self.__indexes = {field: {} for field in self.__indexes}
+        self.__text_indexes = {field: {} for field in self.__text_indexes}
+        self.__sorted_indexes = {field: [] for field in self.__sorted_indexes}
+        self.__unsorted = False
+        self.__search_index = None
+        if self.__cache is not None:
+            self.__cache.clear()
+            self.__cached_values = {}
+
+    def watch(self, interval: float = 1.0):
+        """
+        Starts a background (daemon) thread that calls refresh() every interval seconds, until stop_watching()
+        or close(). Only concurrent lists can be watched, as the thread changes the list while others use it.
+        :param interval: seconds between refreshes
+        :return: None
+        """
+        if not self.__concurrent:
+            raise ValueError("Only a concurrent list can be watched")
+        if self.__watcher is not None:
+            return
+        self.__watch_stop = threading.Event()
+        self.__watcher = threading.Thread(target=self.__watch, args=(interval, self.__watch_stop), daemon=True)
+        self.__watcher.start()
+
+    def stop_watching(self):
+        """
+        Stops the thread started by watch() and waits for it to finish.
+        :return: None
+        """
+        if self.__watcher is None:
+            return
+        self.__watch_stop.set()
+        self.__watcher.join()
+        self.__watcher = None
+
+    def __watch(self, interval: float, stop):
+        while not stop.wait(interval):
+            try:
+                self.refresh()
+            except IOError as e:
+                warnings.warn("Couldn't refresh from file: " + str(e))
+
+    def __load_snapshot(self):
+        """
+        Adds the items stored in the snapshot file, if it matches the current csv file.
+        Items are rebuilt from their stored attributes, without parsing or validating them again.
+        :return: True if the items were loaded, False if the csv has to be parsed instead
+        """
+        attributes = dataclasses.fields(self.__item_type)
+        columns = util.read_snapshot(self.__snapshot_path, self.__db_path)
+        if columns is None or list(columns) != [attribute.name for attribute in attributes]:
+            return False
+        for attribute in attributes:
+            if attribute.type not in (int, str):  # e.g. BookType, stored as its int value
+                columns[attribute.name] = list(map(attribute.type, columns[attribute.name]))
+        new_items = []
+        for values in zip(*columns.values()):
+            new_item = object.__new__(self.__item_type)
+            for name, value in zip(columns, values):
+                object.__setattr__(new_item, name, value)
+            new_items.append(new_item)
+        self.__add_many(new_items, to_file=False)
+        return True
+
+    def __write_snapshot(self):
+        """
+        Writes the items' attributes to the snapshot file, marked with the csv file's current size and mtime.
+        :return: None
+        """
+        names = [attribute.name for attribute in dataclasses.fields(self.__item_type)]
+        columns = {name: [getattr(item, name) for item in self.__list.values()] for name in names}
+        try:
+            util.write_snapshot(self.__snapshot_path, self.__db_path, columns)
+            self.__stats.count('bytes_snapshot', os.path.getsize(self.__snapshot_path))
+        except (IOError, TypeError, ValueError, OverflowError) as e:
+            warnings.warn("Couldn't write snapshot: " + str(e))
+
+    def __load_row(self, data: dict):
+        """
+        Creates an item from a csv row and adds it to the list (without writing it to file).
+        :param data: csv row dictionary
+        :return: True if the item was added, False if the row was rejected
+        """
+        try:
+            new_item = create_item(item_type=self.__item_type, **data)
+            self.__add_many([new_item], to_file=False)
+        except (ValueError, TypeError) as e:
+            warnings.warn("Line parse failed. " + str(e))
+            return False
+        except ItemExistsError:
+            warnings.warn("Cannot create 2 items with identical IDs")
+            return False
+        return True
+
+    def __parse_parallel(self, path: str, workers: int, progress=None):
+        """
+        Parses a csv file in a process pool, split into byte ranges at line boundaries, and adds the items
+        created by the workers in file order. ID clashes are checked when the items are added.
+        Quoted fields that contain line breaks are not supported in this mode.
+        :param path: Path to a csv file
+        :param workers: amount of processes
+        :param progress: optional func(rows_read) called after each range is added
+        :return: generator of True for added items, False for rejected rows
+        """
+        fieldnames, ranges = util.split_csv(path, workers * CHUNKS_PER_WORKER)
+        rows_read = 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunk_results = executor.map(parse_csv_range,
+                                         [self.__item_type] * len(ranges),
+                                         [path] * len(ranges),
+                                         [fieldnames] * len(ranges),
+                                         [start for start, _ in ranges],
+                                         [end for _, end in ranges])
+            for chunk in chunk_results:
+                for new_item, message in chunk:
+                    if new_item is None:
+                        warnings.warn(message)
+                        yield False
+                        continue
+                    try:
+                        self.__add_many([new_item], to_file=False)
+                    except ItemExistsError:
+                        warnings.warn("Cannot create 2 items with identical IDs")
+                        yield False
+                    else:
+                        yield True
+                rows_read += len(chunk)
+                if progress is not None:
+                    progress(rows_read)
+
+    def __replay_journal(self):
+        """
+        Applies the additions and removals recorded in the journal file on top of the loaded csv.
+        :return: None
+        """
+        if not os.path.exists(self.__journal_path):
+            return
+        self.__journal_size = 0
+        for record in util.iter_csv(self.__journal_path):
+            self.__journal_size += 1
+            operation = record.pop('op', None)
+            if operation == JOURNAL_ADD:
+                self.__load_row(record)
+            elif operation == JOURNAL_REMOVE:
+                try:
+                    removed = self.__list.pop(int(record['id']), None)
+                except (ValueError, TypeError, KeyError) as e:
+                    warnings.warn("Journal line parse failed. " + str(e))
+                    continue
+                if removed is not None:
+                    self.__unindex_item(removed)
+                    self.__ids.release(removed.ID)
+            else:
+                warnings.warn(f"Unknown journal operation: {operation}")
+        if self.__journal_size >= self.__compact_threshold:
+            self.rewrite_db()
+
+    def __append_journal(self, operation: str, item_dicts: list):
+        """
+        Appends records to the journal file and compacts the journal once it reaches the threshold.
+        :param operation: JOURNAL_ADD or JOURNAL_REMOVE
+        :param item_dicts: list of dicts of the items' fields (only 'id' is needed for removals)
+        :return: None
+        """
+        records = []
+        for item_dict in item_dicts:
+            record = {'op': operation, **dict.fromkeys(self.__item_type.fields(), '')}
+            record.update(item_dict)
+            records.append(record)
+        self.__append_rows(records, self.__journal_path)
+        self.__journal_size += len(records)
+        if self.__journal_size >= self.__compact_threshold:
+            self.rewrite_db()
+
+    def __append_rows(self, rows: list, path: str):
+        """
+        Appends rows to a csv file, through the file's buffered writer if the list has a write buffer.
+        :param rows: list of row dictionaries
+        :param path: path to a csv file
+        :return: None
+        """
+        if self.__write_buffer is None:
+            written = util.append_csv_rows(rows, path)
+            self.__stats.count('bytes_journaled' if path == self.__journal_path else 'bytes_appended', written)
+            return
+        if path not in self.__writers:
+            self.__writers[path] = util.BufferedCsvWriter(path, **self.__write_buffer)
+        if not self.__finalizer.alive:  # written to again after close()
+            self.__finalizer = weakref.finalize(self, close_writers, self.__writers)
+        self.__writers[path].write_rows(rows)
+
+    def flush(self):
+        """
+        Writes changes that are waiting in the write buffer to file.
+        :return: None
+        """
+        for writer in list(self.__writers.values()):
+            writer.flush()
+
+    def close(self):
+        """
+        Stops watching the file, writes buffered changes and closes the list's open files.
+        :return: None
+        """
+        self.stop_watching()
+        if self.__finalizer is not None:
+            self.__finalizer()  # closes the writers, and isn't called again at exit
 
     def rewrite_db(self):
-        items = []
-        for item in self.__list.values():
-            items.append(item.get_dict())
-        util.arr_to_csv(items, self.__item_type.fields(), self.__db_path)
+        """
+        Rewrites the whole csv file from the list. In journaled mode this also compacts (clears) the journal.
+        Rows appended to the file by others since it was last read are added to the list first, so they're kept.
+        :return: None
+        """
+        with self.__lock.writing(), self.__stats.timed('rewrite_db'):
+            self.__read_appended(reload=False)
+            for writer in self.__writers.values():  # the list already holds whatever is still buffered
+                writer.discard()
+            items = []
+            for item in self.__list.values():
+                items.append(item.get_dict())
+            written = util.arr_to_csv(items, self.__item_type.fields(), self.__db_path)
+            if written:
+                self.__stats.count('bytes_rewritten', os.path.getsize(self.__db_path))
+                self.__file_mark = util.file_mark(self.__db_path)
+                self.__removed_ids.clear()
+            if written and self.__snapshot_path is not None:
+                self.__write_snapshot()
+            if written and self.__trusted:
+                self.__certify()
+            if self.__journaled:
+                if os.path.exists(self.__journal_path):
+                    os.remove(self.__journal_path)
+                self.__journal_size = 0
 
     def add(self, new_item, to_file: bool = True):
         """
-        Adds an object to the list
+        Adds an object to the list, giving it the list's next free ID if it was created without one.
         :param new_item: A Loan object to add
         :param to_file: whether the new loan should be written to file or not.
         :return: None
         """
-        if new_item.ID in self.__list:
-            raise ItemExistsError
-        self.__list[new_item.ID] = new_item
-        if to_file:
-            try:
-                util.append_csv(new_item.get_dict(), self.__db_path)
-            except FileNotFoundError:
-                self.rewrite_db()
+        with self.__lock.writing(), self.__stats.timed('add'):
+            self.__add_many([new_item], to_file)
+
+    def add_many(self, new_items, to_file: bool = True):
+        """
+        Adds objects to the list, writing them to file with a single append.
+        All items are checked before any is added, so either all of them are added or none are.
+        Items created without an ID are given a block of consecutive IDs.
+        :param new_items: iterable of objects of the list's type
+        :param to_file: whether the new items should be written to file or not.
+        :return: None
+        """
+        with self.__lock.writing(), self.__stats.timed('add_many'):
+            self.__add_many(new_items, to_file)
+
+    def __add_many(self, new_items, to_file: bool):
+        """
+        Adds objects to the list like add_many(), without taking the lock or recording the call in the stats.
+        Used by add(), add_many() and the loading methods, which hold the lock already.
+        :param new_items: iterable of objects of the list's type
+        :param to_file: whether the new items should be written to file or not.
+        :return: None
+        """
+        new_items = list(new_items)
+        new_ids = set()
+        unassigned = []  # items created without an ID
+        for new_item in new_items:
+            if not isinstance(new_item, self.__item_type):
+                raise TypeError("Cannot add " + str(type(new_item)) + " to ItemList")
+            if new_item.ID == -1:
+                unassigned.append(new_item)
+                continue
+            if new_item.ID in self.__list or new_item.ID in new_ids:
+                raise ItemExistsError
+            new_ids.add(new_item.ID)
+        for ID in new_ids:
+            self.__ids.claim(ID)
+        if len(unassigned) == 1:
+            unassigned[0].ID = self.__ids.allocate()
+        elif unassigned:
+            for new_item, ID in zip(unassigned, self.__ids.reserve(len(unassigned))):
+                new_item.ID = ID
+        if self.__loading and len(new_items) > 1:
+            self.__list.update((new_item.ID, new_item) for new_item in new_items)
+            self.__index_many(new_items)
+        else:
+            for new_item in new_items:
+                self.__list[new_item.ID] = new_item
+                self.__index_item(new_item)
+        if not to_file or not new_items:
+            return
+        rows = [new_item.get_dict() for new_item in new_items]
+        try:
+            if self.__journaled:
+                self.__append_journal(JOURNAL_ADD, rows)
+            else:
+                try:
+                    self.__append_rows(rows, self.__db_path)
+                except FileNotFoundError:
+                    self.rewrite_db()
+        except IOError:
+            for new_item in new_items:  # the write failed, take the batch out of the list again
+                del self.__list[new_item.ID]
+                self.__unindex_item(new_item)
+            for new_item in unassigned:
+                self.__ids.release(new_item.ID)
+                new_item.ID = -1
+            raise
 
     def remove(self, rem):
         """
@@ -120,22 +853,40 @@ class ItemList:
         :param rem: the item object to remove or its ID
         :return: None
         """
-        if isinstance(rem, int):  # remove by ID
-            if rem in self.__list:
-                removed = self.__list.pop(rem)
-                self.rewrite_db()
-                return removed
+        with self.__lock.writing(), self.__stats.timed('remove'):
+            if isinstance(rem, int):  # remove by ID
+                if rem in self.__list:
+                    removed = self.__list.pop(rem)
+                    self.__unindex_item(removed)
+                    self.__removed_ids.add(removed.ID)
+                    self.__write_removal(removed)
+                    self.__ids.release(removed.ID)
+                    return removed
+                else:
+                    raise ItemDoesNotExistError
+            elif isinstance(rem, self.__item_type):
+                if self.__list.get(rem.ID) == rem:
+                    removed = self.__list.pop(rem.ID)
+                    self.__unindex_item(removed)
+                    self.__removed_ids.add(removed.ID)
+                    self.__write_removal(removed)
+                    self.__ids.release(removed.ID)
+                    return removed
+                else:
+                    raise ItemDoesNotExistError
             else:
-                raise ItemDoesNotExistError
-        elif isinstance(rem, self.__item_type):
-            if rem in self.__list.values():
-                removed = self.__list.pop(rem.ID)
-                self.rewrite_db()
-                return removed
-            else:
-                raise ItemDoesNotExistError
+                raise TypeError("ItemList.remove() only accepts objects of the type they are assigned to or IDs")
+
+    def __write_removal(self, removed):
+        """
+        Persists the removal of an item: a tombstone record in journaled mode, a full rewrite otherwise.
+        :param removed: the removed item
+        :return: None
+        """
+        if self.__journaled:
+            self.__append_journal(JOURNAL_REMOVE, [{'id': removed.ID}])
         else:
-            raise TypeError("ItemList.remove() only accepts objects of the type they are assigned to or IDs")
+            self.rewrite_db()
 
     def get_by_property(self, search_field: str, search_value):
         """
@@ -144,10 +895,46 @@ class ItemList:
         :param search_value: property value to match
         :return: list of all matches
         """
+        with self.__lock.reading(), self.__stats.timed('get_by_property'):
+            if search_field not in self.__getters:
+                raise ValueError("Search field does not exist.")
+            if self.__cache is None or isinstance(search_value, int) \
+                    and (search_field == 'id' or search_field in self.__indexes):
+                return self.__search_property(search_field, search_value)
+            # Text searches are case-insensitive, so differently cased queries share their cached result
+            cache_value = search_value.lower() if isinstance(search_value, str) else search_value
+            cached = self.__cache.get((search_field, cache_value))
+            if cached is not None:
+                return list(cached)
+            results = self.__search_property(search_field, search_value)
+            self.__cached_values.setdefault(search_field, set()).add(cache_value)
+            self.__cache.put((search_field, cache_value), tuple(results))
+            return results
+
+    def __search_property(self, search_field: str, search_value):
+        """
+        Finds the items that match a get_by_property() search, using an index when one can answer it.
+        :param search_field: property name to search
+        :param search_value: property value to match
+        :return: list of all matches
+        """
         results = []
-        fields = self.__item_type.fields()
-        if search_field not in fields:
-            raise ValueError("Search field does not exist.")
+        if isinstance(search_value, int):  # exact match fields can be answered from an index
+            if search_field == 'id':
+                item = self.__list.get(search_value)
+                self.__stats.count('searches_by_id')
+                return [item] if item is not None else []
+            if search_field in self.__indexes:
+                results = list(self.__indexes[search_field].get(search_value, {}).values())
+                self.__stats.count('searches_by_index')
+                self.__stats.count('items_scanned', len(results))
+                return results
+        if isinstance(search_value, str) and search_field in self.__text_indexes \
+                and len(search_value) >= NGRAM_SIZE:
+            self.__stats.count('searches_by_text_index')
+            return self.__text_search(search_field, search_value.lower())
+        self.__stats.count('full_scans')
+        self.__stats.count('items_scanned', len(self.__list))
         for item in self:
             item_dict = item.get_dict()
             if isinstance(item_dict[search_field], str):
@@ -158,10 +945,358 @@ class ItemList:
                     results.append(item)
         return results
 
+    def __invalidate_cached(self, item):
+        """
+        Drops the cached search results an added or removed item matches (and that are now out of date).
+        :param item: the added or removed item
+        :return: None
+        """
+        for field, values in self.__cached_values.items():
+            value = self.__getters[field](item)
+            if isinstance(value, str):
+                text = value.lower()
+                stale = [query for query in values if isinstance(query, str) and query in text]
+            else:
+                stale = [value] if value in values else []
+            for query in stale:
+                values.discard(query)
+                self.__cache.invalidate((field, query))
+
+    def __forget_cached(self, key):
+        """
+        Stops tracking the search value of a result the cache dropped
+        :param key: (field, search value) cache key
+        :return: None
+        """
+        self.__cached_values.get(key[0], set()).discard(key[1])
+
+    def cache_stats(self):
+        """
+        Returns the size and hit/miss counts of the list's result cache (see util.LruCache.info())
+        :return: dictionary, None if the list has no cache
+        """
+        return self.__cache.info() if self.__cache is not None else None
+
+    def count_by_property(self, search_field: str, search_value):
+        """
+        Returns the amount of items that match a get_by_property() search, without building the list for indexed fields.
+        :param search_field: property name to search
+        :param search_value: property value to match
+        :return: int
+        """
+        with self.__lock.reading(), self.__stats.timed('count_by_property'):
+            if isinstance(search_value, int) and search_field in self.__indexes:
+                return len(self.__indexes[search_field].get(search_value, {}))
+            return len(self.get_by_property(search_field, search_value))
+
+    def __text_search(self, search_field: str, query: str):
+        """
+        Finds all items whose field contains the (lowercase) query using the field's n-gram index.
+        Only items that contain every n-gram of the query are compared against it.
+        :param search_field: n-gram indexed field to search
+        :param query: lowercase search string, at least NGRAM_SIZE characters long
+        :return: list of all matches
+        """
+        index = self.__text_indexes[search_field]
+        postings = []
+        for gram in ngrams(query):
+            if gram not in index:
+                return []
+            postings.append(index[gram])
+        postings.sort(key=len)
+        self.__stats.count('items_scanned', len(postings[0]))
+        results = []
+        for ID, item in postings[0].items():  # the rarest n-gram yields the smallest candidate set
+            if all(ID in posting for posting in postings[1:]) and query in self.__getters[search_field](item).lower():
+                results.append(item)
+        return results
+
+    def search(self, query: str, limit: int = 10):
+        """
+        Returns the items whose ranked fields (see the type's ranked_fields()) best match a query, best first.
+        Query words match whole words of the fields, tolerating typos, and results are ranked by BM25.
+        The search index is built on the first search and kept up to date from then on.
+        :param query: words to look for
+        :param limit: maximum amount of results
+        :return: list of items
+        """
+        fields = self.__item_type.ranked_fields()
+        if not fields:
+            raise ValueError("The list's type has no ranked fields.")
+        if self.__search_index is None:
+            with self.__lock.writing(), self.__stats.timed('build_search_index'):
+                if self.__search_index is None:
+                    getters = {field: self.__getters[field] for field in fields}
+                    self.__search_index = SearchIndex(getters, self.__list.values())
+        # Searching only reads the index, it's changed by add()/remove() under the write lock
+        with self.__lock.reading(), self.__stats.timed('search'):
+            return [item for _, item in self.__search_index.search(query, limit)]
+
+    def get_by_range(self, search_field: str, low=None, high=None):
+        """
+        Returns all items whose sort key on a sorted field is between low and high (inclusive), ordered by it.
+        :param search_field: a field in the type's sorted_fields()
+        :param low: lowest key to return (None for no lower bound), a datetime.date for date fields
+        :param high: highest key to return (None for no upper bound), a datetime.date for date fields
+        :return: list of all matches
+        """
+        with self.__lock.reading(), self.__stats.timed('get_by_range'):
+            start, end = self.__range_bounds(search_field, low, high)
+            self.__stats.count('items_scanned', end - start)
+            return [self.__list[ID] for _, ID in self.__sorted_indexes[search_field][start:end]]
+
+    def count_by_range(self, search_field: str, low=None, high=None):
+        """
+        Returns the amount of items a get_by_range() search would return, without building the list.
+        :param search_field: a field in the type's sorted_fields()
+        :param low: lowest key to count (None for no lower bound), a datetime.date for date fields
+        :param high: highest key to count (None for no upper bound), a datetime.date for date fields
+        :return: int
+        """
+        with self.__lock.reading(), self.__stats.timed('count_by_range'):
+            start, end = self.__range_bounds(search_field, low, high)
+            return end - start
+
+    def __range_bounds(self, search_field: str, low, high):
+        """
+        Finds the positions of a range of keys in a sorted index
+        :param search_field: a field in the type's sorted_fields()
+        :param low: lowest key (None for no lower bound)
+        :param high: highest key (None for no upper bound)
+        :return: (start, end) slice of the field's sorted index, empty when low is above high
+        """
+        if search_field not in self.__sorted_indexes:
+            raise ValueError("Search field has no sorted index.")
+        index = self.__sorted_indexes[search_field]
+        low, high = range_bound(low), range_bound(high)
+        start = 0 if low is None else bisect.bisect_left(index, (low,))
+        end = len(index) if high is None else bisect.bisect_right(index, (high, math.inf))
+        return start, max(start, end)
+
+    def query(self, conditions, order_by: str = None, descending: bool = False, limit: int = None):
+        """
+        Returns the items that match all of a list of conditions. The condition whose index gives the fewest
+        candidates is answered from the index, and only those candidates are tested against the other conditions.
+        Conditions are (field, operator, value) tuples:
+        ('eq', value) - equal to the value, ('in', values) - equal to one of the values,
+        ('range', (low, high)) - between low and high inclusive, either can be None (on sorted fields the
+        item's sort key is compared, like in get_by_range(), so dates are given as datetime.date),
+        ('prefix', text) / ('contains', text) - case-insensitive prefix / substring of a text field.
+        :param conditions: list of conditions (empty for all items)
+        :param order_by: field to order the results by (its sort key on sorted fields), None for the index's order
+        :param descending: whether to order from the highest value down
+        :param limit: maximum amount of results (None for all)
+        :return: list of matches
+        """
+        with self.__lock.reading(), self.__stats.timed('query'):
+            conditions = [(field, operation, tuple(map(range_bound, value)) if operation == 'range' else value)
+                          for field, operation, value in conditions]
+            matchers = [condition_matcher(self.__condition_getter(field, operation), operation, value)
+                        for field, operation, value in conditions]
+            if order_by is not None and order_by not in self.__getters:
+                raise ValueError("Order field does not exist.")
+            _, _, candidates = self.__plan(conditions)
+            in_order = False
+            if candidates is None:
+                self.__stats.count('full_scans')
+                if order_by in self.__sorted_indexes:  # walk the sorted index, so a limit stops the scan early
+                    index = self.__sorted_indexes[order_by]
+                    candidates = (self.__list[ID] for _, ID in (reversed(index) if descending else index))
+                    in_order = True
+                else:
+                    candidates = self.__list.values()
+            else:
+                self.__stats.count('queries_by_index')
+            early_stop = limit if order_by is None or in_order else None
+            results = []
+            scanned = 0
+            for item in candidates:
+                scanned += 1
+                if all(match(item) for match in matchers):
+                    results.append(item)
+                    if early_stop is not None and len(results) >= early_stop:
+                        break
+            self.__stats.count('items_scanned', scanned)
+            if order_by is not None and not in_order:
+                key = self.__condition_getter(order_by, 'range')
+                if limit is not None:  # partial sort of only the top results
+                    return (heapq.nlargest if descending else heapq.nsmallest)(limit, results, key=key)
+                results.sort(key=key, reverse=descending)
+            return results if limit is None else results[:limit]
+
+    def explain(self, conditions):
+        """
+        Describes how query() would find the candidates of a list of conditions
+        :param conditions: list of conditions, see query()
+        :return: description string, e.g. "hash index on custID (3 candidates)"
+        """
+        with self.__lock.reading():
+            candidate_count, description, _ = self.__plan(conditions)
+            return f"{description} ({candidate_count} candidates)"
+
+    def __condition_getter(self, field: str, operation: str):
+        """
+        Returns the function giving the value a condition on a field is tested against
+        :param field: a field in the type's fields()
+        :param operation: the condition's operator
+        :return: func(item)
+        """
+        if field not in self.__getters:
+            raise ValueError("Search field does not exist.")
+        if operation == 'range' and field in self.__sort_keys:
+            return self.__sort_keys[field]
+        return self.__getters[field]
+
+    def __plan(self, conditions):
+        """
+        Picks the condition whose index gives the fewest candidates. Candidate counts are taken from the index
+        sizes (the smallest n-gram posting for text conditions) without building the candidate lists.
+        :param conditions: list of conditions, see query()
+        :return: (candidate count, description, candidates iterable), candidates is None for a full scan
+        """
+        best = (len(self.__list), "full scan", None)
+        for field, operation, value in conditions:
+            if field == 'id' and operation in ('eq', 'in'):
+                found = [self.__list[ID] for ID in ([value] if operation == 'eq' else set(value)) if ID in self.__list]
+                plan = (len(found), "ID lookup", found)
+            elif field in self.__indexes and operation in ('eq', 'in'):
+                index = self.__indexes[field]
+                buckets = [index.get(key, {}) for key in ([value] if operation == 'eq' else set(value))]
+                plan = (sum(map(len, buckets)), f"hash index on {field}",
+                        (item for bucket in buckets for item in bucket.values()))
+            elif field in self.__sorted_indexes and operation == 'range':
+                index = self.__sorted_indexes[field]
+                start, end = self.__range_bounds(field, *value)
+                plan = (end - start, f"sorted index on {field}", (self.__list[ID] for _, ID in index[start:end]))
+            elif field in self.__text_indexes and operation in ('prefix', 'contains') \
+                    and isinstance(value, str) and len(value) >= NGRAM_SIZE:
+                index = self.__text_indexes[field]
+                rarest = min((index.get(gram, {}) for gram in ngrams(value.lower())), key=len)
+                plan = (len(rarest), f"n-gram index on {field}", rarest.values())
+            else:
+                continue
+            if best[2] is None or plan[0] < best[0]:  # any index beats a full scan
+                best = plan
+        return best
+
+    def stats(self):
+        """
+        Returns the performance stats recorded by an instrumented list (see util.OperationStats.snapshot()).
+        Buffered appends are counted when they're written to file.
+        :return: dictionary of the stats, None if the list isn't instrumented
+        """
+        recorded = self.__stats.snapshot()
+        if recorded is not None and self.__cache is not None:
+            recorded['cache'] = self.__cache.info()
+        if recorded is not None and self.__writers:
+            for path, writer in list(self.__writers.items()):
+                counter = 'bytes_journaled' if path == self.__journal_path else 'bytes_appended'
+                recorded['counters'][counter] = recorded['counters'].get(counter, 0) + writer.bytes_written
+        return recorded
+
+    def __sort_indexes(self):
+        """
+        Sorts the sorted indexes if entries were appended to them out of order while loading.
+        Sorting is deferred so loading a file doesn't pay for an insertion into the middle of a list per item.
+        :return: None
+        """
+        if self.__unsorted:
+            for index in self.__sorted_indexes.values():
+                index.sort()
+            self.__unsorted = False
+
+    def __index_item(self, item):
+        """
+        Adds an item to all of the list's secondary indexes.
+        :param item: the item to index
+        :return: None
+        """
+        for field, index in self.__indexes.items():
+            index.setdefault(self.__getters[field](item), {})[item.ID] = item
+        for field, index in self.__text_indexes.items():
+            for gram in ngrams(self.__getters[field](item).lower()):
+                index.setdefault(gram, {})[item.ID] = item
+        for field, index in self.__sorted_indexes.items():
+            entry = (self.__sort_keys[field](item), item.ID)
+            if not index or entry > index[-1]:
+                index.append(entry)
+            elif self.__loading:
+                index.append(entry)
+                self.__unsorted = True
+            else:
+                bisect.insort(index, entry)
+        if self.__search_index is not None:
+            self.__search_index.add(item)
+        if self.__cache is not None:
+            self.__invalidate_cached(item)
+
+    def __index_many(self, items: list):
+        """
+        Adds a batch of loaded items to all of the list's secondary indexes, one index at a time.
+        Their sorted index entries are appended and sorted when loading ends (see __sort_indexes()).
+        :param items: the items to index
+        :return: None
+        """
+        for field, index in self.__indexes.items():
+            getter = self.__getters[field]
+            for item in items:
+                index.setdefault(getter(item), {})[item.ID] = item
+        for field, index in self.__text_indexes.items():
+            getter = self.__getters[field]
+            for item in items:
+                for gram in ngrams(getter(item).lower()):
+                    index.setdefault(gram, {})[item.ID] = item
+        for field, index in self.__sorted_indexes.items():
+            key = self.__sort_keys[field]
+            index.extend((key(item), item.ID) for item in items)
+            self.__unsorted = True
+        if self.__search_index is not None:
+            self.__search_index.add_many(items)
+        if self.__cache is not None:
+            for item in items:
+                self.__invalidate_cached(item)
+
+    def __unindex_item(self, item):
+        """
+        Removes an item from all of the list's secondary indexes.
+        :param item: the item to remove from the indexes
+        :return: None
+        """
+        for field, index in self.__indexes.items():
+            value = self.__getters[field](item)
+            bucket = index.get(value)
+            if bucket is not None:
+                bucket.pop(item.ID, None)
+                if not bucket:
+                    del index[value]
+        for field, index in self.__text_indexes.items():
+            for gram in ngrams(self.__getters[field](item).lower()):
+                posting = index.get(gram)
+                if posting is not None:
+                    posting.pop(item.ID, None)
+                    if not posting:
+                        del index[gram]
+        if self.__search_index is not None:
+            self.__search_index.remove(item)
+        if self.__cache is not None:
+            self.__invalidate_cached(item)
+        if self.__sorted_indexes:
+            self.__sort_indexes()
+        for field, index in self.__sorted_indexes.items():
+            entry = (self.__sort_keys[field](item), item.ID)
+            position = bisect.bisect_left(index, entry)
+            if position < len(index) and index[position] == entry:
+                del index[position]
+
     def get_list_type(self):
         return self.__item_type
 
     def __iter__(self):
+        if self.__concurrent:
+            with self.__lock.reading():
+                snapshot = list(self.__list.values())
+            yield from snapshot
+            return
         for ID, item in self.__list.items():
             yield item
 
@@ -173,19 +1308,21 @@ class ItemList:
 
     def __iadd__(self, other):
         """
-        Adds another list or loan to self using the add() method
-        :param other: A LoanList or Loan object
+        Adds another list, a list of items or a single item to self using the add_many() method
+        :param other: An ItemList, a list of items or an item object
         :return: self (object on the left of the symbol)
         """
         if isinstance(other, ItemList):
-            if isinstance(other.get_list_type(), self.__item_type):
-                for item in other:
-                    self.add(item)
+            if other.get_list_type() is self.__item_type:
+                self.add_many(other)
                 return self
             raise TypeError("Cannot add list of type " +
-                            str(type(other.__item_type)) +
+                            str(other.get_list_type()) +
                             " to list of type " +
-                            str(type(self.__item_type)))
+                            str(self.__item_type))
+        if isinstance(other, (list, tuple)):
+            self.add_many(other)
+            return self
         if isinstance(other, self.__item_type):
             self.add(other)
             return self
@@ -194,6 +1331,12 @@ class ItemList:
     def __len__(self):
         return len(self.__list)
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
 
 
 
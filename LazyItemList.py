@@ -0,0 +1,91 @@
+import threading
+import time
+
+
+class LazyItemList:
+    """
+    Stands in for an ItemList (or SqliteItemList) that is only created, loading its file, when it's first used.
+    Every attribute and operator is passed on to the list, creating it on first access.
+    The list can also be loaded ahead of time in a background thread with prefetch().
+    """
+    def __init__(self, factory, on_load=None):
+        """
+        :param factory: func() that creates the list, e.g. lambda: ItemList(Book, "./CSVs/books.csv")
+        :param on_load: optional func(seconds) called after the list is created with the time it took
+        """
+        self.__factory = factory
+        self.__on_load = on_load
+        self.__list = None
+        self.__load_lock = threading.Lock()
+        self.__prefetch_thread = None
+        self.load_time = None
+
+    def load(self):
+        """
+        Creates the list if it wasn't created yet (waits for a prefetch that is already loading it).
+        :return: the list
+        """
+        if self.__list is None:
+            with self.__load_lock:
+                if self.__list is None:
+                    start = time.perf_counter()
+                    self.__list = self.__factory()
+                    self.load_time = time.perf_counter() - start
+                    if self.__on_load is not None:
+                        self.__on_load(self.load_time)
+        return self.__list
+
+    def loaded(self):
+        return self.__list is not None
+
+    def prefetch(self):
+        """
+        Starts loading the list in a background (daemon) thread. Uses of the list wait for it to finish.
+        :return: None
+        """
+        if self.__list is None and self.__prefetch_thread is None:
+            self.__prefetch_thread = threading.Thread(target=self.load, daemon=True)
+            self.__prefetch_thread.start()
+
+    def stats(self):
+        """
+        Returns the list's stats (see ItemList.stats()) without loading it
+        :return: dictionary of the stats, None if the list isn't loaded or instrumented
+        """
+        return self.__list.stats() if self.__list is not None else None
+
+    def __getattr__(self, name):
+        if name.startswith('_LazyItemList__'):  # the proxy's own attributes, missing before __init__ set them
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __iter__(self):
+        return iter(self.load())
+
+    def __len__(self):
+        return len(self.load())
+
+    def __iadd__(self, other):
+        """
+        Adds to the list with its += operator
+        :param other: anything the list's += operator accepts
+        :return: self (object on the left of the symbol)
+        """
+        lazy_list = self.load()
+        lazy_list += other
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.__list is not None and hasattr(self.__list, '__exit__'):
+            self.__list.__exit__(exc_type, exc_val, exc_tb)
+
+    def __repr__(self):
+        if self.__list is None:
+            return "<LazyItemList (not loaded)>"
+        return f"<LazyItemList of {self.__list!r}>"
+
+    def __str__(self):
+        return str(self.load())
@@ -0,0 +1,332 @@
+import bisect
+import heapq
+import itertools
+import math
+import re
+
+TOKEN_PATTERN = re.compile(r"\w+")
+BM25_K1 = 1.2
+BM25_B = 0.75
+TYPO_PENALTY = 0.5  # score factor per edit between a query token and the indexed token it matched
+NORM_DRIFT = 0.05  # relative change of the average item length after which the length norms are recomputed
+PREFIX_PENALTY = 0.5  # score factor of an indexed token a query token is only the beginning of
+PREFIX_EXPANSIONS = 64  # most indexed tokens a query token matches as their beginning
+BOUND_MARGIN = 1e-9  # relative margin of the pruning bounds, for rounding errors of the summed scores
+
+
+def tokenize(text: str):
+    """
+    Splits text into lowercase word tokens
+    :param text: string to split
+    :return: list of tokens
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def allowed_typos(token: str):
+    """
+    Returns how many edits a query token may be away from an indexed token, longer words tolerate more typos.
+    Numbers (e.g. years) have to match exactly.
+    :param token: query token
+    :return: int
+    """
+    if len(token) < 4 or token.isdecimal():
+        return 0
+    if len(token) < 8:
+        return 1
+    return 2
+
+
+def deletions(token: str, distance: int):
+    """
+    Returns the strings made by deleting up to distance characters from a token (including the token itself).
+    Two tokens within an edit distance have a deletion in common, so these find typo candidates without
+    comparing a query against the whole vocabulary.
+    :param token: string
+    :param distance: maximum amount of deleted characters
+    :return: set of strings
+    """
+    variants = {token}
+    for length in range(max(len(token) - distance, 1), len(token)):
+        variants.update(''.join(kept) for kept in itertools.combinations(token, length))
+    return variants
+
+
+def edit_distance(first: str, second: str, limit: int):
+    """
+    Damerau-Levenshtein distance (optimal string alignment) between two strings, giving up above a limit
+    :param first: string
+    :param second: string
+    :param limit: largest distance of interest
+    :return: the distance, or limit + 1 if it's larger than the limit
+    """
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    before_previous = None
+    previous = list(range(len(second) + 1))
+    for i, first_char in enumerate(first, 1):
+        current = [i] + [0] * len(second)
+        for j, second_char in enumerate(second, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (first_char != second_char))
+            if i > 1 and j > 1 and first_char == second[j - 2] and first[i - 2] == second_char:
+                current[j] = min(current[j], before_previous[j - 2] + 1)  # transposition
+        if min(current) > limit:
+            return limit + 1
+        before_previous, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+
+class SearchIndex:
+    """
+    A token inverted index over text fields of items that ranks matches of a query by BM25.
+    Query words match indexed words up to a few typos away (see allowed_typos()) and the indexed words they're the
+    beginning of, both scored lower than exact matches.
+    Only add()/remove() change the index, search() just reads it, so searches may run at the same time as each
+    other (but not as changes).
+    """
+    def __init__(self, getters: dict, items=()):
+        """
+        :param getters: {field name: func(item) giving the field's text} of the fields to index
+        :param items: items to index right away
+        """
+        self.__getters = getters
+        self.__postings = {}  # token -> {item ID: term frequency}
+        self.__lengths = {}  # item ID -> amount of tokens
+        self.__items = {}
+        self.__total_length = 0
+        self.__norms = {}  # item ID -> BM25 length norm, k1 * (1 - b + b * length / average length)
+        self.__norm_average = None  # the average length the norms were computed with
+        self.__max_impacts = {}  # token -> upper bound of frequency / (frequency + norm) over the token's items
+        self.__variants = {}  # deletion variant -> set of indexed tokens it was made from
+        self.__vocabulary = []  # the indexed tokens, sorted, to find the ones starting with a query token
+        self.add_many(items)
+
+    def add(self, item):
+        """
+        Indexes an item's fields
+        :param item: the item to index (by its ID)
+        :return: None
+        """
+        frequencies, new_tokens = self.__index(item)
+        for token in new_tokens:
+            bisect.insort(self.__vocabulary, token)
+        if not self.__update_norms():
+            self.__add_norm(item.ID, frequencies)
+
+    def add_many(self, items):
+        """
+        Indexes the fields of many items, faster than adding them one by one
+        :param items: iterable of items to index (by their IDs)
+        :return: None
+        """
+        indexed = [(item.ID, *self.__index(item)) for item in items]
+        if any(new_tokens for _, _, new_tokens in indexed):
+            self.__vocabulary = sorted(self.__postings)
+        if not self.__update_norms():
+            for ID, frequencies, _ in indexed:
+                self.__add_norm(ID, frequencies)
+
+    def __index(self, item):
+        """
+        Adds an item's tokens to the postings, without computing its length norm
+        :param item: the item to index
+        :return: ({token: frequency} of the item, list of tokens that weren't indexed before)
+        """
+        tokens = [token for getter in self.__getters.values() for token in tokenize(getter(item))]
+        self.__items[item.ID] = item
+        self.__lengths[item.ID] = len(tokens)
+        self.__total_length += len(tokens)
+        frequencies = {}
+        new_tokens = []
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+        for token, frequency in frequencies.items():
+            posting = self.__postings.get(token)
+            if posting is None:
+                posting = self.__postings[token] = {}
+                new_tokens.append(token)
+                for variant in deletions(token, allowed_typos(token)):
+                    self.__variants.setdefault(variant, set()).add(token)
+            posting[item.ID] = frequency
+        return frequencies, new_tokens
+
+    def remove(self, item):
+        """
+        Removes an item from the index
+        :param item: the item to remove (by its ID)
+        :return: None
+        """
+        if self.__items.pop(item.ID, None) is None:
+            return
+        self.__total_length -= self.__lengths.pop(item.ID)
+        self.__norms.pop(item.ID, None)
+        for getter in self.__getters.values():
+            for token in tokenize(getter(item)):
+                posting = self.__postings.get(token)
+                if posting is None or posting.pop(item.ID, None) is None or posting:
+                    continue
+                del self.__postings[token]
+                del self.__max_impacts[token]
+                del self.__vocabulary[bisect.bisect_left(self.__vocabulary, token)]
+                for variant in deletions(token, allowed_typos(token)):
+                    tokens = self.__variants[variant]
+                    tokens.discard(token)
+                    if not tokens:
+                        del self.__variants[variant]
+        # The upper bounds of the removed item's tokens may now be too high, which keeps them valid bounds
+        self.__update_norms()
+
+    @staticmethod
+    def __norm(length: int, average: float):
+        return BM25_K1 * (1 - BM25_B + BM25_B * length / average)
+
+    def __update_norms(self):
+        """
+        Recomputes the items' length norms (and the tokens' upper bounds) if the average item length moved away
+        from the one they were computed with. Norms of a slightly outdated average rank the same, so changes
+        don't recompute them every time.
+        :return: whether the norms were recomputed (otherwise new items' norms still have to be added)
+        """
+        if not self.__items:
+            self.__norms, self.__max_impacts, self.__norm_average = {}, {}, None
+            return True
+        average = self.__total_length / len(self.__items) or 1
+        if self.__norm_average is not None and abs(average - self.__norm_average) <= NORM_DRIFT * self.__norm_average:
+            return False
+        norms = {ID: self.__norm(length, average) for ID, length in self.__lengths.items()}
+        self.__max_impacts = {token: max(frequency / (frequency + norms[ID]) for ID, frequency in posting.items())
+                              for token, posting in self.__postings.items()}
+        self.__norms = norms
+        self.__norm_average = average
+        return True
+
+    def __add_norm(self, ID: int, frequencies: dict):
+        """
+        Computes a new item's length norm with the current average, and raises its tokens' upper bounds to it
+        :param ID: the item's ID
+        :param frequencies: {token: frequency} of the item
+        :return: None
+        """
+        norm = self.__norms[ID] = self.__norm(self.__lengths[ID], self.__norm_average)
+        for token, frequency in frequencies.items():
+            impact = frequency / (frequency + norm)
+            if impact > self.__max_impacts.get(token, 0):
+                self.__max_impacts[token] = impact
+
+    def __matching_tokens(self, query_token: str):
+        """
+        Finds the indexed tokens a query token matches: exactly, with typos or as their beginning
+        :param query_token: a token of the query
+        :return: {indexed token: score factor} dictionary
+        """
+        limit = allowed_typos(query_token)
+        matches = {}
+        if limit == 0:
+            if query_token in self.__postings:
+                matches[query_token] = 1
+        else:
+            candidates = set()
+            for variant in deletions(query_token, limit):
+                candidates.update(self.__variants.get(variant, ()))
+            for token in candidates:
+                distance = edit_distance(query_token, token, min(limit, allowed_typos(token)))
+                if distance <= limit:
+                    matches[token] = TYPO_PENALTY ** distance
+        start = bisect.bisect_right(self.__vocabulary, query_token)
+        for token in self.__vocabulary[start:start + PREFIX_EXPANSIONS]:
+            if not token.startswith(query_token):
+                break
+            matches[token] = max(matches.get(token, 0), PREFIX_PENALTY)
+        return matches
+
+    def search(self, query: str, limit: int = 10):
+        """
+        Returns the items that best match a query, best first
+        :param query: words to look for
+        :param limit: maximum amount of results
+        :return: list of (score, item) tuples
+        """
+        if not self.__items:
+            return []
+        item_count = len(self.__items)
+        weighted = []  # {matched indexed token: weight} of each query token
+        for query_token in set(tokenize(query)):
+            matches = self.__matching_tokens(query_token)
+            idfs = {token: math.log(1 + (item_count - len(self.__postings[token]) + 0.5)
+                                    / (len(self.__postings[token]) + 0.5)) for token in matches}
+            # A rare word a query token only resembles shouldn't weigh more than the query token itself
+            highest_idf = idfs.get(query_token, math.inf)
+            token_weights = {token: min(idfs[token], highest_idf) * factor * (BM25_K1 + 1)
+                             for token, factor in matches.items()}
+            if token_weights:
+                weighted.append(token_weights)
+        if not weighted:
+            return []
+        top = self.__top_matching_all(weighted, limit) if len(weighted) > 1 else None
+        if top is None:
+            top = self.__top(self.__scores(weighted), limit)
+        return [(score, self.__items[ID]) for ID, score in top]
+
+    def __top_matching_all(self, weighted: list, limit: int):
+        """
+        Ranks only the items matching every query token, which are usually far fewer than the items matching any.
+        An item missing a query token scores at most the upper bounds of the other query tokens (max-score
+        pruning), so if the top items matching all of them score more than that, they're the overall top items.
+        :param weighted: {matched indexed token: weight} of each query token
+        :param limit: maximum amount of results
+        :return: list of (ID, score) tuples, None if the top items couldn't be found this way
+        """
+        sizes = [sum(len(self.__postings[token]) for token in token_weights) for token_weights in weighted]
+        candidates = None
+        for _, token_weights in sorted(zip(sizes, weighted), key=lambda entry: entry[0]):
+            matched = set().union(*(self.__postings[token].keys() for token in token_weights))
+            candidates = matched if candidates is None else candidates & matched
+            if not candidates:
+                return None
+        top = self.__top(self.__scores(weighted, candidates), limit)
+        if len(top) < limit:
+            return None
+        bounds = [max(weight * self.__max_impacts[token] for token, weight in token_weights.items())
+                  for token_weights in weighted]
+        if top[-1][1] <= (sum(bounds) - min(bounds)) * (1 + BOUND_MARGIN):
+            return None
+        return top
+
+    def __scores(self, weighted: list, candidates: set = None):
+        """
+        Computes the BM25 scores of the items matching a query
+        :param weighted: {matched indexed token: weight} of each query token
+        :param candidates: IDs of the only items to score (None for all matching items)
+        :return: {item ID: score} dictionary
+        """
+        norms = self.__norms
+        scores = {}
+        for token_weights in weighted:
+            # An item is scored by the best indexed token a query token matched in it
+            best = scores if len(token_weights) == 1 else {}
+            for token, weight in token_weights.items():
+                posting = self.__postings[token]
+                if candidates is None:
+                    entries = posting.items()
+                else:
+                    entries = [(ID, posting[ID]) for ID in candidates if ID in posting]
+                if best is scores:
+                    for ID, frequency in entries:
+                        scores[ID] = scores.get(ID, 0) + weight * frequency / (frequency + norms[ID])
+                    continue
+                for ID, frequency in entries:
+                    score = weight * frequency / (frequency + norms[ID])
+                    if score > best.get(ID, 0):
+                        best[ID] = score
+            if best is not scores:
+                for ID, score in best.items():
+                    scores[ID] = scores.get(ID, 0) + score
+        return scores
+
+    @staticmethod
+    def __top(scores: dict, limit: int):
+        # A bounded heap picks the top results without sorting all matches (ties go to the lower ID)
+        return heapq.nlargest(limit, scores.items(), key=lambda entry: (entry[1], -entry[0]))
+
+    def __len__(self):
+        return len(self.__items)
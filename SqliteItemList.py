@@ -0,0 +1,461 @@
+import os
+import sqlite3
+import threading
+import warnings
+import util
+from ItemList import ItemList, IdAllocator, ItemExistsError, ItemDoesNotExistError, create_item, restore_item, \
+    range_bound, field_getter
+from SearchIndex import SearchIndex
+
+IMPORT_CHUNK_ROWS = 1000  # rows inserted by one statement of an import
+SELECT_BATCH_ROWS = 500  # rows fetched at a time while iterating over a query's results
+
+class SqliteItemList:
+    """
+    An ItemList stored in an sqlite database (one table per item type) instead of being held in memory.
+    Supports the same add/remove/get_by_property/iteration interface as ItemList, csv is used for import/export.
+    The list may be used from any thread (e.g. after LazyItemList.prefetch() created it in another one), its
+    connection is used by one thread at a time.
+    """
+    def __init__(self, item_type, db_path, csv_path: str = None):
+        """
+        :param item_type: Type of the items in the list (Book, Customer or Loan)
+        :param db_path: Path to the sqlite database file (shared by all lists)
+        :param csv_path: csv file to import from when the list's table is created
+        """
+        self.__item_type = item_type
+        self.__db_path = db_path
+        self.__table = item_type.__name__.lower() + 's'
+        self.__fields = item_type.fields()
+        self.__sort_keys = item_type.sorted_fields()
+        self.__search_index = None  # built on the first search()
+        util.verify_path(db_path)
+        self.__conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.__lock = threading.RLock()  # guards the connection and the search index
+        self.__conn.create_function('py_lower', 1, str.lower, deterministic=True)
+        # New items are given IDs above the stored ones
+        self.__ids = IdAllocator()
+        created = self.__init_table()
+        if not created:
+            self.__add_sort_columns()
+        max_id = self.__conn.execute(f'SELECT MAX("id") FROM "{self.__table}"').fetchone()[0]
+        if max_id is not None:
+            self.__ids.claim(max_id)
+        if created and csv_path is not None and os.path.exists(csv_path):
+            self.import_csv(csv_path)
+
+    def __init_table(self):
+        """
+        Creates the list's table and its indexes if they don't exist.
+        :return: True if the table was created
+        """
+        exists = self.__conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                     (self.__table,)).fetchone()
+        if exists:
+            return False
+        columns = [f'"{field}"' for field in self.__fields] + [f'"{field}_key"' for field in self.__sort_keys]
+        columns = ', '.join('"id" INTEGER NOT NULL UNIQUE' if column == '"id"' else column for column in columns)
+        indexed = list(self.__item_type.indexed_fields())
+        if 'name' in self.__fields:
+            indexed.append('name')
+        indexed += [f'{field}_key' for field in self.__sort_keys]
+        with self.__conn:
+            self.__conn.execute(f'CREATE TABLE "{self.__table}" ({columns})')
+            for field in indexed:
+                self.__conn.execute(f'CREATE INDEX "{self.__table}_{field}" ON "{self.__table}" ("{field}")')
+        return True
+
+    def __add_sort_columns(self):
+        """
+        Adds the sort key columns (and their indexes) of sorted fields that an existing table doesn't have yet,
+        filled from the stored items.
+        :return: None
+        """
+        existing = {row[1] for row in self.__conn.execute(f'PRAGMA table_info("{self.__table}")')}
+        missing = {field: key for field, key in self.__sort_keys.items() if f'{field}_key' not in existing}
+        if not missing:
+            return
+        rows = [[key(item) for key in missing.values()] + [item.ID] for item in self.__select()]
+        assignments = ', '.join(f'"{field}_key" = ?' for field in missing)
+        with self.__conn:
+            for field in missing:
+                self.__conn.execute(f'ALTER TABLE "{self.__table}" ADD COLUMN "{field}_key"')
+            self.__conn.executemany(f'UPDATE "{self.__table}" SET {assignments} WHERE "id" = ?', rows)
+            for field in missing:
+                self.__conn.execute(f'CREATE INDEX "{self.__table}_{field}_key" ON "{self.__table}" ("{field}_key")')
+
+    def __restore(self, row):
+        """
+        Creates an item object from a database row
+        :param row: tuple of values ordered like the type's fields()
+        :return: Object of the list's type
+        """
+        return restore_item(item_type=self.__item_type, **dict(zip(self.__fields, row)))
+
+    def __select(self, where: str = '', parameters: tuple = (), order: str = 'rowid', limit: int = None):
+        """
+        Yields the items matching an sql condition, in insertion order
+        :param where: sql WHERE clause (empty for all items)
+        :param parameters: parameters of the WHERE clause
+        :param order: sql ORDER BY expression
+        :param limit: maximum amount of items (None for all)
+        :return: generator of items
+        """
+        columns = ', '.join(f'"{field}"' for field in self.__fields)
+        query = f'SELECT {columns} FROM "{self.__table}" {where} ORDER BY {order}'
+        if limit is not None:
+            query += f' LIMIT {int(limit)}'
+        # The rows are fetched in batches so other threads can use the connection while the items are consumed
+        with self.__lock:
+            cursor = self.__conn.execute(query, parameters)
+            rows = cursor.fetchmany(SELECT_BATCH_ROWS)
+        while rows:
+            for row in rows:
+                yield self.__restore(row)
+            with self.__lock:
+                rows = cursor.fetchmany(SELECT_BATCH_ROWS)
+
+    def import_csv(self, path):
+        """
+        Imports items from a csv file, in a single transaction.
+        Rows are inserted in chunks; a chunk with a clashing ID is inserted again row by row to skip the clashes.
+        :param path: Path to a csv file
+        :return: None
+        """
+        fail_count = 0
+        success_count = 0
+        new_items = []
+        for data in util.iter_csv(path):
+            try:
+                new_items.append(create_item(item_type=self.__item_type, **data))
+            except (ValueError, TypeError) as e:
+                warnings.warn("Line parse failed. " + str(e))
+                fail_count += 1
+        with self.__lock, self.__conn:
+            self.__conn.execute('BEGIN')  # savepoints released outside a transaction would commit on their own
+            for start in range(0, len(new_items), IMPORT_CHUNK_ROWS):
+                chunk = new_items[start:start + IMPORT_CHUNK_ROWS]
+                self.__conn.execute('SAVEPOINT import_chunk')
+                try:
+                    self.__insert(chunk)
+                    inserted = chunk
+                except sqlite3.IntegrityError:
+                    # Undo the rows inserted before the clash. A failed single row insert undoes itself
+                    self.__conn.execute('ROLLBACK TO import_chunk')
+                    inserted = []
+                    for new_item in chunk:
+                        try:
+                            self.__insert([new_item])
+                        except sqlite3.IntegrityError:
+                            warnings.warn("Cannot create 2 items with identical IDs")
+                            fail_count += 1
+                        else:
+                            inserted.append(new_item)
+                self.__conn.execute('RELEASE import_chunk')
+                success_count += len(inserted)
+                if self.__search_index is not None:
+                    self.__search_index.add_many(inserted)
+        print("{0} items of type {2} imported from CSV ({0} succeeded, {1} failed)".format(success_count,
+                                                                                           fail_count,
+                                                                                           self.__item_type))
+
+    def export_csv(self, path):
+        """
+        Writes all items to a csv file.
+        :param path: Path to a csv file
+        :return: None
+        """
+        util.arr_to_csv((item.get_dict() for item in self), self.__fields, path)
+
+    def add(self, new_item, *_, **__):
+        """
+        Adds an object to the list
+        :param new_item: An object of the list's type
+        :return: None
+        """
+        self.add_many([new_item])
+
+    def add_many(self, new_items, *_, **__):
+        """
+        Adds objects to the list in a single transaction, either all of them are added or none are.
+        Items created without an ID are given a block of consecutive IDs.
+        :param new_items: iterable of objects of the list's type
+        :return: None
+        """
+        new_items = list(new_items)
+        with self.__lock:
+            try:
+                with self.__conn:
+                    self.__insert(new_items)
+            except sqlite3.IntegrityError:
+                raise ItemExistsError
+            if self.__search_index is not None:
+                self.__search_index.add_many(new_items)
+
+    def __insert(self, new_items: list):
+        """
+        Inserts objects into the table within the current transaction, giving the ones without an ID new IDs.
+        If the insert fails, items keep the IDs they had but rows inserted before the failing one stay inserted.
+        :param new_items: list of objects of the list's type
+        :return: None
+        """
+        for new_item in new_items:
+            if not isinstance(new_item, self.__item_type):
+                raise TypeError("Cannot add " + str(type(new_item)) + " to ItemList")
+            if new_item.ID != -1:
+                self.__ids.claim(new_item.ID)
+        unassigned = [new_item for new_item in new_items if new_item.ID == -1]
+        for new_item, ID in zip(unassigned, self.__ids.reserve(len(unassigned))):
+            new_item.ID = ID
+        rows = []
+        for new_item in new_items:
+            item_dict = new_item.get_dict()
+            rows.append([item_dict[field] for field in self.__fields] +
+                        [key(new_item) for key in self.__sort_keys.values()])
+        columns = [f'"{field}"' for field in self.__fields] + [f'"{field}_key"' for field in self.__sort_keys]
+        placeholders = ', '.join('?' for _ in columns)
+        try:
+            self.__conn.executemany(f'INSERT INTO "{self.__table}" ({", ".join(columns)}) VALUES ({placeholders})',
+                                    rows)
+        except sqlite3.IntegrityError:
+            for new_item in unassigned:
+                new_item.ID = -1
+            raise
+
+    def remove(self, rem):
+        """
+        Removes an item from the list, raises ItemDoesNotExistError if not found.
+        :param rem: the item object to remove or its ID
+        :return: the removed item
+        """
+        if not isinstance(rem, (int, self.__item_type)):
+            raise TypeError("ItemList.remove() only accepts objects of the type they are assigned to or IDs")
+        with self.__lock:
+            if isinstance(rem, int):  # remove by ID
+                found = self.get_by_property('id', rem)
+            else:
+                found = [item for item in self.get_by_property('id', rem.ID) if item == rem]
+            if not found:
+                raise ItemDoesNotExistError
+            with self.__conn:
+                self.__conn.execute(f'DELETE FROM "{self.__table}" WHERE "id" = ?', (found[0].ID,))
+            if self.__search_index is not None:
+                self.__search_index.remove(found[0])
+        return found[0]
+
+    def __property_condition(self, search_field: str, search_value):
+        """
+        Builds the sql condition matching a get_by_property() search
+        :param search_field: property name to search
+        :param search_value: property value to match
+        :return: (WHERE clause, parameters) tuple
+        """
+        if search_field not in self.__fields:
+            raise ValueError("Search field does not exist.")
+        if isinstance(search_value, str):
+            where = f'WHERE typeof("{search_field}") = \'text\' AND instr(py_lower("{search_field}"), ?) > 0'
+            return where, (search_value.lower(),)
+        return f'WHERE "{search_field}" = ?', (search_value,)
+
+    def get_by_property(self, search_field: str, search_value):
+        """
+        Returns all items that match a search (case-insensitive substring for text, equality otherwise).
+        :param search_field: property name to search
+        :param search_value: property value to match
+        :return: list of all matches
+        """
+        return list(self.__select(*self.__property_condition(search_field, search_value)))
+
+    def count_by_property(self, search_field: str, search_value):
+        """
+        Returns the amount of items that match a get_by_property() search.
+        :param search_field: property name to search
+        :param search_value: property value to match
+        :return: int
+        """
+        where, parameters = self.__property_condition(search_field, search_value)
+        return self.__count(where, parameters)
+
+    def get_by_range(self, search_field: str, low=None, high=None):
+        """
+        Returns all items whose sort key on a sorted field is between low and high (inclusive), ordered by it.
+        :param search_field: a field in the type's sorted_fields()
+        :param low: lowest key to return (None for no lower bound), a datetime.date for date fields
+        :param high: highest key to return (None for no upper bound), a datetime.date for date fields
+        :return: list of all matches
+        """
+        if search_field not in self.__sort_keys:
+            raise ValueError("Search field has no sorted index.")
+        where, parameters = self.__query_where([(search_field, 'range', (low, high))])
+        return list(self.__select(where, parameters, order=f'"{search_field}_key", "id"'))
+
+    def search(self, query: str, limit: int = 10):
+        """
+        Returns the items whose ranked fields best match a query, best first, see ItemList.search().
+        The search index is built from the table on the first search and then kept up to date with this list's
+        add/remove calls (changes made to the database by other connections aren't seen).
+        :param query: words to look for
+        :param limit: maximum amount of results
+        :return: list of items
+        """
+        fields = self.__item_type.ranked_fields()
+        if not fields:
+            raise ValueError("The list's type has no ranked fields.")
+        with self.__lock:
+            if self.__search_index is None:
+                self.__search_index = SearchIndex({field: field_getter(self.__item_type, field) for field in fields},
+                                                  self)
+            return [item for _, item in self.__search_index.search(query, limit)]
+
+    def count_by_range(self, search_field: str, low=None, high=None):
+        """
+        Returns the amount of items a get_by_range() search would return.
+        :param search_field: a field in the type's sorted_fields()
+        :param low: lowest key to count (None for no lower bound), a datetime.date for date fields
+        :param high: highest key to count (None for no upper bound), a datetime.date for date fields
+        :return: int
+        """
+        if search_field not in self.__sort_keys:
+            raise ValueError("Search field has no sorted index.")
+        where, parameters = self.__query_where([(search_field, 'range', (low, high))])
+        return self.__count(where, parameters)
+
+    def __count(self, where: str = '', parameters: tuple = ()):
+        """
+        Returns the amount of items matching an sql condition
+        :param where: sql WHERE clause (empty for all items)
+        :param parameters: parameters of the WHERE clause
+        :return: int
+        """
+        with self.__lock:
+            return self.__conn.execute(f'SELECT COUNT(*) FROM "{self.__table}" {where}', parameters).fetchone()[0]
+
+    def __query_condition(self, field: str, operation: str, value):
+        """
+        Builds the sql condition of a query() condition
+        :param field: a field in the type's fields()
+        :param operation: one of ItemList.QUERY_OPERATORS
+        :param value: the condition's value
+        :return: (sql expression, parameters) tuple
+        """
+        if field not in self.__fields:
+            raise ValueError("Search field does not exist.")
+        column = f'"{field}"'
+        if operation == 'eq':
+            return f'{column} = ?', [value]
+        if operation == 'in':
+            values = list(value)
+            return f'{column} IN ({", ".join("?" * len(values))})', values
+        if operation == 'range':
+            if field in self.__sort_keys:  # ranges on sorted fields compare the sort key, like get_by_range()
+                column = f'"{field}_key"'
+            low, high = map(range_bound, value)
+            conditions = [f'{column} >= ?'] * (low is not None) + [f'{column} <= ?'] * (high is not None)
+            return ' AND '.join(conditions) or '1', [bound for bound in (low, high) if bound is not None]
+        if operation in ('prefix', 'contains'):
+            if not isinstance(value, str):
+                raise TypeError(f"A {operation} condition needs a string")
+            if operation == 'prefix':
+                return f'typeof({column}) = \'text\' AND substr(py_lower({column}), 1, ?) = ?', \
+                    [len(value), value.lower()]
+            return f'typeof({column}) = \'text\' AND instr(py_lower({column}), ?) > 0', [value.lower()]
+        raise ValueError(f"Unknown query operator: {operation}")
+
+    def __query_where(self, conditions):
+        """
+        Builds the sql WHERE clause of a list of query() conditions
+        :param conditions: list of (field, operator, value) conditions
+        :return: (WHERE clause, parameters) tuple
+        """
+        expressions = []
+        parameters = []
+        for field, operation, value in conditions:
+            expression, condition_parameters = self.__query_condition(field, operation, value)
+            expressions.append(f'({expression})')
+            parameters += condition_parameters
+        return ('WHERE ' + ' AND '.join(expressions) if expressions else ''), tuple(parameters)
+
+    def query(self, conditions, order_by: str = None, descending: bool = False, limit: int = None):
+        """
+        Returns the items that match all of a list of conditions, see ItemList.query()
+        :param conditions: list of (field, operator, value) conditions (empty for all items)
+        :param order_by: field to order the results by (its sort key on sorted fields), None for insertion order
+        :param descending: whether to order from the highest value down
+        :param limit: maximum amount of results (None for all)
+        :return: list of matches
+        """
+        order = 'rowid'
+        if order_by is not None:
+            if order_by not in self.__fields:
+                raise ValueError("Order field does not exist.")
+            order = f'"{order_by}_key"' if order_by in self.__sort_keys else f'"{order_by}"'
+            order += ' DESC' if descending else ''
+        return list(self.__select(*self.__query_where(conditions), order=order, limit=limit))
+
+    def explain(self, conditions):
+        """
+        Describes how sqlite would find the items of a list of query() conditions
+        :param conditions: list of (field, operator, value) conditions
+        :return: description string
+        """
+        where, parameters = self.__query_where(conditions)
+        with self.__lock:
+            plan = self.__conn.execute(f'EXPLAIN QUERY PLAN SELECT * FROM "{self.__table}" {where}', parameters)
+            return '; '.join(row[-1] for row in plan)
+
+    def get_list_type(self):
+        return self.__item_type
+
+    @staticmethod
+    def stats():
+        """
+        SqliteItemLists aren't instrumented, see ItemList.stats()
+        :return: None
+        """
+        return None
+
+    @staticmethod
+    def cache_stats():
+        """
+        SqliteItemLists don't cache results (sqlite has its own page cache), see ItemList.cache_stats()
+        :return: None
+        """
+        return None
+
+    def close(self):
+        with self.__lock:
+            self.__conn.close()
+
+    def __iter__(self):
+        return self.__select()
+
+    def __repr__(self):
+        return f"<{len(self)} items of type {self.__item_type} in {self.__db_path}>"
+
+    def __str__(self):
+        return f"List of {len(self)} {self.__item_type}s"
+
+    def __iadd__(self, other):
+        """
+        Adds another list, a list of items or a single item to self using the add_many() method
+        :param other: An ItemList/SqliteItemList, a list of items or an object of the list's type
+        :return: self (object on the left of the symbol)
+        """
+        if isinstance(other, (ItemList, SqliteItemList)):
+            if other.get_list_type() is self.__item_type:
+                self.add_many(other)
+                return self
+            raise TypeError("Cannot add list of type " +
+                            str(other.get_list_type()) +
+                            " to list of type " +
+                            str(self.__item_type))
+        if isinstance(other, (list, tuple)):
+            self.add_many(other)
+            return self
+        if isinstance(other, self.__item_type):
+            self.add(other)
+            return self
+        raise TypeError("Cannot add " + str(type(other)) + " to ItemList")
+
+    def __len__(self):
+        return self.__count()
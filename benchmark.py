@@ -0,0 +1,248 @@
+import argparse
+import builtins
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import date, timedelta
+
+# Project packages
+import books
+import customers
+import loans
+import ItemList
+import main
+import menuOptions
+
+FIRST_NAMES = ['Noa', 'Yosef', 'Tamar', 'David', 'Maya', 'Ariel', 'Shira', 'Daniel', 'Yael', 'Omer', 'Lior', 'Adi']
+LAST_NAMES = ['Cohen', 'Levi', 'Mizrahi', 'Peretz', 'Biton', 'Friedman', 'Katz', 'Azulay', 'Shapiro', 'Dahan']
+CITIES = ['Tel Aviv', 'Jerusalem', 'Haifa', 'Beer Sheva', 'Eilat', 'Netanya', 'Ashdod', 'Holon', 'Rehovot', 'Afula']
+TITLE_WORDS = ['Silent', 'River', 'Garden', 'Night', 'Stone', 'Letters', 'Empire', 'Winter', 'Shadow', 'Harbor',
+               'Last', 'Glass', 'Orchard', 'Storm', 'Map', 'Desert', 'Song', 'House', 'Light', 'Journey']
+
+
+def generate_csvs(folder: str, rows: int, seed: int = 0):
+    """
+    Writes books.csv, customers.csv and loans.csv with random but realistic data to a folder.
+    Names are unique (they end with a zero padded number) so the menu flows can find items by name.
+    :param folder: folder to write the files to
+    :param rows: amount of loans (a tenth of it books and customers, at least 10 of each)
+    :param seed: random seed, the same seed always generates the same files
+    :return: {'books': path, 'customers': path, 'loans': path} dictionary
+    """
+    rng = random.Random(seed)
+    item_count = max(rows // 10, 10)
+    authors = [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}" for _ in range(max(item_count // 20, 1))]
+    paths = {name: os.path.join(folder, name + '.csv') for name in ('books', 'customers', 'loans')}
+    book_types = []
+    with open(paths['books'], 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, quoting=csv.QUOTE_ALL)
+        writer.writerow(['id', 'name', 'author', 'year', 'type', 'total_quantity'])
+        for i in range(item_count):
+            book_types.append(rng.choice(list(books.BookType)))
+            writer.writerow([i, f"{' '.join(rng.sample(TITLE_WORDS, 2))} {i:07d}", rng.choice(authors),
+                             rng.randint(1900, 2021), book_types[-1].value, rng.randint(1, 20)])
+    with open(paths['customers'], 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, quoting=csv.QUOTE_ALL)
+        writer.writerow(['id', 'name', 'city', 'birth_year'])
+        for i in range(item_count):
+            writer.writerow([i, f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i:07d}", rng.choice(CITIES),
+                             rng.randint(1940, 2010)])
+    first_day = date.today() - timedelta(days=730)
+    with open(paths['loans'], 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, quoting=csv.QUOTE_ALL)
+        writer.writerow(['id', 'custID', 'bookID', 'loan_date', 'return_date'])
+        for i in range(rows):
+            book_id = rng.randrange(item_count)
+            loan_day = first_day + timedelta(days=rng.randrange(730))
+            return_day = loan_day + timedelta(days=book_types[book_id].days())
+            writer.writerow([i, rng.randrange(item_count), book_id, loan_day.strftime("%d/%m/%Y"),
+                             return_day.strftime("%d/%m/%Y")])
+    return paths
+
+
+@contextlib.contextmanager
+def scripted_input(answers: list):
+    """
+    Answers input() calls with the given strings, in order, and hides everything printed meanwhile.
+    :param answers: list of answers
+    :return: context manager
+    """
+    answer_iter = iter(answers)
+    original_input = builtins.input
+    builtins.input = lambda *_: next(answer_iter)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        builtins.input = original_input
+
+
+def measure(results: list, rows: int, operation: str, func, calls: list, keywords: dict = None):
+    """
+    Times func once per argument tuple and adds the measurement to the results.
+    :param results: list of result dictionaries to add to
+    :param rows: size of the data set
+    :param operation: name of the measured operation
+    :param func: function to time
+    :param calls: list of argument tuples, one per call
+    :param keywords: keyword arguments passed to every call
+    :return: list of the values func returned
+    """
+    keywords = keywords or {}
+    durations = []
+    returned = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for arguments in calls:
+            start = time.perf_counter()
+            returned.append(func(*arguments, **keywords))
+            durations.append(time.perf_counter() - start)
+    results.append({
+        'rows': rows,
+        'operation': operation,
+        'calls': len(durations),
+        'total_s': round(sum(durations), 6),
+        'mean_us': round(statistics.mean(durations) * 1e6, 2),
+        'median_us': round(statistics.median(durations) * 1e6, 2),
+        'max_us': round(max(durations) * 1e6, 2)
+    })
+    return returned
+
+
+def run(rows: int, repeat: int = 100, seed: int = 0):
+    """
+    Generates a data set and times the list operations and menu flows on it.
+    :param rows: amount of loans in the data set
+    :param repeat: amount of calls of every single-item operation
+    :param seed: random seed of the data set and of the chosen items
+    :return: list of result dictionaries
+    """
+    rng = random.Random(seed)
+    results = []
+    folder = tempfile.mkdtemp(prefix='library_bench_')
+    try:
+        paths = generate_csvs(folder, rows, seed)
+
+        # Loading, with the options of main.py. The first loads validate every row, and write the snapshots and
+        # the certificates the later ones are loaded from. Trusted loads skip the snapshot to parse the certified rows
+        options = main.list_options()
+        for source in ('csv', 'trusted', 'snapshot'):
+            lists = {}
+            for name, item_type in (('books', books.Book), ('customers', customers.Customer), ('loans', loans.Loan)):
+                keywords = dict(options[name], snapshot=False) if source == 'trusted' else options[name]
+                lists[name], = measure(results, rows, f'load_{name}_{source}', ItemList.ItemList,
+                                       [(item_type, paths[name])], keywords)
+        book_list, customer_list, loan_list = lists['books'], lists['customers'], lists['loans']
+
+        # Searches
+        stored_books = list(book_list)
+        stored_customers = list(customer_list)
+        stored_loans = list(loan_list)
+        measure(results, rows, 'get_book_by_id', book_list.get_by_property,
+                [('id', rng.choice(stored_books).ID) for _ in range(repeat)])
+        measure(results, rows, 'get_book_by_name', book_list.get_by_property,
+                [('name', rng.choice(stored_books).name) for _ in range(repeat)])
+        measure(results, rows, 'get_customer_by_name', customer_list.get_by_property,
+                [('name', rng.choice(stored_customers).name) for _ in range(repeat)])
+        measure(results, rows, 'get_loans_by_custID', loan_list.get_by_property,
+                [('custID', rng.choice(stored_customers).ID) for _ in range(repeat)])
+
+        # Listing
+        measure(results, rows, 'list_loans',
+                lambda: sum(1 for _ in loans.output_loans(loan_list, book_list, customer_list)), [()])
+        measure(results, rows, 'list_late_loans', menuOptions.show_late, [(loan_list, book_list, customer_list)])
+
+        # Changes
+        new_loans = [loans.Loan(rng.choice(stored_customers).ID, rng.choice(stored_books).ID,
+                                "01/01/2022", "11/01/2022") for _ in range(repeat)]
+        measure(results, rows, 'add_loan', loan_list.add, [(new_loan,) for new_loan in new_loans])
+        measure(results, rows, 'remove_loan', loan_list.remove, [(new_loan.ID,) for new_loan in new_loans])
+        new_books = [books.Book(f"Benchmark {i}", "Author", 2000, 1) for i in range(max(repeat // 10, 1))]
+        measure(results, rows, 'add_book', book_list.add, [(new_book,) for new_book in new_books])
+        measure(results, rows, 'remove_book', book_list.remove, [(new_book.ID,) for new_book in new_books])
+
+        # Menu flows, answering their prompts with names of stored items
+        def new_loan_flow(customer, book):
+            with scripted_input([customer.name, book.name]):
+                menuOptions.new_loan(loan_list=loan_list, customer_list=customer_list, book_list=book_list)
+
+        def rem_loan_flow(customer, book):
+            with scripted_input([customer.name, book.name]):
+                menuOptions.rem_loan(loan_list=loan_list, customer_list=customer_list, book_list=book_list)
+
+        customer_map = {customer.ID: customer for customer in stored_customers}
+        book_map = {book.ID: book for book in stored_books}
+        measure(results, rows, 'new_loan_flow', new_loan_flow,
+                [(rng.choice(stored_customers), rng.choice(stored_books)) for _ in range(repeat)])
+        measure(results, rows, 'rem_loan_flow', rem_loan_flow,
+                [(customer_map[loan.custID], book_map[loan.bookID])
+                 for loan in rng.sample(stored_loans, min(repeat, len(stored_loans)))])
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return results
+
+
+def environment():
+    """
+    Describes where the benchmark ran, so results of different commits and machines can be told apart.
+    :return: dict
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'commit': commit, 'python': platform.python_version(), 'machine': platform.machine(),
+            'cpus': os.cpu_count()}
+
+
+def compare(old_path: str, new_results: list):
+    """
+    Prints how the mean time of every operation changed compared to a previous results file.
+    :param old_path: JSON lines file written by an earlier run
+    :param new_results: list of result dictionaries of this run
+    :return: None
+    """
+    with open(old_path) as old_file:
+        old_results = {(result['rows'], result['operation']): result
+                       for result in map(json.loads, old_file) if 'operation' in result}
+    print(f"{'rows':>9} {'operation':<22} {'before (us)':>12} {'after (us)':>12} {'change':>8}")
+    for result in new_results:
+        old = old_results.get((result['rows'], result['operation']))
+        if old is None:
+            continue
+        change = (result['mean_us'] / old['mean_us'] - 1) * 100 if old['mean_us'] else 0
+        print(f"{result['rows']:>9} {result['operation']:<22} {old['mean_us']:>12.1f} {result['mean_us']:>12.1f} "
+              f"{change:>+7.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the item lists and menu flows on generated data. "
+                                                 "Results are written as JSON lines, one per measurement.")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help="data set sizes (amount of loans)")
+    parser.add_argument('--repeat', type=int, default=100, help="calls of every single-item operation")
+    parser.add_argument('--seed', type=int, default=0, help="random seed of the generated data")
+    parser.add_argument('--output', help="file to write the results to (default: standard output)")
+    parser.add_argument('--compare', metavar='FILE', help="results of an earlier run to compare with")
+    args = parser.parse_args()
+
+    all_results = []
+    for size in args.rows:
+        all_results += run(size, args.repeat, args.seed)
+    lines = [json.dumps({'environment': environment()})] + [json.dumps(result) for result in all_results]
+    if args.output is None:
+        print('\n'.join(lines))
+    else:
+        with open(args.output, 'w') as output_file:
+            output_file.write('\n'.join(lines) + '\n')
+    if args.compare is not None:
+        compare(args.compare, all_results)
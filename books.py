@@ -1,3 +1,4 @@
+import sys
 from dataclasses import dataclass
 from enum import IntEnum
 
@@ -37,12 +38,12 @@ class BookType(IntEnum):
         return option_string
 
 
-@dataclass
+@dataclass(slots=True)
 class Book:
     """
-    A class representing a single book in the library
+    A class representing a single book in the library.
+    A book created without an ID (-1) is given one by the list it's added to.
     """
-    __ID_MNGR = {"NEXT-ID": 0, "EXISTING-IDS": set()}
     name: str
     author: str
     year: int
@@ -54,17 +55,15 @@ class Book:
         if self.total_quantity < 0:
             raise ValueError("Total book quantity cannot be negative.")
 
-        if self.ID in Book.__ID_MNGR['EXISTING-IDS']:  # check if the book id exists already
-            raise BookIdClashException
+        self.author = sys.intern(self.author)  # many books share an author, keep a single copy of the string
 
-        if self.ID != -1:  # check if id wasn't left blank
-            Book.__ID_MNGR['EXISTING-IDS'].add(self.ID)
-            return
-        
-        while Book.__ID_MNGR['NEXT-ID'] in Book.__ID_MNGR['EXISTING-IDS']:  # find a new unique id to give the book
-            Book.__ID_MNGR['NEXT-ID'] += 1
-        self.ID = Book.__ID_MNGR['NEXT-ID']
-        Book.__ID_MNGR['NEXT-ID'] += 1
+    @staticmethod
+    def sorted_fields():
+        """
+        returns the fields an ItemList should keep a sorted index on, with a function giving each item's sort key
+        :return: {field name: key function} dictionary
+        """
+        return {'year': lambda book: book.year}
 
     def get_dict(self):
         """
@@ -85,6 +84,30 @@ class Book:
     def fields():
         return ['id', 'name', 'author', 'year', 'type', "total_quantity"]
 
+    @staticmethod
+    def indexed_fields():
+        """
+        returns the fields an ItemList should keep a hash index on (the ID is always indexed)
+        :return: list of field names
+        """
+        return []
+
+    @staticmethod
+    def text_indexed_fields():
+        """
+        returns the text fields an ItemList may keep an n-gram index on for substring searches
+        :return: list of field names
+        """
+        return ['name', 'author']
+
+    @staticmethod
+    def ranked_fields():
+        """
+        returns the text fields an ItemList may keep a ranked (BM25, typo tolerant) search index on, see search()
+        :return: list of field names
+        """
+        return ['name', 'author']
+
     def __str__(self):
         return f"{self.ID}: {self.total_quantity} of {self.name} ({self.year}) by {self.author}"
 
@@ -93,6 +116,3 @@ class BookException(Exception):
     pass
 
 
-class BookIdClashException(BookException):
-    def __str__(self):
-        return "Book ID already exists"
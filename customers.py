@@ -1,13 +1,14 @@
 import datetime
+import sys
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(slots=True)
 class Customer:
     """
-    A class representing a customer
+    A class representing a customer.
+    A customer created without an ID (-1) is given one by the list it's added to.
     """
-    __ID_MNGR = {"NEXT-ID": 0, "EXISTING-IDS": set()}
     name: str
     city: str
     birth_year: int
@@ -18,17 +19,15 @@ class Customer:
         if self.birth_year > now.year:
             raise BirthYearException
 
-        if self.ID in Customer.__ID_MNGR['EXISTING-IDS']:  # check if the customer id exists already
-            raise CustomerIdClashException
+        self.city = sys.intern(self.city)  # many customers share a city, keep a single copy of the string
 
-        if self.ID != -1:  # check if id was passed as a parameter
-            Customer.__ID_MNGR['EXISTING-IDS'].add(self.ID)
-            return
-
-        while Customer.__ID_MNGR['NEXT-ID'] in Customer.__ID_MNGR['EXISTING-IDS']:  # find new unique id for customer
-            Customer.__ID_MNGR['NEXT-ID'] += 1
-        self.ID = Customer.__ID_MNGR['NEXT-ID']
-        Customer.__ID_MNGR['NEXT-ID'] += 1
+    @staticmethod
+    def sorted_fields():
+        """
+        returns the fields an ItemList should keep a sorted index on, with a function giving each item's sort key
+        :return: {field name: key function} dictionary
+        """
+        return {'birth_year': lambda customer: customer.birth_year}
 
     def get_dict(self):
         loan_dict = {
@@ -43,6 +42,30 @@ class Customer:
     def fields():
         return ['id', 'name', 'city', 'birth_year']
 
+    @staticmethod
+    def indexed_fields():
+        """
+        returns the fields an ItemList should keep a hash index on (the ID is always indexed)
+        :return: list of field names
+        """
+        return []
+
+    @staticmethod
+    def text_indexed_fields():
+        """
+        returns the text fields an ItemList may keep an n-gram index on for substring searches
+        :return: list of field names
+        """
+        return ['name', 'city']
+
+    @staticmethod
+    def ranked_fields():
+        """
+        returns the text fields an ItemList may keep a ranked (BM25, typo tolerant) search index on, see search()
+        :return: list of field names
+        """
+        return ['name']
+
     def __str__(self):
         return f"{self.ID}: {self.name}, lives in {self.city} and born in {self.birth_year}"
 
@@ -51,11 +74,6 @@ class CustomerException(Exception):
     pass
 
 
-class CustomerIdClashException(CustomerException):
-    def __str__(self):
-        return "Customer ID already exists."
-
-
 class BirthYearException(CustomerException):
     def __str__(self):
         return "Customer birth year is invalid."
@@ -1,44 +1,84 @@
 import re
-from datetime import datetime
+from datetime import date
 from dataclasses import dataclass
 
+DATE_PATTERN = re.compile(r"(\d{2})/(\d{2})/(\d{4})")
 
-@dataclass
+
+def date_to_ordinal(date_string: str):
+    """
+    Converts a DD/MM/YYYY date string to a day number (see datetime.date.toordinal())
+    :param date_string: date string in DD/MM/YYYY format
+    :return: int
+    """
+    match = DATE_PATTERN.fullmatch(date_string)
+    if not match:
+        raise InvalidLoanDateException
+    day, month, year = match.groups()
+    return date(int(year), int(month), int(day)).toordinal()  # raises ValueError for dates that don't exist
+
+
+def ordinal_to_date(ordinal: int):
+    """
+    Converts a day number (see datetime.date.toordinal()) to a DD/MM/YYYY date string
+    :param ordinal: day number
+    :return: date string
+    """
+    day = date.fromordinal(ordinal)
+    return f"{day.day:02d}/{day.month:02d}/{day.year:04d}"
+
+
+@dataclass(slots=True, init=False, repr=False)
 class Loan:
     """
-    A class representing a single book loan transaction
+    A class representing a single book loan transaction.
+    Dates are stored as day numbers, loandate and returndate convert them from/to DD/MM/YYYY strings.
+    A loan created without an ID (-1) is given one by the list it's added to.
     """
-    __ID_MNGR = {"NEXT-ID": 0, "EXISTING-IDS": set()}
     custID: int
     bookID: int
-    loandate: str
-    returndate: str
-    ID: int = -1
+    loan_ordinal: int
+    return_ordinal: int
+    ID: int
+
+    def __init__(self, custID: int, bookID: int, loandate: str, returndate: str, ID: int = -1):
+        self.custID = custID
+        self.bookID = bookID
+        self.loandate = loandate
+        self.returndate = returndate
+        self.ID = ID
+        self.__post_init__()
 
     def __post_init__(self):
-        if not re.fullmatch(r"\d{2}/\d{2}/\d{4}", self.loandate):
-            raise InvalidLoanDateException
-
-        if not re.fullmatch(r"\d{2}/\d{2}/\d{4}", self.returndate):
-            raise InvalidLoanDateException
-
-        if datetime.strptime(self.loandate, "%d/%m/%Y") > datetime.strptime(self.returndate, "%d/%m/%Y"):
+        if self.loan_ordinal > self.return_ordinal:
             raise DateOrderException
 
-        if self.ID in Loan.__ID_MNGR['EXISTING-IDS']:  # check if the Loan id exists already
-            raise LoanIdClashException
+    @property
+    def loandate(self):
+        return ordinal_to_date(self.loan_ordinal)
+
+    @loandate.setter
+    def loandate(self, value: str):
+        self.loan_ordinal = date_to_ordinal(value)
 
-        if self.ID != -1:  # check if id wasn't left blank
-            Loan.__ID_MNGR['EXISTING-IDS'].add(self.ID)
-            return
+    @property
+    def returndate(self):
+        return ordinal_to_date(self.return_ordinal)
 
-        while Loan.__ID_MNGR['NEXT-ID'] in Loan.__ID_MNGR['EXISTING-IDS']:  # find new unique id for Loan
-            Loan.__ID_MNGR['NEXT-ID'] += 1
-        self.ID = Loan.__ID_MNGR['NEXT-ID']
-        Loan.__ID_MNGR['NEXT-ID'] += 1
+    @returndate.setter
+    def returndate(self, value: str):
+        self.return_ordinal = date_to_ordinal(value)
 
     def is_late(self):
-        return datetime.strptime(self.returndate, "%d/%m/%Y") < datetime.now()
+        return self.return_ordinal <= date.today().toordinal()
+
+    @staticmethod
+    def sorted_fields():
+        """
+        returns the fields an ItemList should keep a sorted index on, with a function giving each item's sort key
+        :return: {field name: key function} dictionary
+        """
+        return {'loan_date': lambda loan: loan.loan_ordinal, 'return_date': lambda loan: loan.return_ordinal}
 
     def get_dict(self):
         """
@@ -58,14 +98,95 @@ class Loan:
     def fields():
         return ['id', 'custID', 'bookID', 'loan_date', 'return_date']
 
+    @staticmethod
+    def indexed_fields():
+        """
+        returns the fields an ItemList should keep a hash index on (the ID is always indexed)
+        :return: list of field names
+        """
+        return ['bookID', 'custID']
+
+    @staticmethod
+    def text_indexed_fields():
+        """
+        returns the text fields an ItemList may keep an n-gram index on for substring searches
+        :return: list of field names
+        """
+        return []
+
+    @staticmethod
+    def ranked_fields():
+        """
+        returns the text fields an ItemList may keep a ranked (BM25, typo tolerant) search index on, see search()
+        :return: list of field names
+        """
+        return []
+
+    def __repr__(self):
+        return (f"Loan(custID={self.custID!r}, bookID={self.bookID!r}, loandate={self.loandate!r}, "
+                f"returndate={self.returndate!r}, ID={self.ID!r})")
+
     def __str__(self):
         return f"{self.ID}: {self.bookID} -> {self.custID} on {self.loandate} until {self.returndate}"
 
 
+def on_loan(book_id: int, loan_list):
+    """
+    Returns the amount of copies of a book that are currently loaned
+    :param book_id: ID of the book
+    :param loan_list: list of all loans
+    :return: int
+    """
+    return loan_list.count_by_property('bookID', book_id)
+
+
+def available(book_id: int, book_list, loan_list):
+    """
+    Returns the amount of copies of a book that can be loaned (0 if the book doesn't exist)
+    :param book_id: ID of the book
+    :param book_list: list of all books
+    :param loan_list: list of all loans
+    :return: int
+    """
+    book = book_list.get_by_property('id', book_id)
+    if not book:
+        return 0
+    return book[0].total_quantity - on_loan(book_id, loan_list)
+
+
 def output_loan(loan: Loan, book_list, customer_list):
     loan_book = book_list.get_by_property('id', loan.bookID)  # Find loaned book
     loan_customer = customer_list.get_by_property('id', loan.custID)  # Find loaning customer
+    return format_loan(loan, loan_book, loan_customer)
+
+
+def output_loans(loan_iter, book_list, customer_list):
+    """
+    Yields the output_loan() line of every loan. Each book and customer is looked up once and kept in an ID map,
+    so listing many loans costs one lookup per distinct book/customer instead of two per loan.
+    :param loan_iter: iterable of loans (e.g. a loan list)
+    :param book_list: list of all books
+    :param customer_list: list of all customers
+    :return: generator of strings
+    """
+    book_map = {}
+    customer_map = {}
+    for loan in loan_iter:
+        if loan.bookID not in book_map:
+            book_map[loan.bookID] = book_list.get_by_property('id', loan.bookID)
+        if loan.custID not in customer_map:
+            customer_map[loan.custID] = customer_list.get_by_property('id', loan.custID)
+        yield format_loan(loan, book_map[loan.bookID], customer_map[loan.custID])
+
 
+def format_loan(loan: Loan, loan_book: list, loan_customer: list):
+    """
+    Formats a loan with its book's and customer's details
+    :param loan: the loan to format
+    :param loan_book: search result for the loan's book (empty if not found)
+    :param loan_customer: search result for the loan's customer (empty if not found)
+    :return: string
+    """
     # If neither found
     if len(loan_book) == 0 and len(loan_customer) == 0:
         return str(loan) + " - couldn't find book or customer. Consider deleting this loan."
@@ -87,11 +208,6 @@ class LoanException(Exception):
     pass
 
 
-class LoanIdClashException(LoanException):
-    def __str__(self):
-        return "Loan ID already exists"
-
-
 class LoanDateException(LoanException):
     pass
 
@@ -1,17 +1,112 @@
+import time
+startup_start = time.perf_counter()
+import argparse
+import asyncio
+import os
 # Menu imports
 from menu import ConsoleMenu
 import menuOptions
+import server
 # Class imports
 from ItemList import ItemList
+from LazyItemList import LazyItemList
+from SqliteItemList import SqliteItemList
 from books import Book
 from customers import Customer
 from loans import Loan
 
+imports_time = time.perf_counter() - startup_start
+
+
+def report_load(name: str):
+    """
+    Returns an on_load callback of a LazyItemList that prints how long loading the list took
+    :param name: name of the list
+    :return: func(seconds)
+    """
+    return lambda seconds: print(f"[startup] {name} loaded in {seconds * 1000:.1f} ms")
+
+
+def list_options(concurrent: bool = False, write_buffer: dict = None):
+    """
+    Returns the options the csv stored lists are created with (the benchmark uses them too)
+    :param concurrent: whether the lists are shared between threads
+    :param write_buffer: write buffer of the loan list (see ItemList), None to write every change right away
+    :return: {list name: ItemList keyword arguments} dictionary
+    """
+    # Books and customers can't be removed while they have loans, so nothing refers to a removed one's ID.
+    # Their name searches repeat (e.g. looking up the customer and book of every new loan), so they're cached.
+    # Rows the program wrote or already validated are certified, and loaded without validating them again
+    item_options = {'concurrent': concurrent, 'snapshot': True, 'instrumented': True, 'reuse_ids': True,
+                    'cache_size': 256, 'trusted': True}
+    return {
+        'books': item_options,
+        'customers': dict(item_options),
+        'loans': {'journaled': True, 'load_workers': os.cpu_count(), 'concurrent': concurrent,
+                  'write_buffer': write_buffer, 'snapshot': True, 'instrumented': True, 'trusted': True}
+    }
+
+
+def watched(item_list, interval):
+    """
+    Starts refreshing a list from its file every interval seconds (see ItemList.watch())
+    :param item_list: the list
+    :param interval: seconds between refreshes, None to not watch the file
+    :return: the list
+    """
+    if interval is not None:
+        item_list.watch(interval)
+    return item_list
+
+
 if __name__ == "__main__":
-    # Create lists
-    bl = ItemList(Book, "./CSVs/books.csv")
-    cl = ItemList(Customer, "./CSVs/customers.csv")
-    ll = ItemList(Loan, "./CSVs/loans.csv")
+    parser = argparse.ArgumentParser(description="Library management system")
+    parser.add_argument('--storage', choices=['csv', 'sqlite'], default='csv',
+                        help="where the lists are stored (sqlite imports the CSVs when first created)")
+    parser.add_argument('--serve', type=int, metavar='PORT',
+                        help="serve the lists as a JSON over HTTP API on PORT instead of showing the menu")
+    parser.add_argument('--host', default='127.0.0.1', help="address to serve on (with --serve)")
+    parser.add_argument('--prefetch', action='store_true',
+                        help="load all lists in the background right away instead of when they're first used")
+    parser.add_argument('--timings', action='store_true', help="print how long each part of the startup took")
+    parser.add_argument('--watch', type=float, metavar='SECONDS',
+                        help="pick up rows other programs append to the CSVs, checking every SECONDS (csv storage)")
+    args = parser.parse_args()
+
+    # Create lists. Each list is loaded when it's first used (or prefetched), so the menu shows up right away
+    on_load = {name: report_load(name) if args.timings else None for name in ('books', 'customers', 'loans')}
+    if args.storage == 'sqlite':
+        bl = LazyItemList(lambda: SqliteItemList(Book, "./CSVs/library.db", csv_path="./CSVs/books.csv"),
+                          on_load['books'])
+        cl = LazyItemList(lambda: SqliteItemList(Customer, "./CSVs/library.db", csv_path="./CSVs/customers.csv"),
+                          on_load['customers'])
+        ll = LazyItemList(lambda: SqliteItemList(Loan, "./CSVs/library.db", csv_path="./CSVs/loans.csv"),
+                          on_load['loans'])
+    else:
+        # The server shares the lists between its worker threads and batches the loan writes of many clients
+        # Watched lists are refreshed by a background thread, so they're shared between threads too
+        concurrent = args.serve is not None or args.watch is not None
+        write_buffer = {'max_rows': 100, 'max_delay': 0.5, 'fsync': False} if concurrent else None
+        options = list_options(concurrent, write_buffer)
+        bl = LazyItemList(lambda: watched(ItemList(Book, "./CSVs/books.csv", **options['books']), args.watch),
+                          on_load['books'])
+        cl = LazyItemList(lambda: watched(ItemList(Customer, "./CSVs/customers.csv", **options['customers']),
+                                          args.watch),
+                          on_load['customers'])
+        ll = LazyItemList(lambda: watched(ItemList(Loan, "./CSVs/loans.csv", **options['loans']), args.watch),
+                          on_load['loans'])
+    for item_list in (bl, cl, ll):
+        if args.serve is not None:  # the server starts once its lists are ready, and uses them from its own threads
+            item_list.load()
+        elif args.prefetch:
+            item_list.prefetch()
+    if args.timings:
+        print(f"[startup] imports took {imports_time * 1000:.1f} ms, "
+              f"ready after {(time.perf_counter() - startup_start) * 1000:.1f} ms")
+
+    if args.serve is not None:
+        asyncio.run(server.serve(bl, cl, ll, args.host, args.serve, threaded=args.storage == 'csv'))
+        raise SystemExit
 
     # Create menu
     menu_handler = ConsoleMenu(
@@ -27,7 +122,8 @@ if __name__ == "__main__":
             'Find book by name': menuOptions.book_by_name,
             'Find customer by name': menuOptions.customer_by_name,
             'Remove book': menuOptions.rem_book,
-            'Remove customer': menuOptions.rem_customer
+            'Remove customer': menuOptions.rem_customer,
+            'Show performance stats': menuOptions.show_stats
         }
     )
 
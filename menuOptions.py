@@ -10,6 +10,8 @@ from customers import Customer, CustomerException
 from loans import Loan
 import ItemList
 
+SEARCH_RESULTS = 10
+
 
 def new_customer(customer_list, *_, **__):
     # Take input
@@ -32,10 +34,10 @@ def new_customer(customer_list, *_, **__):
     except CustomerException as e:
         print(e)
     else:
+        # Add customer to list (which gives it its ID)
+        customer_list += new_c
         # Print new customer
         print(new_c)
-        # Add customer to list
-        customer_list += new_c
 
 
 def new_book(book_list, *_, **__):
@@ -67,10 +69,10 @@ def new_book(book_list, *_, **__):
         int(user_inp['total_quantity']),
         BookType(int(user_inp['type']))
     )
+    # Add new object to list (which gives it its ID)
+    book_list += new_b
     # Print new object
     print(new_b)
-    # Add new object to list
-    book_list += new_b
 
 
 def new_loan(loan_list, customer_list, book_list, *_, **__):
@@ -80,25 +82,41 @@ def new_loan(loan_list, customer_list, book_list, *_, **__):
     book_input = input("Book loaned: ")
     # Find book by name
     chosen_book_id = id_from_name(book_input, book_list)
-    chosen_book = book_list.get_by_property("id", chosen_book_id)[0]
-    # Test if reached book limit
-    if len(loan_list.get_by_property('bookID', chosen_book_id)) >= chosen_book.total_quantity:
+    # Create and add the loan if the book is in stock
+    new_l = create_loan(loan_list, book_list, chosen_customer_id, chosen_book_id)
+    if new_l is None:
         print("Book not in stock. Cannot create loan.")
         return
+    # Print new loan
+    print(new_l)
+
+
+def create_loan(loan_list, book_list, customer_id, book_id):
+    """
+    Loans a book to a customer from today until the end of the book's loan period and adds it to the loan list.
+    :param loan_list: list of all loans
+    :param book_list: list of all books
+    :param customer_id: ID of the loaning customer
+    :param book_id: ID of the loaned book
+    :return: the new Loan, None if the book doesn't exist or isn't in stock
+    """
+    chosen_book = book_list.get_by_property("id", book_id)
+    # Test if reached book limit
+    if not chosen_book or loans.available(book_id, book_list, loan_list) <= 0:
+        return None
     loan_day = datetime.now()
     # Calculate return day
-    ret_day = loan_day + dt.timedelta(days=chosen_book.book_type.days())
+    ret_day = loan_day + dt.timedelta(days=chosen_book[0].book_type.days())
     # Create new loan
     new_l = Loan(
-        chosen_customer_id,
-        chosen_book_id,
+        customer_id,
+        book_id,
         loan_day.strftime("%d/%m/%Y"),
         ret_day.strftime("%d/%m/%Y")
     )
-    # Print new loan
-    print(new_l)
     # Add loan to list
     loan_list += new_l
+    return new_l
 
 
 def rem_book(book_list, loan_list, *_, **__):
@@ -154,12 +172,7 @@ def rem_loan(loan_list, customer_list, book_list, *_, **__):
     customer_id = id_from_name(customer_query, customer_list)
     book_query = input("Please enter the book name: ")
     book_id = id_from_name(book_query, book_list)
-    for_removal = None
-    customer_loans = loan_list.get_by_property('custID', customer_id)
-    for loan in customer_loans:
-        if loan.bookID == book_id:
-            for_removal = loan
-            break
+    for_removal = find_loan(loan_list, customer_id, book_id)
     # Remove loan
     try:
         if for_removal is None:
@@ -171,6 +184,18 @@ def rem_loan(loan_list, customer_list, book_list, *_, **__):
         print(str(removed), " was removed")
 
 
+def find_loan(loan_list, customer_id, book_id):
+    """
+    Finds a loan of a book by a customer
+    :param loan_list: list of all loans
+    :param customer_id: ID of the loaning customer
+    :param book_id: ID of the loaned book
+    :return: the first matching Loan, None if there is none
+    """
+    found = loan_list.query([('custID', 'eq', customer_id), ('bookID', 'eq', book_id)], limit=1)
+    return found[0] if found else None
+
+
 def show_books(book_list, *_, **__):
     for book in book_list:
         print(book)
@@ -182,15 +207,16 @@ def show_customers(customer_list, *_, **__):
 
 
 def show_loans(loan_list, book_list, customer_list, *_, **__):
-    for loan in loan_list:
-        print(loans.output_loan(loan, book_list, customer_list))
+    for line in loans.output_loans(loan_list, book_list, customer_list):
+        print(line)
 
 
 def show_late(loan_list, book_list, customer_list, *_, **__):
-    # Print all late loans
-    late_gen = (loan for loan in loan_list if loan.is_late())
-    for loan in late_gen:
-        print(loans.output_loan(loan, book_list, customer_list))
+    # Print all late loans (loans are indexed by their return day number, late ones are due today or before)
+    today = dt.date.today().toordinal()
+    late_loans = loan_list.get_by_range('return_date', high=today)
+    for line in loans.output_loans(late_loans, book_list, customer_list):
+        print(line)
 
 
 def book_by_name(book_list, *_, **__):
@@ -198,8 +224,10 @@ def book_by_name(book_list, *_, **__):
     user_inp = ConsoleMenu.user_input({
         'name': "Book's name: "
     })
-    # Get all books that match the query
-    search_results = book_list.get_by_property('name', user_inp['name'])
+    # Get the books that best match the query (by title and author, tolerating typos), or else the books whose
+    # name contains it (e.g. the middle of a word)
+    search_results = (book_list.search(user_inp['name'], limit=SEARCH_RESULTS)
+                      or book_list.get_by_property('name', user_inp['name']))
     if not search_results:
         print('No books found.')
         return
@@ -212,8 +240,9 @@ def customer_by_name(customer_list, *_, **__):
     user_inp = ConsoleMenu.user_input({
         'name': "Customer's name: "
     })
-    # Get all customers that match the query
-    search_results = customer_list.get_by_property('name', user_inp['name'])
+    # Get the customers that best match the query (tolerating typos), or else the customers whose name contains it
+    search_results = (customer_list.search(user_inp['name'], limit=SEARCH_RESULTS)
+                      or customer_list.get_by_property('name', user_inp['name']))
     if not search_results:
         print('No customers found.')
         return
@@ -221,6 +250,30 @@ def customer_by_name(customer_list, *_, **__):
         print(res)
 
 
+def show_stats(book_list, customer_list, loan_list, *_, **__):
+    for name, item_list in (('Books', book_list), ('Customers', customer_list), ('Loans', loan_list)):
+        print(f" {name} ".center(50, '-'))
+        recorded = item_list.stats()
+        if recorded is None:
+            print("No stats (the list isn't loaded yet or isn't instrumented).")
+            continue
+        for load in recorded['loads']:
+            print(f"Loaded {load['items']} items from {load['source']} ({load['path']}) "
+                  f"in {load['seconds'] * 1000:.1f} ms")
+        for operation, entry in sorted(recorded['operations'].items()):
+            # Only the histogram buckets that got calls
+            histogram = ', '.join(f"{bucket}: {calls}" for bucket, calls in entry['histogram'].items() if calls)
+            print(f"{operation}: {entry['calls']} calls, mean {entry['mean_us']:.1f} us, "
+                  f"max {entry['max_us']:.1f} us ({histogram})")
+        for counter, amount in sorted(recorded['counters'].items()):
+            print(f"{counter}: {amount}")
+        if 'cache' in recorded:
+            cache = recorded['cache']
+            print(f"Result cache: {cache['size']}/{cache['max_size']} entries, {cache['hits']} hits, "
+                  f"{cache['misses']} misses ({cache['hit_rate']:.0%}), {cache['evictions']} evicted, "
+                  f"{cache['invalidations']} invalidated")
+
+
 def id_from_name(name, item_list):
     if item_list.get_list_type() is Loan:
         raise TypeError("item_list can only be Book or Customer.")
@@ -0,0 +1,233 @@
+import asyncio
+import datetime as dt
+import functools
+import json
+import re
+from urllib.parse import urlsplit, parse_qs
+
+# Project packages
+import menuOptions
+from books import Book, BookType
+from customers import Customer, CustomerException
+from ItemList import ItemExistsError, ItemDoesNotExistError
+
+HTTP_REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                409: 'Conflict', 500: 'Internal Server Error'}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+    def __str__(self):
+        return self.args[0]
+
+
+class LibraryServer:
+    """
+    Serves the book, customer and loan lists as a JSON over HTTP API.
+    By default requests are handled on the event loop one at a time, so a handler reading or writing a csv file
+    keeps the other connections waiting. When the lists are thread-safe (ItemList(..., concurrent=True)) requests
+    run in the event loop's thread pool instead: reads run as soon as they arrive while writes are serialized by
+    a lock.
+    """
+    def __init__(self, book_list, customer_list, loan_list, threaded: bool = False):
+        """
+        :param book_list: list of all books
+        :param customer_list: list of all customers
+        :param loan_list: list of all loans
+        :param threaded: whether to run the requests in a thread pool (only for thread-safe lists)
+        """
+        self.__threaded = threaded
+        self.__book_list = book_list
+        self.__customer_list = customer_list
+        self.__loan_list = loan_list
+        self.__write_lock = asyncio.Lock()  # only matters for threaded servers, handlers on the loop never overlap
+        # (method, path pattern, handler, whether the handler writes)
+        self.__routes = [
+            ('GET', re.compile(r'/books'), self.find_books, False),
+            ('POST', re.compile(r'/books'), self.new_book, True),
+            ('GET', re.compile(r'/books/(\d+)'), self.get_book, False),
+            ('GET', re.compile(r'/customers'), self.find_customers, False),
+            ('POST', re.compile(r'/customers'), self.new_customer, True),
+            ('GET', re.compile(r'/customers/(\d+)'), self.get_customer, False),
+            ('GET', re.compile(r'/loans'), self.find_loans, False),
+            ('POST', re.compile(r'/loans'), self.new_loan, True),
+            ('GET', re.compile(r'/loans/late'), self.late_loans, False),
+            ('DELETE', re.compile(r'/loans/(\d+)'), self.remove_loan, True),
+            ('POST', re.compile(r'/returns'), self.return_loan, True),
+        ]
+
+    async def handle_connection(self, reader, writer):
+        """
+        Reads HTTP requests from a connection and writes their responses until the connection is closed.
+        :param reader: asyncio StreamReader of the connection
+        :param writer: asyncio StreamWriter of the connection
+        :return: None
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                body = await reader.readexactly(length) if length else b''
+                status, payload = await self.dispatch(method, target, body)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                data = json.dumps(payload).encode()
+                writer.write(f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                             f"Content-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method: str, target: str, body: bytes):
+        """
+        Runs the handler of a request.
+        :param method: HTTP method
+        :param target: request path and query string
+        :param body: request body (JSON for writes)
+        :return: (status code, JSON-able payload) tuple
+        """
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        path_found = False
+        for route_method, pattern, handler, writes in self.__routes:
+            match = pattern.fullmatch(url.path)
+            if not match:
+                continue
+            path_found = True
+            if route_method != method:
+                continue
+            try:
+                data = json.loads(body) if body else {}
+                call = functools.partial(handler, *match.groups(), query=query, data=data)
+                if writes:
+                    async with self.__write_lock:
+                        return await self.__run(call)
+                return await self.__run(call)
+            except HttpError as e:
+                return e.status, {'error': str(e)}
+            except (KeyError, ValueError, TypeError, CustomerException) as e:
+                return 400, {'error': f"Bad request: {e!r}"}
+            except Exception as e:  # keep serving other requests
+                return 500, {'error': str(e)}
+        if path_found:
+            return 405, {'error': "Method not allowed"}
+        return 404, {'error': "Not found"}
+
+    async def __run(self, call):
+        """
+        Runs a request handler, in the event loop's thread pool if the server is threaded.
+        :param call: the handler with its arguments bound
+        :return: the handler's result
+        """
+        if self.__threaded:
+            return await asyncio.get_running_loop().run_in_executor(None, call)
+        return call()
+
+    @staticmethod
+    def __get_one(item_list, item_id: int):
+        found = item_list.get_by_property('id', item_id)
+        if not found:
+            raise HttpError(404, f"No item with ID {item_id}")
+        return found[0]
+
+    def find_books(self, query, **_):
+        found = self.__book_list.get_by_property('name', query['name']) if 'name' in query else self.__book_list
+        return 200, [book.get_dict() for book in found]
+
+    def get_book(self, book_id, **_):
+        return 200, self.__get_one(self.__book_list, int(book_id)).get_dict()
+
+    def new_book(self, data, **_):
+        new_b = Book(
+            data['name'],
+            data['author'],
+            int(data['year']),
+            int(data['total_quantity']),
+            BookType(int(data.get('type', BookType.RET_IN_10)))
+        )
+        self.__book_list += new_b
+        return 201, new_b.get_dict()
+
+    def find_customers(self, query, **_):
+        if 'name' in query:
+            found = self.__customer_list.get_by_property('name', query['name'])
+        else:
+            found = self.__customer_list
+        return 200, [customer.get_dict() for customer in found]
+
+    def get_customer(self, customer_id, **_):
+        return 200, self.__get_one(self.__customer_list, int(customer_id)).get_dict()
+
+    def new_customer(self, data, **_):
+        new_c = Customer(data['name'], data['city'], int(data['birth_year']))
+        self.__customer_list += new_c
+        return 201, new_c.get_dict()
+
+    def find_loans(self, query, **_):
+        conditions = [(field, 'eq', int(query[field])) for field in ('custID', 'bookID') if field in query]
+        return 200, [loan.get_dict() for loan in self.__loan_list.query(conditions)]
+
+    def late_loans(self, **_):
+        today = dt.date.today().toordinal()
+        return 200, [loan.get_dict() for loan in self.__loan_list.get_by_range('return_date', high=today)]
+
+    def new_loan(self, data, **_):
+        customer_id = int(data['custID'])
+        book_id = int(data['bookID'])
+        self.__get_one(self.__customer_list, customer_id)
+        self.__get_one(self.__book_list, book_id)
+        try:
+            new_l = menuOptions.create_loan(self.__loan_list, self.__book_list, customer_id, book_id)
+        except ItemExistsError:
+            raise HttpError(409, "Loan ID already exists")
+        if new_l is None:
+            raise HttpError(409, "Book not in stock")
+        return 201, new_l.get_dict()
+
+    def remove_loan(self, loan_id, **_):
+        try:
+            return 200, self.__loan_list.remove(int(loan_id)).get_dict()
+        except ItemDoesNotExistError:
+            raise HttpError(404, f"No loan with ID {loan_id}")
+
+    def return_loan(self, data, **_):
+        for_removal = menuOptions.find_loan(self.__loan_list, int(data['custID']), int(data['bookID']))
+        if for_removal is None:
+            raise HttpError(404, "Loan not found")
+        return 200, self.__loan_list.remove(for_removal).get_dict()
+
+
+async def serve(book_list, customer_list, loan_list, host: str, port: int, threaded: bool = False):
+    """
+    Runs a LibraryServer until cancelled.
+    :param book_list: list of all books
+    :param customer_list: list of all customers
+    :param loan_list: list of all loans
+    :param host: address to listen on
+    :param port: port to listen on
+    :param threaded: whether to run the requests in a thread pool (only for thread-safe lists)
+    :return: None
+    """
+    library = LibraryServer(book_list, customer_list, loan_list, threaded)
+    server = await asyncio.start_server(library.handle_connection, host, port)
+    async with server:
+        print(f"Serving on {', '.join(str(sock.getsockname()) for sock in server.sockets)}")
+        await server.serve_forever()
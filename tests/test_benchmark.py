@@ -0,0 +1,39 @@
+import os
+import shutil
+import tempfile
+import unittest
+import benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_generate_csvs(self):
+        paths = benchmark.generate_csvs(self.folder, 200)
+        loan_list = benchmark.ItemList.ItemList(benchmark.loans.Loan, paths['loans'])
+        book_list = benchmark.ItemList.ItemList(benchmark.books.Book, paths['books'])
+        with self.subTest("All rows valid"):
+            self.assertEqual(200, len(loan_list))
+            self.assertEqual(20, len(book_list))
+        with self.subTest("Names unique"):
+            self.assertEqual(20, len({book.name for book in book_list}))
+        with self.subTest("Same seed, same data"):
+            with open(paths['loans']) as first:
+                first_loans = first.read()
+            other_folder = os.path.join(self.folder, "other")
+            os.mkdir(other_folder)
+            with open(benchmark.generate_csvs(other_folder, 200)['loans']) as second:
+                self.assertEqual(first_loans, second.read())
+
+    def test_run(self):
+        results = benchmark.run(200, repeat=3)
+        operations = {result['operation']: result for result in results}
+        for operation in ('load_loans_csv', 'load_loans_trusted', 'load_loans_snapshot', 'get_book_by_name',
+                          'list_loans', 'add_loan', 'remove_loan', 'new_loan_flow', 'rem_loan_flow'):
+            with self.subTest(operation):
+                self.assertIn(operation, operations)
+                self.assertGreater(operations[operation]['total_s'], 0)
@@ -16,15 +16,6 @@ class TestBookInit(unittest.TestCase):
             books.Book("Name", "Author", 2000, -1)
         self.assertRaises(ValueError, init)
 
-    def test_book_init_existing_id(self):
-        """
-        Tests for BookIdClashException on creation of 2 Books with the same ID
-        """
-        def init():
-            books.Book("Name2", "Author2", 1999, 2, ID=1)
-        books.Book("Name", "Author", 2000, 1, ID=1)
-        self.assertRaises(books.BookIdClashException, init)
-
     def test_book_init_passed_id(self):
         """
         Tests for initialization with a pre-set ID
@@ -33,9 +24,9 @@ class TestBookInit(unittest.TestCase):
 
     def test_book_init_blank_id(self):
         """
-        Tests for initialization with no ID
+        Tests for initialization with no ID (given by the list the book is added to)
         """
-        self.assertIsInstance(books.Book("Name", "Author", 2000, 1), books.Book)
+        self.assertEqual(books.Book("Name", "Author", 2000, 1).ID, -1)
 
 
 class TestBookMethods(unittest.TestCase):
@@ -16,15 +16,6 @@ class TestCustomerInit(unittest.TestCase):
             customers.Customer("Name", "City", 2500)
         self.assertRaises(customers.BirthYearException, init)
 
-    def test_customer_init_existing_id(self):
-        """
-        Tests for CustomerIdClashException on creation of 2 Customers with the same ID
-        """
-        def init():
-            customers.Customer("Name2", "City2", 1999, ID=1)
-        customers.Customer("Name", "City", 2000, ID=1)
-        self.assertRaises(customers.CustomerIdClashException, init)
-
     def test_customer_init_passed_id(self):
         """
         Tests for initialization with a pre-set ID
@@ -33,9 +24,9 @@ class TestCustomerInit(unittest.TestCase):
 
     def test_customers_init_blank_id(self):
         """
-        Tests for initialization with no ID
+        Tests for initialization with no ID (given by the list the customer is added to)
         """
-        self.assertIsInstance(customers.Customer("Name", "City", 2000), customers.Customer)
+        self.assertEqual(customers.Customer("Name", "City", 2000).ID, -1)
 
 
 class TestCustomerMethods(unittest.TestCase):
@@ -1,6 +1,12 @@
 import csv
+import datetime
+import gc
 import os
+import sys
+import threading
 import unittest
+import weakref
+from unittest.mock import patch
 import ItemList
 import books
 import customers
@@ -76,6 +82,22 @@ class TestItemListMethods(unittest.TestCase):
         self.list.load_from_csv(f"{self.folder_path}/test_book_list.csv")
         self.assertEqual(len(self.list), 3)
 
+    def test_load_from_csv_parallel(self):
+        path = f"{self.folder_path}/parallel_book_list.csv"
+        with open(path, "w") as file:
+            file.write('"id","name","author","year","type","total_quantity"\n')
+            for i in range(50):
+                file.write(f'"{i}","Name {i}","Author {i % 7}","1999","2","{i}"\n')
+            file.write('"3","Duplicate","Author","1999","2","1"\n')
+            file.write('"51","Bad Year","Author","year","2","1"\n')
+        with patch.object(ItemList, 'PARALLEL_LOAD_MIN_BYTES', 0), self.assertWarns(Warning):
+            self.list.load_from_csv(path, workers=2)
+        with self.subTest("Valid rows loaded in file order"):
+            self.assertListEqual(list(range(50)), [book.ID for book in self.list])
+        with self.subTest("First of the duplicate IDs kept"):
+            self.assertEqual("Name 3", self.list.get_by_property("id", 3)[0].name)
+        os.remove(path)
+
     def test_rewrite_db(self):
         create_test_csv(self.folder_path)
         self.list.load_from_csv(f"{self.folder_path}/test_book_list.csv")
@@ -134,6 +156,53 @@ class TestItemListMethods(unittest.TestCase):
         self.list.add(book1)
         self.assertRaises(ItemList.ItemExistsError, lambda: self.list.add(book1))
 
+    def test_add_existing_id(self):
+        path = "./testfiles/id_clash_list.csv"
+        for first, second in ((books.Book("Name", "Author", 2000, 1, ID=1),
+                               books.Book("Name2", "Author2", 1999, 2, ID=1)),
+                              (customers.Customer("Name", "City", 2000, ID=1),
+                               customers.Customer("Name2", "City2", 1999, ID=1)),
+                              (loans.Loan(0, 0, "10/10/2020", "11/10/2020", ID=1),
+                               loans.Loan(1, 1, "10/10/2020", "11/10/2020", ID=1))):
+            with self.subTest(type(first).__name__):
+                item_list = ItemList.ItemList(type(first), path)
+                item_list.add(first)
+                self.assertRaises(ItemList.ItemExistsError, lambda: item_list.add(second))
+                self.assertListEqual([first], list(item_list))
+            os.remove(path)
+
+    def test_add_assigns_ids(self):
+        self.list.add(books.Book("Name", "Author", 1999, 5, ID=10))
+        new_books = [books.Book(f"Name {i}", "Author", 1999, 5) for i in range(3)]
+        with self.subTest("Single item gets the next ID"):
+            self.list.add(new_books[0])
+            self.assertEqual(11, new_books[0].ID)
+        with self.subTest("Bulk insert gets a block of IDs"):
+            self.list.add_many(new_books[1:])
+            self.assertListEqual([12, 13], [book.ID for book in new_books[1:]])
+        with self.subTest("Lists don't share IDs"):
+            other_list = ItemList.ItemList(books.Book, "./testfiles/other_book_list.csv")
+            other_book = books.Book("Other", "Author", 1999, 5)
+            other_list.add(other_book)
+            self.assertEqual(0, other_book.ID)
+            os.remove("./testfiles/other_book_list.csv")
+
+    def test_id_reuse(self):
+        reusing = ItemList.ItemList(books.Book, "./testfiles/reuse_book_list.csv", reuse_ids=True)
+        reusing.add_many([books.Book(f"Name {i}", "Author", 1999, 5) for i in range(3)])
+        reusing.remove(1)
+        new_book = books.Book("New", "Author", 1999, 5)
+        reusing.add(new_book)
+        with self.subTest("Released ID reused"):
+            self.assertEqual(1, new_book.ID)
+        with self.subTest("Not reused by default"):
+            self.list.add_many([books.Book(f"Name {i}", "Author", 1999, 5) for i in range(3)])
+            self.list.remove(1)
+            new_book = books.Book("New", "Author", 1999, 5)
+            self.list.add(new_book)
+            self.assertEqual(3, new_book.ID)
+        os.remove("./testfiles/reuse_book_list.csv")
+
     def test_add_with_missing_file(self):
         os.remove("./testfiles/book_list.csv")
         book1 = books.Book(
@@ -161,6 +230,53 @@ class TestItemListMethods(unittest.TestCase):
         ]
         self.assertListEqual(res, expected_res)
 
+    def test_add_many(self):
+        book1 = books.Book("Name", "Author", 1999, 5, ID=0)
+        book2 = books.Book("Name2", "Author2", 2000, 3, ID=1)
+        self.list += [book1, book2]
+        with self.subTest("Items added"):
+            self.assertListEqual([book1, book2], list(self.list))
+        with self.subTest("Items written"):
+            with open("./testfiles/book_list.csv") as csvfile:
+                self.assertListEqual(["0", "1"], [row['id'] for row in csv.DictReader(csvfile)])
+        with self.subTest("All or nothing"):
+            book3 = books.Book("Name3", "Author3", 2001, 1, ID=2)
+            self.assertRaises(ItemList.ItemExistsError, lambda: self.list.add_many([book3, book1]))
+            self.assertEqual(len(self.list), 2)
+
+    def test_write_buffer(self):
+        path = "./testfiles/buffered_book_list.csv"
+        with ItemList.ItemList(books.Book, path, write_buffer={'max_rows': 10, 'max_delay': None}) as book_list:
+            book_list += books.Book("Name", "Author", 1999, 5, ID=0)
+            book_list += books.Book("Name2", "Author2", 2000, 3, ID=1)
+            with open(path) as csvfile:
+                with self.subTest("Rows buffered"):
+                    self.assertListEqual([], list(csv.DictReader(csvfile)))
+            book_list.flush()
+            with open(path) as csvfile:
+                with self.subTest("Rows written on flush"):
+                    self.assertListEqual(["0", "1"], [row['id'] for row in csv.DictReader(csvfile)])
+            book_list += books.Book("Name3", "Author3", 2001, 1, ID=2)
+            book_list.remove(0)
+        with open(path) as csvfile:
+            with self.subTest("Buffered rows not written twice after a rewrite"):
+                self.assertListEqual(["1", "2"], [row['id'] for row in csv.DictReader(csvfile)])
+        os.remove(path)
+
+    def test_write_buffer_collected(self):
+        path = "./testfiles/buffered_book_list.csv"
+        book_list = ItemList.ItemList(books.Book, path, write_buffer={'max_rows': 10, 'max_delay': None})
+        book_list += books.Book("Name", "Author", 1999, 5, ID=0)
+        collected = weakref.ref(book_list)
+        del book_list
+        gc.collect()
+        with self.subTest("List not kept alive"):
+            self.assertIsNone(collected())
+        with open(path) as csvfile:
+            with self.subTest("Buffered rows written"):
+                self.assertListEqual(["0"], [row['id'] for row in csv.DictReader(csvfile)])
+        os.remove(path)
+
     def test_remove(self):
         book1 = books.Book(
             name="Name",
@@ -215,6 +331,40 @@ class TestItemListMethods(unittest.TestCase):
         with self.subTest("Search for integer"):
             self.assertListEqual([book1], self.list.get_by_property("year", 1984))
 
+    def test_get_by_text_index(self):
+        book1 = books.Book("Animal Farm", "George Orwell", 1945, 50, books.BookType.RET_IN_5)
+        book2 = books.Book("Farmer Giles of Ham", "J. R. R. Tolkien", 1949, 5, books.BookType.RET_IN_5)
+        self.list.add(book1)
+        self.list.add(book2)
+        with self.subTest("Case insensitive substring"):
+            self.assertListEqual([book1, book2], self.list.get_by_property("name", "FARM"))
+        with self.subTest("Substring spanning words"):
+            self.assertListEqual([book1], self.list.get_by_property("name", "mal fa"))
+        with self.subTest("Query shorter than an n-gram"):
+            self.assertListEqual([book2], self.list.get_by_property("author", "J."))
+        with self.subTest("All n-grams present but no match"):
+            self.assertListEqual([], self.list.get_by_property("name", "farmal"))
+        self.list.remove(book1)
+        with self.subTest("Removed from index"):
+            self.assertListEqual([book2], self.list.get_by_property("name", "farm"))
+
+    def test_search(self):
+        create_test_csv(self.folder_path)
+        self.list.load_from_csv(f"{self.folder_path}/test_book_list.csv")
+        self.list.add(books.Book("Alice Through the Looking Glass", "Carroll Lewis", 1871, 2, ID=4))
+        with self.subTest("Ranked with typos"):
+            self.assertListEqual([3, 4], [book.ID for book in self.list.search("alices wonderlnd")])
+        with self.subTest("Kept up to date"):
+            self.list.remove(3)
+            self.list.add(books.Book("Carroll's Letters", "Carroll Lewis", 1900, 1, ID=5))
+            self.assertListEqual([5, 4], [book.ID for book in self.list.search("lewis carroll")])
+        with self.subTest("Word beginnings"):
+            self.assertListEqual([5, 4], [book.ID for book in self.list.search("carr")])
+        with self.subTest("Type without ranked fields"):
+            loan_list = ItemList.ItemList(loans.Loan, "./testfiles/search_loans.csv")
+            self.assertRaises(ValueError, loan_list.search, "01")
+            os.remove("./testfiles/search_loans.csv")
+
     def test_get_by_errors(self):
         with self.subTest("Test in non existent search field"):
             self.assertRaises(ValueError, lambda: self.list.get_by_property("Lorem", "Ipsum"))
@@ -223,6 +373,539 @@ class TestItemListMethods(unittest.TestCase):
         self.assertIs(self.list.get_list_type(), books.Book)
 
 
+class TestItemListIndexes(unittest.TestCase):
+    def setUp(self):
+        reload(books)
+        reload(customers)
+        reload(loans)
+        reload(ItemList)
+        self.list = ItemList.ItemList(loans.Loan, "./testfiles/loan_list.csv")
+        self.loan1 = loans.Loan(custID=1, bookID=10, loandate="01/01/2021", returndate="06/01/2021", ID=0)
+        self.loan2 = loans.Loan(custID=2, bookID=10, loandate="01/01/2021", returndate="06/01/2021", ID=1)
+        self.list.add(self.loan1)
+        self.list.add(self.loan2)
+
+    def tearDown(self):
+        os.remove("./testfiles/loan_list.csv")
+
+    def test_get_by_id(self):
+        with self.subTest("Existing ID"):
+            self.assertListEqual([self.loan2], self.list.get_by_property("id", 1))
+        with self.subTest("Missing ID"):
+            self.assertListEqual([], self.list.get_by_property("id", 5))
+
+    def test_get_by_indexed_field(self):
+        with self.subTest("Search by bookID"):
+            self.assertListEqual([self.loan1, self.loan2], self.list.get_by_property("bookID", 10))
+        with self.subTest("Search by custID"):
+            self.assertListEqual([self.loan2], self.list.get_by_property("custID", 2))
+
+    def test_get_by_range(self):
+        late = loans.Loan(custID=3, bookID=11, loandate="01/12/2020", returndate="03/12/2020", ID=2)
+        self.list.add(late)  # added out of return date order
+        cutoff = late.return_ordinal
+        with self.subTest("Upper bound"):
+            self.assertListEqual([late], self.list.get_by_range("return_date", high=cutoff))
+        with self.subTest("Lower bound"):
+            self.assertListEqual([self.loan1, self.loan2], self.list.get_by_range("return_date", low=cutoff + 1))
+        self.list.remove(late)
+        with self.subTest("Removed from sorted index"):
+            self.assertListEqual([], self.list.get_by_range("return_date", high=cutoff))
+        with self.subTest("Field without sorted index"):
+            self.assertRaises(ValueError, lambda: self.list.get_by_range("bookID", 0, 1))
+
+    def test_range_indexes(self):
+        self.list.add(loans.Loan(custID=3, bookID=11, loandate="20/12/2020", returndate="25/12/2020", ID=2))
+        with self.subTest("Loan date window"):
+            self.assertListEqual([2], [loan.ID for loan in self.list.get_by_range(
+                "loan_date", datetime.date(2020, 12, 1), datetime.date(2020, 12, 31))])
+        with self.subTest("Counts"):
+            self.assertEqual(2, self.list.count_by_range("loan_date", low=datetime.date(2021, 1, 1)))
+            self.assertEqual(3, self.list.count_by_range("return_date"))
+            self.assertEqual(0, self.list.count_by_range("loan_date", datetime.date(2021, 1, 2),
+                                                         datetime.date(2020, 1, 1)))
+        book_list = ItemList.ItemList(books.Book, "./testfiles/range_books.csv")
+        book_list += [books.Book("Name", "Author", year, 1) for year in (1999, 1950, 2005, 1980)]
+        with self.subTest("Publishing years"):
+            self.assertListEqual([1980, 1999], [book.year for book in book_list.get_by_range("year", 1960, 2000)])
+        book_list.remove(book_list.get_by_range("year", 1999, 1999)[0])
+        with self.subTest("Count after remove"):
+            self.assertEqual(1, book_list.count_by_range("year", 1960, 2000))
+        os.remove("./testfiles/range_books.csv")
+
+    def test_count_by_property(self):
+        with self.subTest("Indexed field"):
+            self.assertEqual(2, self.list.count_by_property("bookID", 10))
+        with self.subTest("Missing value"):
+            self.assertEqual(0, self.list.count_by_property("custID", 5))
+
+    def test_availability(self):
+        book_list = ItemList.ItemList(books.Book, "./testfiles/availability_books.csv")
+        book_list.add(books.Book("Name", "Author", 2000, 3, ID=10))
+        with self.subTest("Copies on loan"):
+            self.assertEqual(2, loans.on_loan(10, self.list))
+        with self.subTest("Copies available"):
+            self.assertEqual(1, loans.available(10, book_list, self.list))
+        self.list.remove(self.loan1)
+        with self.subTest("Copies available after return"):
+            self.assertEqual(2, loans.available(10, book_list, self.list))
+        with self.subTest("Book doesn't exist"):
+            self.assertEqual(0, loans.available(11, book_list, self.list))
+        os.remove("./testfiles/availability_books.csv")
+
+    def test_output_loans(self):
+        book_list = ItemList.ItemList(books.Book, "./testfiles/output_books.csv")
+        customer_list = ItemList.ItemList(customers.Customer, "./testfiles/output_customers.csv")
+        book_list.add(books.Book("Name", "Author", 2000, 3, ID=10))
+        customer_list.add(customers.Customer("Name", "City", 2000, ID=1))
+        expected = [loans.output_loan(loan, book_list, customer_list) for loan in self.list]
+        self.assertListEqual(expected, list(loans.output_loans(self.list, book_list, customer_list)))
+        os.remove("./testfiles/output_books.csv")
+        os.remove("./testfiles/output_customers.csv")
+
+    def test_query(self):
+        other = loans.Loan(custID=1, bookID=11, loandate="01/12/2020", returndate="03/12/2020", ID=2)
+        self.list.add(other)
+        with self.subTest("Conjunction"):
+            self.assertListEqual([other], self.list.query([("custID", "eq", 1), ("bookID", "eq", 11)]))
+        with self.subTest("In"):
+            self.assertListEqual([self.loan2, other], self.list.query([("bookID", "in", [10, 11]), ("id", "in", [1, 2])]))
+        with self.subTest("Range on a sorted field"):
+            self.assertListEqual([other], self.list.query([("return_date", "range", (None, other.return_ordinal))]))
+        with self.subTest("Prefix and contains"):
+            self.assertListEqual([self.loan1, self.loan2],
+                                 self.list.query([("loan_date", "prefix", "01/01"), ("loan_date", "contains", "2021")]))
+        with self.subTest("Order and limit"):
+            self.assertListEqual([other, self.loan1], self.list.query([], order_by="return_date", limit=2))
+            self.assertListEqual([other, self.loan2], self.list.query([], order_by="id", descending=True, limit=2))
+            self.assertListEqual([self.loan1], self.list.query([("custID", "eq", 1)], order_by="bookID", limit=1))
+        with self.subTest("Errors"):
+            self.assertRaises(ValueError, self.list.query, [("Lorem", "eq", 1)])
+            self.assertRaises(ValueError, self.list.query, [("custID", "like", 1)])
+
+    def test_query_plan(self):
+        self.list.add(loans.Loan(custID=1, bookID=11, loandate="01/12/2020", returndate="03/12/2020", ID=2))
+        with self.subTest("Most selective index"):
+            self.assertEqual("hash index on bookID (1 candidates)",
+                             self.list.explain([("custID", "eq", 1), ("bookID", "eq", 11)]))
+        with self.subTest("ID lookup"):
+            self.assertEqual("ID lookup (1 candidates)", self.list.explain([("custID", "eq", 1), ("id", "eq", 0)]))
+        with self.subTest("No index"):
+            self.assertEqual("full scan (3 candidates)", self.list.explain([("loan_date", "prefix", "01")]))
+
+    def test_index_after_remove(self):
+        self.list.remove(self.loan1)
+        with self.subTest("Removed from bookID index"):
+            self.assertListEqual([self.loan2], self.list.get_by_property("bookID", 10))
+        with self.subTest("Removed from custID index"):
+            self.assertListEqual([], self.list.get_by_property("custID", 1))
+
+
+class TestItemListCache(unittest.TestCase):
+    def setUp(self):
+        reload(books)
+        reload(customers)
+        reload(loans)
+        reload(ItemList)
+        self.path = "./testfiles/cache_list.csv"
+        self.list = ItemList.ItemList(customers.Customer, self.path, cache_size=2, instrumented=True)
+        self.list += [customers.Customer("Dana Levi", "Haifa", 1980), customers.Customer("Omer Cohen", "Eilat", 1990)]
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_hits(self):
+        first = self.list.get_by_property("name", "levi")
+        with self.subTest("Same result"):
+            self.assertListEqual(first, self.list.get_by_property("name", "LEVI"))
+        with self.subTest("Hit counted"):
+            self.assertEqual((1, 1), (self.list.cache_stats()['hits'], self.list.cache_stats()['misses']))
+        with self.subTest("ID lookups not cached"):
+            self.list.get_by_property("id", 0)
+            self.assertEqual(1, self.list.cache_stats()['size'])
+        with self.subTest("In stats"):
+            self.assertEqual(1, self.list.stats()['cache']['hits'])
+
+    def test_invalidation(self):
+        self.list.get_by_property("name", "levi")
+        self.list.get_by_property("birth_year", 1990)
+        with self.subTest("Unrelated add keeps results"):
+            self.list.add(customers.Customer("Noa Katz", "Holon", 2000))
+            self.assertEqual(0, self.list.cache_stats()['invalidations'])
+        with self.subTest("Matching add drops the result"):
+            self.list.add(customers.Customer("Yael Levin", "Holon", 2001))
+            self.assertEqual(2, len(self.list.get_by_property("name", "levi")))
+            self.assertEqual(1, self.list.cache_stats()['invalidations'])
+        with self.subTest("Matching remove drops the result"):
+            self.list.remove(1)
+            self.assertListEqual([], self.list.get_by_property("birth_year", 1990))
+            self.assertEqual(2, self.list.cache_stats()['invalidations'])
+
+    def test_eviction(self):
+        for query in ("dana", "omer", "levi"):
+            self.list.get_by_property("name", query)
+        self.assertEqual(1, self.list.cache_stats()['evictions'])
+        self.list.add(customers.Customer("Dana Katz", "Holon", 2000))  # its evicted result isn't tracked anymore
+        self.assertEqual(0, self.list.cache_stats()['invalidations'])
+
+
+class TestItemListJournal(unittest.TestCase):
+    def setUp(self):
+        reload(books)
+        reload(customers)
+        reload(loans)
+        reload(ItemList)
+        self.path = "./testfiles/journal_list.csv"
+        self.list = ItemList.ItemList(loans.Loan, self.path, journaled=True, compact_threshold=4)
+        self.list.add(loans.Loan(custID=1, bookID=10, loandate="01/01/2021", returndate="06/01/2021", ID=0))
+        self.list.add(loans.Loan(custID=2, bookID=10, loandate="01/01/2021", returndate="06/01/2021", ID=1))
+
+    def tearDown(self):
+        for path in (self.path, self.path + ".journal"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_remove_appends_tombstone(self):
+        with open(self.path) as csvfile:
+            base_before = csvfile.read()
+        self.list.remove(0)
+        with self.subTest("Base file untouched"):
+            with open(self.path) as csvfile:
+                self.assertEqual(base_before, csvfile.read())
+        with self.subTest("Tombstone journaled"):
+            with open(self.path + ".journal") as journal:
+                self.assertIn('"-","0"', journal.read())
+
+    def test_load_replays_journal(self):
+        self.list.remove(0)
+        reload(loans)
+        reload(ItemList)
+        reloaded = ItemList.ItemList(loans.Loan, self.path, journaled=True, compact_threshold=4)
+        self.assertListEqual([1], [loan.ID for loan in reloaded])
+
+    def test_compaction(self):
+        self.list.remove(0)
+        self.list.add(loans.Loan(custID=3, bookID=11, loandate="01/01/2021", returndate="06/01/2021", ID=2))
+        with self.subTest("Journal removed"):
+            self.assertFalse(os.path.exists(self.path + ".journal"))
+        with self.subTest("Base file rewritten"):
+            with open(self.path) as csvfile:
+                self.assertListEqual(["1", "2"], [row['id'] for row in csv.DictReader(csvfile)])
+
+
+class TestItemListSnapshot(unittest.TestCase):
+    def setUp(self):
+        reload(books)
+        reload(customers)
+        reload(loans)
+        reload(ItemList)
+        self.path = "./testfiles/snapshot_list.csv"
+        self.list = ItemList.ItemList(books.Book, self.path, snapshot=True)
+        self.list.add(books.Book("Name", "Author", 1999, 3, books.BookType.RET_IN_2, ID=0))
+        self.list.add(books.Book("Other", "Author", 2001, 1, ID=1))
+        self.list.rewrite_db()
+
+    def tearDown(self):
+        for path in (self.path, self.path + ".snapshot", self.path + ".journal"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def reload_list(self, **kwargs):
+        reload(books)
+        reload(ItemList)
+        return ItemList.ItemList(books.Book, self.path, snapshot=True, **kwargs)
+
+    def test_load_from_snapshot(self):
+        with patch.object(ItemList.util, 'iter_csv', side_effect=AssertionError("csv parsed")):
+            reloaded = self.reload_list()
+        with self.subTest("Items restored"):
+            self.assertListEqual([book.get_dict() for book in self.list], [book.get_dict() for book in reloaded])
+        with self.subTest("Book type restored"):
+            self.assertIs(books.BookType.RET_IN_2, reloaded.get_by_property("id", 0)[0].book_type)
+        with self.subTest("Stored IDs are not given to new items"):
+            new_book = books.Book("New", "Author", 2020, 1)
+            reloaded.add(new_book)
+            self.assertEqual(2, new_book.ID)
+        with self.subTest("Text index built"):
+            self.assertEqual(1, len(reloaded.get_by_property("name", "oth")))
+
+    def test_changed_csv_parsed(self):
+        self.list.add(books.Book("Appended", "Author", 2010, 1, ID=2))
+        reloaded = self.reload_list()
+        self.assertListEqual([0, 1, 2], [book.ID for book in reloaded])
+        with self.subTest("Snapshot rewritten"):
+            with patch.object(ItemList.util, 'iter_csv', side_effect=AssertionError("csv parsed")):
+                self.assertEqual(3, len(self.reload_list()))
+
+    def test_journal_replayed_over_snapshot(self):
+        journaled = self.reload_list(journaled=True)
+        journaled.remove(0)
+        journaled.add(books.Book("Journaled", "Author", 2010, 1, ID=5))
+        reloaded = self.reload_list(journaled=True)
+        self.assertListEqual([1, 5], [book.ID for book in reloaded])
+
+
+class TestItemListTrusted(unittest.TestCase):
+    def setUp(self):
+        reload(books)
+        reload(customers)
+        reload(loans)
+        reload(ItemList)
+        self.path = "./testfiles/trusted_list.csv"
+        self.list = ItemList.ItemList(loans.Loan, self.path, trusted=True, instrumented=True)
+        self.list.add(loans.Loan(custID=1, bookID=10, loandate="01/01/2021", returndate="06/01/2021", ID=0))
+        self.list.add(loans.Loan(custID=2, bookID=11, loandate="02/01/2021", returndate="12/01/2021", ID=1))
+        self.list.rewrite_db()
+
+    def tearDown(self):
+        for path in (self.path, self.path + ".certificate"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def reload_list(self):
+        reload(loans)
+        reload(ItemList)
+        return ItemList.ItemList(loans.Loan, self.path, trusted=True, instrumented=True)
+
+    def test_trusted_load(self):
+        with patch.object(ItemList.util, 'iter_csv', side_effect=AssertionError("rows validated")):
+            reloaded = self.reload_list()
+        with self.subTest("Items restored"):
+            self.assertListEqual([loan.get_dict() for loan in self.list], [loan.get_dict() for loan in reloaded])
+        with self.subTest("Dates converted"):
+            self.assertEqual("12/01/2021", reloaded.get_by_property("id", 1)[0].returndate)
+        with self.subTest("Indexes built"):
+            self.assertEqual(1, len(reloaded.get_by_property("custID", 2)))
+            self.assertEqual(2, reloaded.count_by_range("loan_date", datetime.date(2021, 1, 1), None))
+        with self.subTest("Load source recorded"):
+            self.assertEqual('trusted csv', reloaded.stats()['loads'][0]['source'])
+
+    def test_appended_rows_validated(self):
+        with open(self.path, "a") as csvfile:
+            csvfile.write('"2","3","12","03/01/2021","13/01/2021"\n"3","x","13","03/01/2021","13/01/2021"\n')
+        with self.assertWarns(Warning):
+            reloaded = self.reload_list()
+        self.assertListEqual([0, 1, 2], [loan.ID for loan in reloaded])
+        with self.subTest("Invalid rows not certified"):
+            self.assertLess(ItemList.util.certified_length(self.path), os.path.getsize(self.path))
+
+    def test_valid_appended_rows_certified(self):
+        self.list.add(loans.Loan(custID=3, bookID=12, loandate="03/01/2021", returndate="13/01/2021", ID=2))
+        self.reload_list()
+        self.assertEqual(os.path.getsize(self.path), ItemList.util.certified_length(self.path))
+
+    def test_changed_file_validated(self):
+        with open(self.path) as csvfile:
+            text = csvfile.read()
+        with open(self.path, "w") as csvfile:
+            csvfile.write(text.replace('"02/01/2021"', '"05/01/2021"'))
+        reloaded = self.reload_list()
+        self.assertEqual("05/01/2021", reloaded.get_by_property("id", 1)[0].loandate)
+        self.assertEqual('csv', reloaded.stats()['loads'][0]['source'])
+
+    def test_undecodable_rows_parsed_strictly(self):
+        with open(self.path, "a") as csvfile:
+            csvfile.write('"2","3","12","03/01/2021","13/01/2021"\n')
+        ItemList.util.certify_csv(self.path)
+        with open(self.path, "a") as csvfile:
+            csvfile.write('"3","4","12","31/02/2021","13/03/2021"\n')
+        ItemList.util.certify_csv(self.path)
+        with self.assertWarns(Warning):
+            reloaded = self.reload_list()
+        self.assertListEqual([0, 1, 2], [loan.ID for loan in reloaded])
+
+
+class TestItemListStats(unittest.TestCase):
+    def setUp(self):
+        reload(books)
+        reload(customers)
+        reload(loans)
+        reload(ItemList)
+        self.path = "./testfiles/stats_list.csv"
+        self.list = ItemList.ItemList(loans.Loan, self.path, instrumented=True)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_stats(self):
+        self.list.add(loans.Loan(custID=1, bookID=10, loandate="01/01/2021", returndate="06/01/2021", ID=0))
+        self.list.add(loans.Loan(custID=2, bookID=10, loandate="01/01/2021", returndate="06/01/2021", ID=1))
+        self.list.get_by_property("bookID", 10)
+        self.list.get_by_property("loan_date", "01/01")
+        self.list.remove(0)
+        recorded = self.list.stats()
+        with self.subTest("Call counts"):
+            self.assertEqual(2, recorded['operations']['add']['calls'])
+            self.assertEqual(1, recorded['operations']['remove']['calls'])
+            self.assertEqual(1, recorded['operations']['rewrite_db']['calls'])
+            self.assertEqual(2, sum(recorded['operations']['get_by_property']['histogram'].values()))
+        with self.subTest("Items scanned"):
+            self.assertEqual(2 + 2, recorded['counters']['items_scanned'])
+            self.assertEqual(1, recorded['counters']['full_scans'])
+        with self.subTest("Bytes written"):
+            self.assertGreater(recorded['counters']['bytes_appended'], 0)
+            self.assertEqual(os.path.getsize(self.path), recorded['counters']['bytes_rewritten'])
+        with self.subTest("Load recorded"):
+            self.assertListEqual([(self.path, 'csv', 0)],
+                                 [(load['path'], load['source'], load['items']) for load in recorded['loads']])
+
+    def test_loading_not_counted_as_adds(self):
+        self.list.add(loans.Loan(custID=1, bookID=10, loandate="01/01/2021", returndate="06/01/2021", ID=0))
+        reload(loans)
+        reload(ItemList)
+        reloaded = ItemList.ItemList(loans.Loan, self.path, instrumented=True)
+        self.assertNotIn('add', reloaded.stats()['operations'])
+        self.assertEqual(1, reloaded.stats()['loads'][0]['items'])
+
+    def test_not_instrumented(self):
+        self.assertIsNone(ItemList.ItemList(loans.Loan, self.path).stats())
+
+
+class TestItemListRefresh(unittest.TestCase):
+    def setUp(self):
+        reload(books)
+        reload(customers)
+        reload(loans)
+        reload(ItemList)
+        self.path = "./testfiles/refresh_list.csv"
+        self.list = ItemList.ItemList(books.Book, self.path, concurrent=True)
+        self.list.add_many([books.Book("Name", "Author", 1999, 3, ID=0), books.Book("Other", "Author", 2001, 1, ID=1)])
+
+    def tearDown(self):
+        self.list.close()
+        os.remove(self.path)
+
+    def append(self, text):
+        with open(self.path, "a") as csvfile:
+            csvfile.write(text)
+
+    def test_appended_rows(self):
+        self.append('"2","Appended","Author","2010","1","1"\n"3","Partial","Au')
+        with self.subTest("Complete rows added"):
+            self.assertEqual(1, self.list.refresh())
+            self.assertEqual(1, len(self.list.get_by_property("name", "Appended")))
+        self.append('thor","2010","1","1"\n')
+        with self.subTest("Line finished later"):
+            self.assertEqual(1, self.list.refresh())
+            self.assertListEqual([0, 1, 2, 3], sorted(book.ID for book in self.list))
+        with self.subTest("Unchanged file"):
+            self.assertEqual(0, self.list.refresh())
+
+    def test_own_rows_not_duplicated(self):
+        self.list.add(books.Book("Mine", "Author", 2010, 1))
+        self.assertEqual(0, self.list.refresh())
+        self.assertEqual(3, len(self.list))
+
+    def test_rewritten_file_reloaded(self):
+        with open(self.path, "w") as csvfile:
+            csvfile.write('"id","name","author","year","type","total_quantity"\n"7","New","Author","2010","1","1"\n')
+        self.list.refresh()
+        self.assertListEqual([7], [book.ID for book in self.list])
+
+    def test_removed_rows_not_read_back(self):
+        self.append('"2","Appended","Author","2010","1","1"\n')
+        self.list.remove(0)
+        with self.subTest("Appended row kept by the rewrite"):
+            self.assertListEqual([1, 2], sorted(book.ID for book in self.list))
+        with self.subTest("File matches the list"):
+            self.list.refresh()
+            self.assertListEqual([1, 2], sorted(book.ID for book in self.list))
+
+    def test_watch(self):
+        self.list.watch(0.01)
+        self.append('"2","Appended","Author","2010","1","1"\n')
+        for _ in range(500):
+            if len(self.list) == 3:
+                break
+            threading.Event().wait(0.01)
+        self.list.stop_watching()
+        self.assertEqual(3, len(self.list))
+        with self.subTest("Only concurrent lists"):
+            self.assertRaises(ValueError, ItemList.ItemList(books.Book, self.path).watch)
+
+
+class TestItemListConcurrent(unittest.TestCase):
+    def setUp(self):
+        reload(books)
+        reload(customers)
+        reload(loans)
+        reload(ItemList)
+        self.path = "./testfiles/concurrent_list.csv"
+        self.list = ItemList.ItemList(books.Book, self.path, concurrent=True)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_parallel_ranked_search(self):
+        self.list.add_many([books.Book(f"Name {' '.join(['word'] * (i % 7))} {i}", "Author", 2000, 1, ID=i)
+                            for i in range(5000)])
+        errors = []
+        start = threading.Barrier(8)
+
+        def search(thread):
+            try:
+                start.wait()
+                for i in range(20):
+                    if thread % 2:
+                        self.list.add(books.Book(f"Added {'word ' * (50 * i)}{thread}", "Author", 2000, 1))
+                    self.assertEqual(10, len(self.list.search("name word")))
+            except Exception as e:
+                errors.append(e)
+        # The first search builds the index, the added items change its length norms while others search.
+        # Switching threads often makes them interleave within the index's updates
+        threads = [threading.Thread(target=search, args=(thread,)) for thread in range(8)]
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-5)
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(switch_interval)
+        self.assertListEqual([], errors)
+
+    def test_parallel_add_and_search(self):
+        errors = []
+
+        def add(start):
+            try:
+                for i in range(start, start + 50):
+                    self.list.add(books.Book(f"Name {i}", "Author", 2000, 1, ID=i))
+            except Exception as e:
+                errors.append(e)
+
+        def search():
+            try:
+                for _ in range(50):
+                    self.list.get_by_property("name", "name")
+                    list(self.list)
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=add, args=(start,)) for start in (0, 50)]
+        threads += [threading.Thread(target=search) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with self.subTest("No errors"):
+            self.assertListEqual([], errors)
+        with self.subTest("All items added"):
+            self.assertEqual(100, len(self.list))
+        with self.subTest("All rows written"):
+            with open(self.path) as csvfile:
+                self.assertEqual(100, len(list(csv.DictReader(csvfile))))
+
+    def test_iteration_snapshot(self):
+        self.list += [books.Book("Name", "Author", 2000, 1, ID=i) for i in range(3)]
+        seen = []
+        for book in self.list:
+            seen.append(book.ID)
+            if book.ID == 0:
+                self.list.remove(2)
+        self.assertListEqual([0, 1, 2], seen)
+
+
 def create_test_csv(folder_path):
     """
     Creates a csv file matching a Book object at "{PATH}/test_book_list.csv"
@@ -0,0 +1,74 @@
+import os
+import threading
+import unittest
+import ItemList
+import SqliteItemList
+import books
+from LazyItemList import LazyItemList
+from importlib import reload
+
+
+class TestLazyItemList(unittest.TestCase):
+    def setUp(self):
+        reload(books)
+        reload(ItemList)
+        self.path = "./testfiles/lazy_book_list.csv"
+        stored = ItemList.ItemList(books.Book, self.path)
+        stored.add(books.Book("Name", "Author", 1999, 3, ID=0))
+        reload(books)
+        reload(ItemList)
+        self.loads = []
+        self.list = LazyItemList(lambda: ItemList.ItemList(books.Book, self.path), on_load=self.loads.append)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_loaded_on_first_use(self):
+        with self.subTest("Not loaded when created"):
+            self.assertFalse(self.list.loaded())
+            self.assertListEqual([], self.loads)
+        with self.subTest("Loaded by a search"):
+            self.assertEqual("Name", self.list.get_by_property("id", 0)[0].name)
+            self.assertTrue(self.list.loaded())
+        with self.subTest("Loaded once"):
+            self.assertEqual(1, len(self.list))
+            self.assertEqual(1, len(self.loads))
+            self.assertIsNotNone(self.list.load_time)
+
+    def test_operators(self):
+        self.list += books.Book("Other", "Author", 2001, 1, ID=1)
+        with self.subTest("+= keeps the proxy"):
+            self.assertIsInstance(self.list, LazyItemList)
+        with self.subTest("Iteration"):
+            self.assertListEqual([0, 1], [book.ID for book in self.list])
+
+    def test_prefetch(self):
+        loading = threading.Event()
+        release = threading.Event()
+
+        def slow_factory():
+            loading.set()
+            release.wait(5)
+            return ItemList.ItemList(books.Book, self.path)
+
+        prefetched = LazyItemList(slow_factory)
+        prefetched.prefetch()
+        self.assertTrue(loading.wait(5))
+        release.set()
+        with self.subTest("Use waits for the prefetch"):
+            self.assertEqual(1, len(prefetched))
+
+    def test_prefetched_sqlite_list(self):
+        db_path = "./testfiles/lazy_library.db"
+        reload(SqliteItemList)
+        prefetched = LazyItemList(lambda: SqliteItemList.SqliteItemList(books.Book, db_path, csv_path=self.path))
+        prefetched.prefetch()
+        with self.subTest("Read from another thread"):
+            self.assertListEqual([0], [book.ID for book in prefetched])
+            self.assertEqual(1, len(prefetched.search("name")))
+        with self.subTest("Written from another thread"):
+            prefetched += books.Book("Other", "Author", 2001, 1, ID=1)
+            prefetched.remove(0)
+            self.assertListEqual([1], [book.ID for book in prefetched])
+        prefetched.close()
+        os.remove(db_path)
@@ -32,15 +32,6 @@ class TestLoanInit(unittest.TestCase):
             loans.Loan(0, 0, "11/10/2020", "10/10/2020")
         self.assertRaises(loans.DateOrderException, init_disordered)
 
-    def test_loan_init_existing_id(self):
-        """
-        Tests for LoanIdClashException on creation of 2 IDs with the same ID
-        """
-        def init():
-            loans.Loan(0, 0, "10/10/2020", "11/10/2020", ID=1)
-        loans.Loan(0, 0, "10/10/2020", "11/10/2020", ID=1)
-        self.assertRaises(loans.LoanIdClashException, init)
-
     def test_customer_init_passed_id(self):
         """
         Tests for initialization with a pre-set ID
@@ -49,15 +40,15 @@ class TestLoanInit(unittest.TestCase):
 
     def test_customers_init_blank_id(self):
         """
-        Tests for initialization with no ID
+        Tests for initialization with no ID (given by the list the loan is added to)
         """
-        self.assertIsInstance(loans.Loan(0, 0, "10/10/2020", "11/10/2020"), loans.Loan)
+        self.assertEqual(loans.Loan(0, 0, "10/10/2020", "11/10/2020").ID, -1)
 
 
 class TestLoanMethods(unittest.TestCase):
     def setUp(self) -> None:
         reload(loans)
-        self.loan_obj = loans.Loan(0, 0, "10/10/2020", "11/10/2020")
+        self.loan_obj = loans.Loan(0, 0, "10/10/2020", "11/10/2020", ID=0)
 
     def test_is_late(self):
         """
@@ -65,6 +56,17 @@ class TestLoanMethods(unittest.TestCase):
         """
         self.assertEqual(self.loan_obj.is_late(), True)
 
+    def test_date_storage(self):
+        """
+        Test that dates are stored as day numbers and converted back to the same strings
+        """
+        with self.subTest("Stored as ordinals"):
+            self.assertEqual(self.loan_obj.return_ordinal - self.loan_obj.loan_ordinal, 1)
+        with self.subTest("String output"):
+            self.assertEqual((self.loan_obj.loandate, self.loan_obj.returndate), ("10/10/2020", "11/10/2020"))
+        with self.subTest("No instance dict"):
+            self.assertFalse(hasattr(self.loan_obj, '__dict__'))
+
     def test_get_dict(self):
         """
         Test for a correct return from get_dict()
@@ -0,0 +1,92 @@
+import unittest
+import SearchIndex
+import books
+from importlib import reload
+
+
+class TestSearchHelpers(unittest.TestCase):
+    def test_tokenize(self):
+        self.assertListEqual(["the", "lord", "of", "the", "rings"], SearchIndex.tokenize("The Lord of-the Rings"))
+
+    def test_edit_distance(self):
+        with self.subTest("Substitution"):
+            self.assertEqual(1, SearchIndex.edit_distance("river", "rover", 2))
+        with self.subTest("Transposition"):
+            self.assertEqual(1, SearchIndex.edit_distance("silent", "siletn", 2))
+        with self.subTest("Above the limit"):
+            self.assertEqual(2, SearchIndex.edit_distance("garden", "gordon", 1))
+
+    def test_allowed_typos(self):
+        self.assertListEqual([0, 1, 2, 0], [SearchIndex.allowed_typos(token)
+                                            for token in ("cat", "river", "wonderland", "19999999")])
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        reload(books)
+        self.index = SearchIndex.SearchIndex({'name': lambda book: book.name, 'author': lambda book: book.author})
+        self.books = [books.Book("Pride and Prejudice", "Austen Jane", 1813, 1, ID=0),
+                      books.Book("Emma", "Austen Jane", 1815, 1, ID=1),
+                      books.Book("The Garden Party", "Mansfield Katherine", 1922, 1, ID=2),
+                      books.Book("The Secret Garden", "Burnett Frances", 1911, 1, ID=3),
+                      books.Book("Garden Garden Garden", "Anonymous", 2000, 1, ID=4)]
+        for book in self.books:
+            self.index.add(book)
+
+    def search(self, query, limit=10):
+        return [book.ID for _, book in self.index.search(query, limit)]
+
+    def test_ranking(self):
+        with self.subTest("Rarer words weigh more"):
+            self.assertEqual(3, self.search("secret garden")[0])
+        with self.subTest("Repeated words weigh more"):
+            self.assertEqual(4, self.search("garden")[0])
+        with self.subTest("Shorter fields rank higher"):
+            self.assertListEqual([1, 0], self.search("austen"))
+
+    def test_typos(self):
+        with self.subTest("Misspelled word"):
+            self.assertListEqual([0], self.search("prejudise"))
+        with self.subTest("Exact match ranked above a typo"):
+            self.index.add(books.Book("Gardens", "Author", 2000, 1, ID=5))
+            self.assertListEqual([5, 4], self.search("gardens", limit=2))
+        with self.subTest("Short words don't tolerate typos"):
+            self.assertListEqual([], self.search("emx"))
+
+    def test_prefixes(self):
+        with self.subTest("Beginning of a word"):
+            self.assertListEqual([1], self.search("em"))
+            self.assertListEqual([0], self.search("prej"))
+        with self.subTest("Whole word ranked above a longer word"):
+            self.index.add(books.Book("The Gardening Party", "Mansfield Katherine", 1922, 1, ID=5))
+            self.assertListEqual([4, 2, 3, 5], self.search("garden"))
+        with self.subTest("Removed words not matched"):
+            self.index.remove(self.books[1])
+            self.assertListEqual([], self.search("em"))
+
+    def test_pruned_results_match_full_ranking(self):
+        words = ["river", "stone", "garden", "night", "winter", "glass"]
+        for i in range(300):
+            self.index.add(books.Book(" ".join(words[(i * j) % 6] for j in range(1 + i % 5)), "Author", 2000, 1,
+                                      ID=10 + i))
+        for query in ("river stone", "garden night winter", "glass river", "stone stone"):
+            with self.subTest(query):
+                self.assertListEqual(self.search(query, limit=len(self.index))[:5], self.search(query, limit=5))
+
+    def test_built_with_items(self):
+        index = SearchIndex.SearchIndex({'name': lambda book: book.name}, self.books)
+        self.assertListEqual(self.search("garden"), [book.ID for _, book in index.search("garden")])
+
+    def test_limit(self):
+        self.assertListEqual([4, 2, 3], self.search("garden", limit=3))
+        self.assertEqual(1, len(self.search("garden", limit=1)))
+
+    def test_remove(self):
+        self.index.remove(self.books[3])
+        with self.subTest("Removed item not found"):
+            self.assertListEqual([], self.search("secret"))
+        with self.subTest("Typo candidates of removed words dropped"):
+            self.assertListEqual([], self.search("secrets"))
+        with self.subTest("Other items kept"):
+            self.assertListEqual([4, 2], self.search("garden"))
+        self.assertEqual(4, len(self.index))
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import os
+import unittest
+import ItemList
+import SqliteItemList
+import books
+import customers
+import loans
+import menuOptions
+import server
+from LazyItemList import LazyItemList
+from importlib import reload
+
+
+class TestLibraryServer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        reload(books)
+        reload(customers)
+        reload(loans)
+        reload(ItemList)
+        reload(menuOptions)
+        reload(server)
+        self.paths = ["./testfiles/server_books.csv", "./testfiles/server_customers.csv",
+                      "./testfiles/server_loans.csv"]
+        self.book_list = ItemList.ItemList(books.Book, self.paths[0])
+        self.customer_list = ItemList.ItemList(customers.Customer, self.paths[1])
+        self.loan_list = ItemList.ItemList(loans.Loan, self.paths[2])
+        self.book_list += books.Book("Animal Farm", "George Orwell", 1945, 1, ID=1)
+        self.customer_list += customers.Customer("Name Name", "City", 2000, ID=1)
+        library = server.LibraryServer(self.book_list, self.customer_list, self.loan_list)
+        self.server = await asyncio.start_server(library.handle_connection, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+        for path in self.paths:
+            os.remove(path)
+
+    async def request(self, method, target, data=None):
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        body = json.dumps(data).encode() if data is not None else b''
+        writer.write(f"{method} {target} HTTP/1.1\r\nContent-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, _, payload = response.partition(b'\r\n\r\n')
+        return int(head.split()[1]), json.loads(payload)
+
+    async def test_search(self):
+        status, payload = await self.request('GET', '/books?name=farm')
+        self.assertEqual(200, status)
+        self.assertListEqual([self.book_list.get_by_property('id', 1)[0].get_dict()], payload)
+
+    async def test_loan_and_return(self):
+        with self.subTest("New loan"):
+            status, payload = await self.request('POST', '/loans', {'custID': 1, 'bookID': 1})
+            self.assertEqual(201, status)
+            self.assertEqual(1, len(self.loan_list))
+        with self.subTest("Out of stock"):
+            status, _ = await self.request('POST', '/loans', {'custID': 1, 'bookID': 1})
+            self.assertEqual(409, status)
+        with self.subTest("Return"):
+            status, _ = await self.request('POST', '/returns', {'custID': 1, 'bookID': 1})
+            self.assertEqual(200, status)
+            self.assertEqual(0, len(self.loan_list))
+
+    async def test_errors(self):
+        with self.subTest("Unknown path"):
+            self.assertEqual(404, (await self.request('GET', '/lorem'))[0])
+        with self.subTest("Unknown customer"):
+            self.assertEqual(404, (await self.request('POST', '/loans', {'custID': 5, 'bookID': 1}))[0])
+        with self.subTest("Missing field"):
+            self.assertEqual(400, (await self.request('POST', '/loans', {'custID': 1}))[0])
+
+
+class TestLibraryServerSqlite(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        reload(books)
+        reload(customers)
+        reload(loans)
+        reload(ItemList)
+        reload(SqliteItemList)
+        reload(menuOptions)
+        reload(server)
+        self.db_path = "./testfiles/server_library.db"
+        # Created on other threads, like the lists of main.py --storage sqlite
+        self.lists = [LazyItemList(lambda item_type=item_type: SqliteItemList.SqliteItemList(item_type, self.db_path))
+                      for item_type in (books.Book, customers.Customer, loans.Loan)]
+        for item_list in self.lists:
+            item_list.prefetch()
+        self.lists[0] += books.Book("Animal Farm", "George Orwell", 1945, 1, ID=1)
+        self.lists[1] += customers.Customer("Name Name", "City", 2000, ID=1)
+        library = server.LibraryServer(*self.lists)
+        self.server = await asyncio.start_server(library.handle_connection, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+        for item_list in self.lists:
+            item_list.close()
+        os.remove(self.db_path)
+
+    async def request(self, method, target, data=None):
+        return await TestLibraryServer.request(self, method, target, data)
+
+    async def test_requests(self):
+        with self.subTest("Lookup"):
+            status, payload = await self.request('GET', '/books/1')
+            self.assertEqual(200, status)
+            self.assertEqual("Animal Farm", payload['name'])
+        with self.subTest("New loan"):
+            self.assertEqual(201, (await self.request('POST', '/loans', {'custID': 1, 'bookID': 1}))[0])
+            self.assertEqual(1, len(self.lists[2]))
+        with self.subTest("Late loans"):
+            self.assertEqual(200, (await self.request('GET', '/loans/late'))[0])
@@ -0,0 +1,140 @@
+import os
+import sqlite3
+import unittest
+import ItemList
+import SqliteItemList
+import books
+import customers
+import loans
+from importlib import reload
+
+
+class TestSqliteItemList(unittest.TestCase):
+    def setUp(self):
+        reload(books)
+        reload(customers)
+        reload(loans)
+        reload(ItemList)
+        reload(SqliteItemList)
+        self.db_path = "./testfiles/test_library.db"
+        self.list = SqliteItemList.SqliteItemList(books.Book, self.db_path)
+        self.book1 = books.Book("Animal Farm", "George Orwell", 1945, 50, books.BookType.RET_IN_5)
+        self.book2 = books.Book("Farmer Giles of Ham", "J. R. R. Tolkien", 1949, 5, books.BookType.RET_IN_2)
+        self.list += self.book1
+        self.list += self.book2
+
+    def tearDown(self):
+        self.list.close()
+        os.remove(self.db_path)
+
+    def test_add_and_iter(self):
+        self.assertListEqual([self.book1, self.book2], list(self.list))
+
+    def test_add_exists_error(self):
+        self.assertRaises(ItemList.ItemExistsError, lambda: self.list.add(self.book1))
+
+    def test_get_by(self):
+        with self.subTest("Search for string"):
+            self.assertListEqual([self.book1, self.book2], self.list.get_by_property("name", "FARM"))
+        with self.subTest("Search for integer"):
+            self.assertListEqual([self.book2], self.list.get_by_property("year", 1949))
+        with self.subTest("Search by ID"):
+            self.assertListEqual([self.book1], self.list.get_by_property("id", self.book1.ID))
+        with self.subTest("Non existent search field"):
+            self.assertRaises(ValueError, lambda: self.list.get_by_property("Lorem", "Ipsum"))
+
+    def test_get_by_range(self):
+        loan_list = SqliteItemList.SqliteItemList(loans.Loan, self.db_path)
+        loan1 = loans.Loan(0, 0, "10/10/2020", "20/10/2020")
+        loan2 = loans.Loan(0, 0, "01/10/2020", "05/10/2020")
+        loan_list += loan1
+        loan_list += loan2
+        self.assertListEqual([loan2, loan1], loan_list.get_by_range("return_date", high=loan1.return_ordinal))
+        self.assertListEqual([loan2], loan_list.get_by_range("return_date", high=loan2.return_ordinal))
+        loan_list.close()
+
+    def test_query(self):
+        with self.subTest("Conjunction"):
+            self.assertListEqual([self.book2], self.list.query([("name", "contains", "farm"), ("year", "in", [1949])]))
+        with self.subTest("Prefix"):
+            self.assertListEqual([self.book2], self.list.query([("name", "prefix", "FARMER")]))
+        with self.subTest("Range, order and limit"):
+            self.assertListEqual([self.book2], self.list.query([("year", "range", (1940, None))], order_by="year",
+                                                               descending=True, limit=1))
+        with self.subTest("Unknown operator"):
+            self.assertRaises(ValueError, self.list.query, [("name", "like", "farm")])
+
+    def test_search(self):
+        self.assertListEqual([self.book2, self.book1], self.list.search("farmer orwel"))
+        self.list.remove(self.book1)
+        self.assertListEqual([self.book2], self.list.search("farmer orwel"))
+
+    def test_count_by_range(self):
+        with self.subTest("Count"):
+            self.assertEqual(1, self.list.count_by_range("year", 1946, None))
+        with self.subTest("Field without sorted index"):
+            self.assertRaises(ValueError, self.list.count_by_range, "total_quantity", 0, 1)
+
+    def test_sort_columns_added(self):
+        self.list.close()
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.execute('DROP INDEX "books_year_key"')
+            conn.execute('ALTER TABLE "books" DROP COLUMN "year_key"')
+        conn.close()
+        self.list = SqliteItemList.SqliteItemList(books.Book, self.db_path)
+        self.assertListEqual([1949], [book.year for book in self.list.get_by_range("year", 1946, 2000)])
+
+    def test_remove(self):
+        with self.subTest("Removal by object"):
+            self.assertEqual(self.book1, self.list.remove(self.book1))
+        with self.subTest("Removal by ID"):
+            self.assertEqual(self.book2, self.list.remove(self.book2.ID))
+        with self.subTest("Removal of missing item"):
+            self.assertRaises(ItemList.ItemDoesNotExistError, lambda: self.list.remove(self.book1))
+        self.assertEqual(len(self.list), 0)
+
+    def test_persistence(self):
+        self.list.close()
+        reload(books)
+        reload(ItemList)
+        reload(SqliteItemList)
+        self.list = SqliteItemList.SqliteItemList(books.Book, self.db_path)
+        with self.subTest("Items are stored"):
+            self.assertEqual(len(self.list), 2)
+        with self.subTest("Stored IDs are not given to new items"):
+            new_book = books.Book("Name", "Author", 2000, 1)
+            self.list += new_book
+            self.assertNotIn(new_book.ID, [-1, self.book1.ID, self.book2.ID])
+
+    def test_csv_export_import(self):
+        csv_path = "./testfiles/sqlite_export.csv"
+        import_db_path = "./testfiles/test_import.db"
+        self.list.export_csv(csv_path)
+        reload(books)
+        reload(ItemList)
+        reload(SqliteItemList)
+        imported = SqliteItemList.SqliteItemList(books.Book, import_db_path, csv_path=csv_path)
+        self.assertListEqual([self.book1.get_dict(), self.book2.get_dict()], [item.get_dict() for item in imported])
+        imported.close()
+        os.remove(import_db_path)
+        os.remove(csv_path)
+
+    def test_import_clashing_ids(self):
+        csv_path = "./testfiles/sqlite_clashes.csv"
+        import_db_path = "./testfiles/test_import.db"
+        with open(csv_path, "w") as csvfile:
+            csvfile.write('"id","name","author","year","type","total_quantity"\n')
+            for ID in (0, 1, 2, 1, 3):
+                csvfile.write(f'"{ID}","Name {ID}","Author","2000","1","1"\n')
+        with self.assertWarns(Warning):
+            imported = SqliteItemList.SqliteItemList(books.Book, import_db_path, csv_path=csv_path)
+        with self.subTest("Rows of the clashing chunk kept"):
+            self.assertListEqual([0, 1, 2, 3], [item.ID for item in imported])
+        with self.subTest("Committed"):
+            imported.close()
+            imported = SqliteItemList.SqliteItemList(books.Book, import_db_path)
+            self.assertEqual(4, len(imported))
+        imported.close()
+        os.remove(import_db_path)
+        os.remove(csv_path)
@@ -1,6 +1,8 @@
 import builtins
 import csv
 import os
+import threading
+import time
 import unittest
 
 import util
@@ -27,6 +29,15 @@ class TestUtilMethods(unittest.TestCase):
         with self.assertWarns(Warning):
             util.csv_to_arr(self.file_path)
 
+    def test_iter_csv(self):
+        with self.subTest("Row by row"):
+            self.assertListEqual(list(util.iter_csv(self.file_path)), get_test_list())
+        with self.subTest("Chunked with progress"):
+            progress = []
+            chunks = list(util.iter_csv(self.file_path, chunk_size=2, progress=progress.append))
+            self.assertListEqual(chunks, [get_test_list()[:2], get_test_list()[2:]])
+            self.assertListEqual(progress, [2, 3])
+
     def test_arr2csv(self):
         fields = list(get_test_list()[0].keys())
         testpath = self.folder_path + "/test_arr2csv.csv"
@@ -82,6 +93,197 @@ class TestUtilMethods(unittest.TestCase):
         with patch.object(builtins, 'open', side_effect=IOError):
             self.assertRaises(IOError, util.append_csv, item={}, filepath=self.file_path)
 
+    def test_snapshot(self):
+        snapshot_path = self.folder_path + "/test_snapshot.bin"
+        columns = {'id': [0, 1, -5], 'city': ["Tel Aviv", "Haifa", "Tel Aviv"], 'note': ["", "\u05d0", "x"]}
+        util.write_snapshot(snapshot_path, self.file_path, columns)
+        with self.subTest("Read back"):
+            self.assertDictEqual(columns, util.read_snapshot(snapshot_path, self.file_path))
+        with self.subTest("Repeated strings shared"):
+            cities = util.read_snapshot(snapshot_path, self.file_path)['city']
+            self.assertIs(cities[0], cities[2])
+        with self.subTest("Mixed column rejected"):
+            self.assertRaises(TypeError, util.write_snapshot, snapshot_path, self.file_path, {'id': [1, "2"]})
+        with self.subTest("Damaged snapshot ignored"):
+            with open(snapshot_path, "r+b") as snapshot_file:
+                snapshot_file.seek(-1, os.SEEK_END)
+                snapshot_file.write(b'?')
+            self.assertIsNone(util.read_snapshot(snapshot_path, self.file_path))
+        with self.subTest("Stale snapshot ignored"):
+            util.write_snapshot(snapshot_path, self.file_path, columns)
+            with open(self.file_path, "a") as csvfile:
+                csvfile.write('"4","Name","Author","2000","1","1"\n')
+            self.assertIsNone(util.read_snapshot(snapshot_path, self.file_path))
+        os.remove(snapshot_path)
+
+    def test_read_appended_csv(self):
+        mark = util.file_mark(self.file_path)
+        with self.subTest("Nothing appended"):
+            self.assertListEqual([], util.read_appended_csv(self.file_path, mark)[0])
+        with open(self.file_path, "a") as csvfile:
+            csvfile.write('"4","Name","Author","2000","1","1"\n"5","Unfinished')
+        rows, mark = util.read_appended_csv(self.file_path, mark)
+        with self.subTest("Complete rows read"):
+            self.assertListEqual(['4'], [row['id'] for row in rows])
+        with self.subTest("Rewritten file detected"):
+            util.arr_to_csv(get_test_list()[::-1], list(get_test_list()[0]), self.file_path)
+            self.assertIsNone(util.read_appended_csv(self.file_path, mark))
+
+    def test_certify_csv(self):
+        size = os.path.getsize(self.file_path)
+        with self.subTest("Not certified"):
+            self.assertEqual(0, util.certified_length(self.file_path))
+        with self.subTest("Certified"):
+            self.assertEqual(size, util.certify_csv(self.file_path))
+            self.assertEqual(size, util.certified_length(self.file_path))
+        with self.subTest("Appended rows not certified"):
+            with open(self.file_path, "a") as csvfile:
+                csvfile.write('"4","Name","Author","2000","1","1"\n')
+            self.assertEqual(size, util.certified_length(self.file_path))
+        with self.subTest("Cut back to the last complete line"):
+            self.assertEqual(size, util.certify_csv(self.file_path, size + 5))
+        with self.subTest("Rows read up to the certified length"):
+            fieldnames, rows = util.read_csv_lines(self.file_path, size)
+            self.assertListEqual(list(get_test_list()[0]), fieldnames)
+            self.assertEqual(len(get_test_list()), len(rows))
+        with self.subTest("Changed certified part detected"):
+            with open(self.file_path, "r+b") as csvfile:
+                csvfile.seek(size - 3)
+                csvfile.write(b'9')
+            self.assertEqual(0, util.certified_length(self.file_path))
+        os.remove(self.file_path + ".certificate")
+
+
+class TestOperationStats(unittest.TestCase):
+    def test_record(self):
+        stats = util.OperationStats()
+        stats.record('search', 5e-6)
+        stats.record('search', 2.0)
+        with stats.timed('add'):
+            pass
+        stats.count('items_scanned', 3)
+        stats.count('items_scanned')
+        recorded = stats.snapshot()
+        with self.subTest("Histogram"):
+            self.assertEqual(1, recorded['operations']['search']['histogram']['<=10us'])
+            self.assertEqual(1, recorded['operations']['search']['histogram']['>1s'])
+        with self.subTest("Timed block"):
+            self.assertEqual(1, recorded['operations']['add']['calls'])
+        with self.subTest("Counters"):
+            self.assertDictEqual({'items_scanned': 4}, recorded['counters'])
+
+    def test_no_stats(self):
+        stats = util.NoStats()
+        with stats.timed('add'):
+            stats.count('items_scanned')
+        self.assertIsNone(stats.snapshot())
+
+
+class TestLruCache(unittest.TestCase):
+    def test_eviction(self):
+        evicted = []
+        cache = util.LruCache(2, on_evict=evicted.append)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        with self.subTest("Least recently used dropped"):
+            self.assertListEqual(['b'], evicted)
+            self.assertIsNone(cache.get('b'))
+            self.assertEqual(1, cache.get('a'))
+        with self.subTest("Counts"):
+            info = cache.info()
+            self.assertEqual((2, 1, 1), (info['hits'], info['misses'], info['evictions']))
+
+    def test_invalidate(self):
+        cache = util.LruCache(2)
+        cache.put('a', 1)
+        cache.invalidate('a')
+        cache.invalidate('missing')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(1, cache.info()['invalidations'])
+
+
+class TestBufferedCsvWriter(unittest.TestCase):
+    def setUp(self) -> None:
+        self.file_path = "./testfiles/test_buffered.csv"
+
+    def tearDown(self) -> None:
+        os.remove(self.file_path)
+
+    def read_rows(self):
+        if not os.path.exists(self.file_path):
+            return []
+        with open(self.file_path, mode='r', encoding="utf-8-sig") as csvfile:
+            return list(csv.DictReader(csvfile, quoting=csv.QUOTE_ALL))
+
+    def test_size_threshold(self):
+        with util.BufferedCsvWriter(self.file_path, max_rows=3, max_delay=None) as writer:
+            writer.write_rows(get_test_list()[:2])
+            with self.subTest("Buffered"):
+                self.assertListEqual([], self.read_rows())
+            writer.write_rows(get_test_list()[2:])
+            with self.subTest("Written at max_rows"):
+                self.assertListEqual(get_test_list(), self.read_rows())
+
+    def test_flush_and_close(self):
+        writer = util.BufferedCsvWriter(self.file_path, max_rows=10, max_delay=None, fsync=True)
+        writer.write_rows(get_test_list()[:1])
+        writer.flush()
+        with self.subTest("Written on flush"):
+            self.assertListEqual(get_test_list()[:1], self.read_rows())
+        writer.write_rows(get_test_list()[1:])
+        writer.close()
+        with self.subTest("Written on close"):
+            self.assertListEqual(get_test_list(), self.read_rows())
+
+    def test_delay(self):
+        with util.BufferedCsvWriter(self.file_path, max_rows=10, max_delay=0.05) as writer:
+            writer.write_rows(get_test_list())
+            time.sleep(0.3)
+            self.assertListEqual(get_test_list(), self.read_rows())
+
+
+class TestReadWriteLock(unittest.TestCase):
+    def test_concurrent_readers(self):
+        lock = util.ReadWriteLock()
+        barrier = threading.Barrier(2, timeout=5)
+
+        def read():
+            with lock.reading():
+                barrier.wait()  # only passes if both readers hold the lock at once
+        threads = [threading.Thread(target=read) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertFalse(barrier.broken)
+
+    def test_writer_excludes_readers(self):
+        lock = util.ReadWriteLock()
+        events = []
+
+        def read():
+            with lock.reading():
+                events.append("read")
+        with lock.writing():
+            thread = threading.Thread(target=read)
+            thread.start()
+            thread.join(0.1)
+            events.append("write done")
+        thread.join()
+        self.assertListEqual(["write done", "read"], events)
+
+    def test_reentrancy(self):
+        lock = util.ReadWriteLock()
+        with lock.writing():
+            with lock.writing():
+                with lock.reading():
+                    pass
+        with lock.reading():
+            with lock.reading():
+                self.assertRaises(RuntimeError, lock.writing().__enter__)
+
 
 def create_test_csv(folder_path):
     """
@@ -1,6 +1,17 @@
+import bisect
+import io
+import itertools
 import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict
 import warnings
 import csv
+from contextlib import contextmanager, nullcontext
 
 
 def csv_to_arr(filepath: str):
@@ -9,16 +20,142 @@ def csv_to_arr(filepath: str):
     :param filepath: The CSV file to read
     :return: A list of row dictionaries
     """
-    lines = []
+    return list(iter_csv(filepath))
+
+
+def iter_csv(filepath: str, chunk_size: int = None, progress=None):
+    """
+    Reads a csv file lazily, one row (or one chunk of rows) at a time
+    :param filepath: The CSV file to read
+    :param chunk_size: if given, yields lists of up to chunk_size row dictionaries instead of single rows
+    :param progress: optional func(rows_read) called after every yielded row/chunk
+    :return: A generator of row dictionaries (or lists of them)
+    """
+    rows_read = 0
+    chunk = []
     try:
         with open(filepath, mode='r', encoding="utf-8-sig") as csvfile:
             reader = csv.DictReader(csvfile, quoting=csv.QUOTE_ALL)
             for row in reader:
-                lines.append(row)
-        return lines
+                rows_read += 1
+                if chunk_size is None:
+                    yield row
+                    if progress is not None:
+                        progress(rows_read)
+                    continue
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+                    if progress is not None:
+                        progress(rows_read)
     except IOError as e:
         warnings.warn("Problem reading csv file:\n" + str(e))
-        return []
+    if chunk:
+        yield chunk
+        if progress is not None:
+            progress(rows_read)
+
+
+def split_csv(filepath: str, parts: int):
+    """
+    Splits the rows of a csv file into byte ranges that start and end on line boundaries
+    :param filepath: The CSV file to split
+    :param parts: the amount of (roughly equal) ranges to split the file into
+    :return: (header field names, list of (start, end) byte offsets)
+    """
+    ranges = []
+    try:
+        with open(filepath, mode='rb') as csvfile:
+            header = csvfile.readline()
+            fieldnames = next(csv.reader([header.decode('utf-8-sig')]), [])
+            start = csvfile.tell()
+            size = os.fstat(csvfile.fileno()).st_size
+            step = max(1, (size - start) // parts)
+            while start < size:
+                csvfile.seek(min(start + step, size))
+                csvfile.readline()  # move on to the end of the line the boundary fell in
+                end = csvfile.tell()
+                ranges.append((start, end))
+                start = end
+    except IOError as e:
+        warnings.warn("Problem reading csv file:\n" + str(e))
+        return [], []
+    return fieldnames, ranges
+
+
+def read_csv_range(filepath: str, fieldnames: list, start: int, end: int):
+    """
+    Reads the rows in a byte range of a csv file (see split_csv)
+    :param filepath: The CSV file to read
+    :param fieldnames: the file's header field names
+    :param start: offset of the range's first line
+    :param end: offset right after the range's last line
+    :return: A list of row dictionaries
+    """
+    with open(filepath, mode='rb') as csvfile:
+        csvfile.seek(start)
+        text = csvfile.read(end - start).decode('utf-8')
+    reader = csv.DictReader(io.StringIO(text, newline=''), fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
+    return list(reader)
+
+
+FINGERPRINT_BYTES = 64
+
+
+def file_mark(filepath: str):
+    """
+    Marks how far a file has been read (its current end), to later read only what was appended after the mark
+    :param filepath: path to a file
+    :return: {'offset', 'size', 'mtime_ns', 'inode', 'fingerprint'} dictionary, None if the file doesn't exist.
+    The fingerprint is the last FINGERPRINT_BYTES bytes before the offset, to tell a rewritten file from a grown one.
+    """
+    try:
+        with open(filepath, mode='rb') as file:
+            stat = os.fstat(file.fileno())
+            start = max(0, stat.st_size - FINGERPRINT_BYTES)
+            file.seek(start)
+            fingerprint = file.read(stat.st_size - start)
+    except FileNotFoundError:
+        return None
+    return {'offset': stat.st_size, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'inode': stat.st_ino,
+            'fingerprint': fingerprint}
+
+
+def read_appended_csv(filepath: str, mark: dict):
+    """
+    Reads the complete rows appended to a csv file since a file_mark(). A last line that is still being written
+    (doesn't end with a line break yet) is left for the next call.
+    :param filepath: The CSV file to read
+    :param mark: a file_mark() of the file
+    :return: (list of row dictionaries, new mark), None if the file was truncated, replaced or rewritten since the mark
+    """
+    try:
+        with open(filepath, mode='rb') as file:
+            stat = os.fstat(file.fileno())
+            offset = mark['offset']
+            if stat.st_ino != mark['inode'] or stat.st_size < offset:
+                return None
+            if stat.st_size == mark['size'] and stat.st_mtime_ns == mark['mtime_ns']:
+                return [], mark
+            file.seek(offset - len(mark['fingerprint']))
+            if file.read(len(mark['fingerprint'])) != mark['fingerprint']:
+                return None
+            appended = file.read(stat.st_size - offset)
+            end = appended.rfind(b'\n') + 1  # 0 when no line was completed
+            if end:
+                file.seek(0)
+                header = file.readline().decode('utf-8-sig')
+                fieldnames = next(csv.reader([header]), [])
+    except FileNotFoundError:
+        return None
+    new_mark = {'offset': offset + end, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'inode': stat.st_ino,
+                'fingerprint': (mark['fingerprint'] + appended[:end])[-FINGERPRINT_BYTES:]}
+    if not end:
+        return [], new_mark
+    reader = csv.DictReader(io.StringIO(appended[:end].decode('utf-8'), newline=''), fieldnames=fieldnames,
+                            quoting=csv.QUOTE_ALL)
+    return list(reader), new_mark
 
 
 def arr_to_csv(arr: list[dict], fields: list, filepath: str):
@@ -27,7 +164,7 @@ def arr_to_csv(arr: list[dict], fields: list, filepath: str):
     :param arr: array of row dictionaries to write to file
     :param fields: a list of all field names
     :param filepath: path to a csv file to write to
-    :return: None
+    :return: True if the file was written, False if writing failed
     """
     verify_path(filepath)
     try:
@@ -42,6 +179,8 @@ def arr_to_csv(arr: list[dict], fields: list, filepath: str):
                 writer.writerow(row)
     except IOError as e:
         warnings.warn("Couldn't write array to file: " + str(e))
+        return False
+    return True
 
 
 def append_csv(item: dict, filepath: str):
@@ -51,20 +190,225 @@ def append_csv(item: dict, filepath: str):
     :param filepath: CSV file to append to (str)
     :return: None
     """
+    append_csv_rows([item], filepath)
+
+
+def append_csv_rows(items: list[dict], filepath: str):
+    """
+    Appends dictionaries to csv file with a single write
+    :param items: Items to append (list of dicts with the same keys)
+    :param filepath: CSV file to append to (str)
+    :return: amount of bytes written
+    """
+    if not items:
+        return 0
     write_headers = False
     if not os.path.exists(filepath):
         write_headers = True
     verify_path(filepath)
+    text = format_csv_rows(items, write_headers)
     with open(filepath, mode='a', newline='') as csvfile:
-        fieldnames = item.keys()
-        writer = csv.DictWriter(
-            csvfile,
-            fieldnames=fieldnames,
-            quoting=csv.QUOTE_ALL
-        )
-        if write_headers:
-            writer.writeheader()
-        writer.writerow(item)
+        csvfile.write(text)
+    return len(text.encode())
+
+
+def format_csv_rows(items: list[dict], write_headers: bool = False):
+    """
+    Formats dictionaries as csv text
+    :param items: Items to format (list of dicts with the same keys)
+    :param write_headers: whether to start with a header line
+    :return: csv text (str)
+    """
+    buffer = io.StringIO()
+    fieldnames = items[0].keys()
+    writer = csv.DictWriter(
+        buffer,
+        fieldnames=fieldnames,
+        quoting=csv.QUOTE_ALL
+    )
+    if write_headers:
+        writer.writeheader()
+    writer.writerows(items)
+    return buffer.getvalue()
+
+
+SNAPSHOT_MAGIC = b'ILSNAP01'
+SNAPSHOT_HEADER = struct.Struct('<8sQqQHI')  # magic, source size, source mtime_ns, rows, columns, payload crc32
+SNAPSHOT_INT = b'i'
+SNAPSHOT_STR = b's'
+
+
+def write_snapshot(filepath: str, source_path: str, columns: dict[str, list]):
+    """
+    Writes columns of values to a binary snapshot file, stamped with the size and modification time of the file
+    the values were read from. Int columns are stored as packed 64 bit integers, str columns as packed lengths
+    followed by their utf-8 text. The file is replaced atomically.
+    :param filepath: snapshot file to write
+    :param source_path: file the snapshot mirrors (e.g. a csv file)
+    :param columns: {name: list of values} dictionary, all lists of the same length and holding only ints or strs
+    :return: None
+    """
+    row_count = len(next(iter(columns.values()), []))
+    parts = []
+    for name, values in columns.items():
+        if len(values) != row_count:
+            raise ValueError(f"Snapshot column {name} has {len(values)} values instead of {row_count}")
+        encoded_name = name.encode('utf-8')
+        parts.append(struct.pack('<H', len(encoded_name)) + encoded_name)
+        if all(isinstance(value, int) for value in values):
+            packed = array('q', values)
+            if sys.byteorder != 'little':
+                packed.byteswap()
+            parts += [SNAPSHOT_INT, packed.tobytes()]
+        elif all(isinstance(value, str) for value in values):
+            lengths = array('q', map(len, values))
+            text = ''.join(values).encode('utf-8')
+            if sys.byteorder != 'little':
+                lengths.byteswap()
+            parts += [SNAPSHOT_STR, lengths.tobytes(), struct.pack('<Q', len(text)), text]
+        else:
+            raise TypeError(f"Snapshot column {name} holds values other than int or str")
+    payload = b''.join(parts)
+    source_stat = os.stat(source_path)
+    header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, source_stat.st_size, source_stat.st_mtime_ns, row_count,
+                                  len(columns), zlib.crc32(payload))
+    verify_path(filepath)
+    temp_path = filepath + '.tmp'
+    with open(temp_path, 'wb') as snapshot_file:
+        snapshot_file.write(header + payload)
+    os.replace(temp_path, filepath)
+
+
+def read_snapshot(filepath: str, source_path: str):
+    """
+    Reads the columns of a snapshot written by write_snapshot(), if the file it mirrors hasn't changed since.
+    Repeated strings (e.g. a city shared by many customers) are returned as a single object.
+    :param filepath: snapshot file to read
+    :param source_path: file the snapshot mirrors
+    :return: {name: list of values} dictionary, None if the snapshot is missing, stale or damaged
+    """
+    try:
+        source_stat = os.stat(source_path)
+        with open(filepath, 'rb') as snapshot_file:
+            data = snapshot_file.read()
+        magic, size, mtime_ns, row_count, column_count, checksum = SNAPSHOT_HEADER.unpack_from(data)
+        payload = memoryview(data)[SNAPSHOT_HEADER.size:]
+        if magic != SNAPSHOT_MAGIC or (size, mtime_ns) != (source_stat.st_size, source_stat.st_mtime_ns) \
+                or zlib.crc32(payload) != checksum:
+            return None
+        columns = {}
+        offset = 0
+        for _ in range(column_count):
+            name_length, = struct.unpack_from('<H', payload, offset)
+            offset += 2
+            name = bytes(payload[offset:offset + name_length]).decode('utf-8')
+            offset += name_length
+            kind = bytes(payload[offset:offset + 1])
+            offset += 1
+            packed = array('q')
+            packed.frombytes(payload[offset:offset + row_count * packed.itemsize])
+            offset += row_count * packed.itemsize
+            if sys.byteorder != 'little':
+                packed.byteswap()
+            if kind == SNAPSHOT_INT:
+                columns[name] = packed.tolist()
+            elif kind == SNAPSHOT_STR:
+                text_length, = struct.unpack_from('<Q', payload, offset)
+                offset += 8
+                text = bytes(payload[offset:offset + text_length]).decode('utf-8')
+                offset += text_length
+                shared = {}
+                ends = itertools.accumulate(packed)
+                starts = itertools.chain((0,), itertools.accumulate(packed))
+                columns[name] = [shared.setdefault(value, value)
+                                 for value in (text[start:end] for start, end in zip(starts, ends))]
+            else:
+                return None
+            if len(columns[name]) != row_count:
+                return None
+        return columns
+    except (OSError, struct.error, ValueError):  # UnicodeDecodeError is a ValueError
+        return None
+
+
+CERTIFICATE_MAGIC = b'ILCERT01'
+CERTIFICATE = struct.Struct('<8sQI')  # magic, certified length, crc32 of the certified bytes
+CHECKSUM_CHUNK = 1 << 20
+
+
+def line_checksum(csvfile, length: int):
+    """
+    Computes the crc32 of the first bytes of a file, up to the end of the last complete line within them
+    :param csvfile: file open for binary reading
+    :param length: amount of bytes to consider
+    :return: (length up to the last line break, crc32 of those bytes)
+    """
+    csvfile.seek(0)
+    crc = 0
+    line_end, line_crc = 0, 0
+    position = 0
+    while position < length:
+        chunk = csvfile.read(min(CHECKSUM_CHUNK, length - position))
+        if not chunk:
+            break
+        last_break = chunk.rfind(b'\n')
+        if last_break != -1:
+            line_end, line_crc = position + last_break + 1, zlib.crc32(chunk[:last_break + 1], crc)
+        crc = zlib.crc32(chunk, crc)
+        position += len(chunk)
+    return line_end, line_crc
+
+
+def certify_csv(filepath: str, length: int = None):
+    """
+    Records in "{filepath}.certificate" that the complete lines in the first bytes of a csv file were written or
+    fully validated by the program, with their length and checksum, so they can later be loaded without
+    validating them again (see certified_length()). The certificate is replaced atomically.
+    :param filepath: csv file to certify
+    :param length: amount of bytes to certify (None for the whole file), cut back to the last complete line
+    :return: the certified length
+    """
+    with open(filepath, mode='rb') as csvfile:
+        if length is None:
+            length = os.fstat(csvfile.fileno()).st_size
+        certified, crc = line_checksum(csvfile, length)
+    temp_path = filepath + '.certificate.tmp'
+    with open(temp_path, 'wb') as certificate:
+        certificate.write(CERTIFICATE.pack(CERTIFICATE_MAGIC, certified, crc))
+    os.replace(temp_path, filepath + '.certificate')
+    return certified
+
+
+def certified_length(filepath: str):
+    """
+    Returns how many bytes at the start of a csv file are unchanged since certify_csv() certified them
+    :param filepath: csv file to check
+    :return: the certified length, 0 if the file has no valid certificate or its certified part was changed
+    """
+    try:
+        with open(filepath + '.certificate', 'rb') as certificate:
+            magic, length, crc = CERTIFICATE.unpack(certificate.read())
+        with open(filepath, mode='rb') as csvfile:
+            if magic != CERTIFICATE_MAGIC or os.fstat(csvfile.fileno()).st_size < length:
+                return 0
+            if line_checksum(csvfile, length) != (length, crc):
+                return 0
+    except (OSError, struct.error):
+        return 0
+    return length
+
+
+def read_csv_lines(filepath: str, end: int):
+    """
+    Reads the header and the rows (as lists of values, in the header's order) before a byte offset of a csv file
+    :param filepath: The CSV file to read
+    :param end: offset right after the last line to read
+    :return: (header field names, list of rows)
+    """
+    with open(filepath, mode='rb') as csvfile:
+        text = csvfile.read(end).decode('utf-8-sig')
+    reader = csv.reader(io.StringIO(text, newline=''))
+    return next(reader, []), list(reader)
 
 
 def verify_path(pathstr: str):
@@ -77,3 +421,387 @@ def verify_path(pathstr: str):
     if not os.path.exists(dirpath):
         os.makedirs(dirpath)
     return str(dirpath)
+
+
+class BufferedCsvWriter:
+    """
+    Appends rows to a csv file in batches through a file handle that is kept open.
+    A batch is written once it reaches max_rows rows, max_delay seconds after its first row, or on flush()/close().
+    """
+    def __init__(self, filepath: str, max_rows: int = 100, max_delay: float = 1.0, fsync: bool = False):
+        """
+        :param filepath: CSV file to append to
+        :param max_rows: amount of buffered rows that triggers a write
+        :param max_delay: seconds a row may wait in the buffer (None to only write on size or flush())
+        :param fsync: whether every batch is synced to disk, instead of being left in the OS's buffers
+        """
+        self.__filepath = filepath
+        self.__max_rows = max_rows
+        self.__max_delay = max_delay
+        self.__fsync = fsync
+        self.__file = None
+        self.__rows = []
+        self.__timer = None
+        self.__lock = threading.Lock()
+        self.bytes_written = 0
+
+    def write_rows(self, items: list[dict]):
+        """
+        Buffers rows to append to the file
+        :param items: Items to append (list of dicts with the same keys)
+        :return: None
+        """
+        with self.__lock:
+            self.__rows.extend(items)
+            if len(self.__rows) >= self.__max_rows:
+                self.__flush()
+            elif self.__timer is None and self.__max_delay is not None:
+                self.__timer = threading.Timer(self.__max_delay, self.flush)
+                self.__timer.daemon = True
+                self.__timer.start()
+
+    def flush(self):
+        """
+        Writes the buffered rows to the file
+        :return: None
+        """
+        with self.__lock:
+            self.__flush()
+
+    def __flush(self):
+        if self.__timer is not None:
+            self.__timer.cancel()
+            self.__timer = None
+        if not self.__rows:
+            return
+        rows, self.__rows = self.__rows, []
+        try:
+            write_headers = False
+            if self.__file is None:
+                write_headers = not os.path.exists(self.__filepath)
+                verify_path(self.__filepath)
+                self.__file = open(self.__filepath, mode='a', newline='')
+            text = format_csv_rows(rows, write_headers)
+            self.__file.write(text)
+            self.__file.flush()
+            self.bytes_written += len(text.encode())
+            if self.__fsync:
+                os.fsync(self.__file.fileno())
+        except IOError:
+            self.__rows = rows + self.__rows  # keep the rows for the next attempt
+            raise
+
+    def discard(self):
+        """
+        Drops the buffered rows and closes the file (e.g. before the file is rewritten or deleted)
+        :return: None
+        """
+        with self.__lock:
+            self.__rows = []
+            self.__close()
+
+    def close(self):
+        """
+        Writes the buffered rows and closes the file
+        :return: None
+        """
+        with self.__lock:
+            self.__flush()
+            self.__close()
+
+    def __close(self):
+        if self.__timer is not None:
+            self.__timer.cancel()
+            self.__timer = None
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+class ReadWriteLock:
+    """
+    A lock that can be held by many readers or by a single writer. Waiting writers keep new readers out.
+    A thread holding the lock may acquire it again (for reading, or for writing if it holds it for writing).
+    """
+    def __init__(self):
+        self.__condition = threading.Condition()
+        self.__readers = 0
+        self.__writer = False
+        self.__waiting_writers = 0
+        self.__held = threading.local()  # per thread reading/writing depth
+
+    @contextmanager
+    def reading(self):
+        held = self.__held
+        if getattr(held, 'reading', 0) or getattr(held, 'writing', 0):  # already holding the lock
+            held.reading = getattr(held, 'reading', 0) + 1
+            try:
+                yield
+            finally:
+                held.reading -= 1
+            return
+        with self.__condition:
+            while self.__writer or self.__waiting_writers:
+                self.__condition.wait()
+            self.__readers += 1
+        held.reading = 1
+        try:
+            yield
+        finally:
+            held.reading = 0
+            with self.__condition:
+                self.__readers -= 1
+                if not self.__readers:
+                    self.__condition.notify_all()
+
+    @contextmanager
+    def writing(self):
+        held = self.__held
+        if getattr(held, 'writing', 0):
+            held.writing += 1
+            try:
+                yield
+            finally:
+                held.writing -= 1
+            return
+        if getattr(held, 'reading', 0):
+            raise RuntimeError("Cannot acquire a lock for writing while holding it for reading")
+        with self.__condition:
+            self.__waiting_writers += 1
+            while self.__writer or self.__readers:
+                self.__condition.wait()
+            self.__waiting_writers -= 1
+            self.__writer = True
+        held.writing = 1
+        try:
+            yield
+        finally:
+            held.writing = 0
+            with self.__condition:
+                self.__writer = False
+                self.__condition.notify_all()
+
+
+class NoLock:
+    """
+    Stands in for a ReadWriteLock when no synchronization is needed
+    """
+    @staticmethod
+    def reading():
+        return nullcontext()
+
+    @staticmethod
+    def writing():
+        return nullcontext()
+
+
+class OperationStats:
+    """
+    Collects call counts and latency histograms of operations, named counters and load times.
+    """
+    # Upper bounds (in seconds) of the latency histogram's buckets, slower calls go to a last "over" bucket
+    LATENCY_BOUNDS = [1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0]
+
+    def __init__(self):
+        self.__operations = {}  # name -> {'calls', 'total_s', 'max_s', 'histogram'}
+        self.__counters = {}
+        self.__loads = []
+        self.__lock = threading.Lock()
+
+    @contextmanager
+    def timed(self, operation: str):
+        """
+        Times the code in a with block as a call of an operation
+        :param operation: name of the operation
+        :return: context manager
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(operation, time.perf_counter() - start)
+
+    def record(self, operation: str, seconds: float):
+        """
+        Records a call of an operation
+        :param operation: name of the operation
+        :param seconds: how long the call took
+        :return: None
+        """
+        with self.__lock:
+            if operation not in self.__operations:
+                self.__operations[operation] = {'calls': 0, 'total_s': 0.0, 'max_s': 0.0,
+                                                'histogram': [0] * (len(self.LATENCY_BOUNDS) + 1)}
+            entry = self.__operations[operation]
+            entry['calls'] += 1
+            entry['total_s'] += seconds
+            entry['max_s'] = max(entry['max_s'], seconds)
+            entry['histogram'][bisect.bisect_left(self.LATENCY_BOUNDS, seconds)] += 1
+
+    def count(self, counter: str, amount: int = 1):
+        """
+        Adds to a named counter
+        :param counter: name of the counter
+        :param amount: amount to add
+        :return: None
+        """
+        with self.__lock:
+            self.__counters[counter] = self.__counters.get(counter, 0) + amount
+
+    def record_load(self, path: str, source: str, items: int, seconds: float):
+        """
+        Records the loading of a file
+        :param path: path of the loaded file
+        :param source: what was read ('csv' or 'snapshot')
+        :param items: amount of items the list held after the load
+        :param seconds: how long the load took
+        :return: None
+        """
+        with self.__lock:
+            self.__loads.append({'path': path, 'source': source, 'items': items, 'seconds': seconds})
+
+    def snapshot(self):
+        """
+        Returns a copy of everything recorded so far
+        :return: {'operations': {name: {'calls', 'total_s', 'mean_us', 'max_us', 'histogram'}},
+        'counters': {name: amount}, 'loads': [{'path', 'source', 'items', 'seconds'}]} dictionary.
+        Histograms are {bucket label: calls} dictionaries.
+        """
+        labels = [f"<={format_duration(bound)}" for bound in self.LATENCY_BOUNDS]
+        labels.append(f">{format_duration(self.LATENCY_BOUNDS[-1])}")
+        with self.__lock:
+            operations = {name: {'calls': entry['calls'],
+                                 'total_s': entry['total_s'],
+                                 'mean_us': entry['total_s'] / entry['calls'] * 1e6,
+                                 'max_us': entry['max_s'] * 1e6,
+                                 'histogram': dict(zip(labels, entry['histogram']))}
+                          for name, entry in self.__operations.items()}
+            return {'operations': operations, 'counters': dict(self.__counters), 'loads': list(self.__loads)}
+
+
+class NoStats:
+    """
+    Stands in for OperationStats when a list isn't instrumented, recording nothing
+    """
+    __NO_CONTEXT = nullcontext()
+
+    @staticmethod
+    def timed(_):
+        return NoStats.__NO_CONTEXT
+
+    @staticmethod
+    def record(*_):
+        pass
+
+    @staticmethod
+    def count(*_):
+        pass
+
+    @staticmethod
+    def record_load(*_):
+        pass
+
+    @staticmethod
+    def snapshot():
+        return None
+
+
+class LruCache:
+    """
+    A bounded mapping that drops its least recently used entry when it's full, counting hits and misses.
+    Can be shared between threads.
+    """
+    def __init__(self, max_size: int, on_evict=None):
+        """
+        :param max_size: maximum amount of entries
+        :param on_evict: optional func(key) called when an entry is dropped to make room
+        """
+        if max_size < 1:
+            raise ValueError("An LruCache needs room for at least one entry")
+        self.max_size = max_size
+        self.__on_evict = on_evict
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        """
+        Returns a key's value and marks it as the most recently used
+        :param key: the key to look up
+        :param default: value to return when the key isn't cached
+        :return: the cached value or default
+        """
+        with self.__lock:
+            value = self.__entries.get(key, self.__entries)  # the dict itself marks a miss, it's never a value
+            if value is self.__entries:
+                self.misses += 1
+                return default
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Caches a value, dropping the least recently used entry if the cache is full
+        :param key: the key
+        :param value: the value
+        :return: None
+        """
+        with self.__lock:
+            self.__entries[key] = value
+            self.__entries.move_to_end(key)
+            if len(self.__entries) <= self.max_size:
+                return
+            evicted, _ = self.__entries.popitem(last=False)
+            self.evictions += 1
+        if self.__on_evict is not None:
+            self.__on_evict(evicted)
+
+    def invalidate(self, key):
+        """
+        Drops a key's entry because its value is out of date
+        :param key: the key
+        :return: None
+        """
+        with self.__lock:
+            if self.__entries.pop(key, self.__entries) is not self.__entries:
+                self.invalidations += 1
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+
+    def info(self):
+        """
+        Returns the cache's size and counts
+        :return: {'size', 'max_size', 'hits', 'misses', 'hit_rate', 'evictions', 'invalidations'} dictionary
+        """
+        with self.__lock:
+            lookups = self.hits + self.misses
+            return {'size': len(self.__entries), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0, 'evictions': self.evictions,
+                    'invalidations': self.invalidations}
+
+    def __len__(self):
+        return len(self.__entries)
+
+
+def format_duration(seconds: float):
+    """
+    Formats a duration with the largest fitting unit
+    :param seconds: duration in seconds
+    :return: string, e.g. '10us', '1.5ms' or '2s'
+    """
+    for unit, size in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= size:
+            return f"{seconds / size:g}{unit}"
+    return f"{seconds * 1e9:g}ns"